@@ -0,0 +1,181 @@
+import os
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from src.ml.processed_store import read_table, table_path, json_path
+
+# --- Configuration ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_SORT_ORDERS = 8  # Sort permutations kept per dataset version
+
+
+class CursorError(ValueError):
+    """Raised for a cursor that is malformed or belongs to another query."""
+
+
+class StaleCursorError(CursorError):
+    """Raised for a cursor issued before the dataset file was rewritten."""
+
+
+def _file_signature(path):
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat_result.st_mtime_ns}-{stat_result.st_size}"
+
+
+class DatasetBrowser:
+    """
+    Paginated, filtered and sorted reads of a processed table (see processed_store).
+
+    The Feather file is memory-mapped, so only the pages and the columns used by
+    filters and sorting are ever touched. Filters are evaluated column-wise with Arrow
+    compute; the row order of each sort column is computed once per dataset version and
+    reused by every page. Cursors hold the position in that order plus the dataset
+    version, so a page never skips or repeats rows; after the pipeline rewrites the
+    file, old cursors raise StaleCursorError and the client restarts from the first page.
+    """
+
+    def __init__(self, name, max_sort_orders=MAX_SORT_ORDERS):
+        self.name = name
+        self.max_sort_orders = max_sort_orders
+        self._lock = threading.Lock()
+        self._version = None
+        self._table = None
+        self._orders = OrderedDict()
+
+    # --- Loading ---
+    def _signature(self):
+        signature = _file_signature(table_path(self.name))
+        if signature is not None:
+            return "feather-" + signature
+        signature = _file_signature(json_path(self.name))
+        return "json-" + signature if signature is not None else None
+
+    def _current(self):
+        """(version, pa.Table), reopened when the file changes."""
+        signature = self._signature()
+        with self._lock:
+            if signature is None:
+                raise FileNotFoundError(f"No processed data found for '{self.name}'.")
+            if signature != self._version:
+                if signature.startswith("feather-"):
+                    table = feather.read_table(table_path(self.name), memory_map=True)
+                else:
+                    table = pa.Table.from_pandas(read_table(self.name), preserve_index=False)
+                self._version, self._table = signature, table
+                self._orders.clear()
+            return self._version, self._table
+
+    def _order(self, version, table, sort_by, descending):
+        key = (version, sort_by, descending)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is not None:
+                self._orders.move_to_end(key)
+                return order
+        # Stable sort: ties keep file order, so pages are deterministic
+        order = pc.sort_indices(table, sort_keys=[(sort_by, "descending" if descending else "ascending")]).to_numpy()
+        with self._lock:
+            self._orders[key] = order
+            while len(self._orders) > self.max_sort_orders:
+                self._orders.popitem(last=False)
+        return order
+
+    # --- Query ---
+    def _mask(self, table, equals, ranges):
+        mask = None
+        for column, value in equals.items():
+            condition = pc.equal(table[column], pa.scalar(value).cast(table.schema.field(column).type))
+            mask = condition if mask is None else pc.and_kleene(mask, condition)
+        for column, (low, high) in ranges.items():
+            for compare, bound in ((pc.greater_equal, low), (pc.less_equal, high)):
+                if bound is not None:
+                    condition = compare(table[column], pa.scalar(bound).cast(table.schema.field(column).type))
+                    mask = condition if mask is None else pc.and_kleene(mask, condition)
+        if mask is None:
+            return None
+        return pc.fill_null(mask, False).to_numpy(zero_copy_only=False)
+
+    def query(self, columns=None, equals=None, ranges=None, sort_by=None, descending=False, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        One page of rows.
+
+        Args:
+            columns (list, optional): Columns to return (all if None).
+            equals (dict, optional): {column: value} equality filters.
+            ranges (dict, optional): {column: (min, max)} inclusive ranges; either bound may be None.
+            sort_by (str, optional): Sort column; file order if None.
+            descending (bool): Sort direction.
+            limit (int): Page size.
+            cursor (str, optional): next_cursor of the previous page.
+
+        Returns:
+            dict: {"rows", "total_rows" (rows matching the filters), "next_cursor" (None on
+                the last page), "dataset_version"}.
+
+        Raises:
+            FileNotFoundError: If the table does not exist.
+            ValueError: For unknown columns; CursorError/StaleCursorError for bad cursors.
+        """
+        equals = {column: value for column, value in (equals or {}).items() if value is not None}
+        ranges = {column: bounds for column, bounds in (ranges or {}).items() if bounds != (None, None)}
+        version, table = self._current()
+        unknown = [column for column in list(columns or []) + list(equals) + list(ranges) + [sort_by] if column is not None and column not in table.column_names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(table.column_names)}.")
+
+        query_hash = hashlib.sha256(json.dumps([sorted(equals.items()), sorted(ranges.items()), sort_by, descending], default=str).encode('utf-8')).hexdigest()[:16]
+        position = self._decode_cursor(cursor, version, query_hash) if cursor else 0
+
+        mask = self._mask(table, equals, ranges)
+        order = self._order(version, table, sort_by, descending) if sort_by else None
+        if mask is None:
+            total_rows = table.num_rows
+            positions = np.arange(position, min(position + limit, total_rows))
+            has_more = position + limit < total_rows
+        else:
+            total_rows = int(mask.sum())
+            ordered_mask = mask if order is None else mask[order]
+            remaining = np.flatnonzero(ordered_mask[position:]) + position
+            positions, has_more = remaining[:limit], len(remaining) > limit
+        row_indices = positions if order is None else order[positions]
+
+        page = table.take(pa.array(row_indices, type=pa.int64()))
+        if columns:
+            page = page.select(list(columns))
+        return {
+            "rows": page.to_pylist(),
+            "total_rows": total_rows,
+            "next_cursor": self._encode_cursor(version, query_hash, int(positions[-1]) + 1) if has_more else None,
+            "dataset_version": version,
+        }
+
+    # --- Cursors ---
+    @staticmethod
+    def _encode_cursor(version, query_hash, position):
+        payload = json.dumps({"v": version, "q": query_hash, "p": position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor, version, query_hash):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            cursor_version, cursor_query, position = payload["v"], payload["q"], int(payload["p"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise CursorError(f"Malformed cursor: {e}")
+        if cursor_version != version:
+            raise StaleCursorError("The dataset changed since this cursor was issued; restart from the first page.")
+        if cursor_query != query_hash or position < 0:
+            raise CursorError("The cursor belongs to a different filter or sort; restart from the first page.")
+        return position
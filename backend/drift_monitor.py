@@ -0,0 +1,347 @@
+import os
+import glob
+import json
+import zlib
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single API process, which is always the writer
+    fcntl = None
+
+# --- Configuration ---
+DRIFT_FEATURES = ("skill_match_score", "level_match_score", "match_probability")
+DEFAULT_BINS = 100  # Fine bins over [0, 1], used for KS and the histograms
+PSI_BINS = 10  # PSI is computed on these coarser bins, each the sum of DEFAULT_BINS / PSI_BINS fine ones
+PSI_EPSILON = 1e-4  # Floor for empty bins, so the log ratio stays finite
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.2
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_MAX_WINDOWS = 168  # One week of hourly windows
+DEFAULT_REFRESH_SECONDS = 10.0
+LOG_PATTERN = "predictions-*.ndjson.gz"
+STATE_FORMAT = 1
+
+
+def bin_indices(values, bins):
+    """Fine-bin index of each value in [0, 1]; out-of-range values fall in the edge bins."""
+    return np.clip((np.asarray(values, dtype=np.float64) * bins).astype(np.int64), 0, bins - 1)
+
+
+def psi(reference, current, psi_bins=PSI_BINS):
+    """Population Stability Index of two fine-bin histograms, or None if either is empty."""
+    if reference.sum() == 0 or current.sum() == 0:
+        return None
+    expected = np.maximum(reference.reshape(psi_bins, -1).sum(axis=1) / reference.sum(), PSI_EPSILON)
+    actual = np.maximum(current.reshape(psi_bins, -1).sum(axis=1) / current.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(reference, current):
+    """Kolmogorov-Smirnov distance between two histograms (largest CDF gap at the bin edges)."""
+    if reference.sum() == 0 or current.sum() == 0:
+        return None
+    return float(np.max(np.abs(np.cumsum(reference) / reference.sum() - np.cumsum(current) / current.sum())))
+
+
+def psi_level(value):
+    if value is None:
+        return None
+    if value >= PSI_SIGNIFICANT:
+        return "significant"
+    return "moderate" if value >= PSI_MODERATE else "stable"
+
+
+class _Profile:
+    """Histogram and running sum per feature; merging two profiles is adding them."""
+
+    __slots__ = ("histograms", "sums")
+
+    def __init__(self, bins):
+        self.histograms = {feature: np.zeros(bins, dtype=np.int64) for feature in DRIFT_FEATURES}
+        self.sums = {feature: 0.0 for feature in DRIFT_FEATURES}
+
+    def add(self, feature, values, bins):
+        self.histograms[feature] += np.bincount(bin_indices(values, bins), minlength=bins)
+        self.sums[feature] += float(np.sum(values))
+
+    def merge(self, other):
+        for feature in DRIFT_FEATURES:
+            self.histograms[feature] += other.histograms[feature]
+            self.sums[feature] += other.sums[feature]
+
+    def describe(self, feature, reference=None, histogram=False):
+        counts = self.histograms[feature]
+        count = int(counts.sum())
+        summary = {"count": count, "mean": self.sums[feature] / count if count else None}
+        if reference is not None:
+            summary["psi"] = psi(reference.histograms[feature], counts)
+            summary["psi_level"] = psi_level(summary["psi"])
+            summary["ks"] = ks_statistic(reference.histograms[feature], counts)
+        if histogram:
+            summary["histogram"] = counts.tolist()
+        return summary
+
+    def to_dict(self):
+        return {"histograms": {feature: counts.tolist() for feature, counts in self.histograms.items()}, "sums": self.sums}
+
+    @classmethod
+    def from_dict(cls, data, bins):
+        profile = cls(bins)
+        for feature in DRIFT_FEATURES:
+            profile.histograms[feature] = np.asarray(data["histograms"][feature], dtype=np.int64)
+            profile.sums[feature] = data["sums"][feature]
+        return profile
+
+
+class DriftMonitor:
+    """
+    Incremental drift statistics for the prediction logs written by PredictionLogSink.
+
+    refresh() only reads what was appended since the previous call: every sink flush is
+    a complete gzip member, so each file is consumed member by member from a saved byte
+    offset and a member still being written is left for the next call. Rows are folded
+    into fixed-bin histograms (plus sums, for exact means) per time window, keeping the
+    last max_windows windows. Memory and the cost of summary() depend on the number of
+    windows and bins, never on the size of the logs.
+
+    The state (histograms and file offsets) is checkpointed to state_path after each
+    refresh, so a restart resumes where it stopped. Each API worker keeps its own copy in
+    memory; all of them read the same files and converge, but only the one holding the
+    lock file next to state_path writes the checkpoint (another takes over if it exits).
+
+    start_refreshing() runs refresh() every refresh_seconds in a background thread, so
+    requests only read summary().
+
+    PSI and KS are computed against a reference profile, set with set_reference()
+    from the training set (see backend.main).
+    """
+
+    def __init__(self, log_dir, state_path, bins=DEFAULT_BINS, window_seconds=DEFAULT_WINDOW_SECONDS, max_windows=DEFAULT_MAX_WINDOWS,
+                 refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        if bins % PSI_BINS:
+            raise ValueError(f"bins must be a multiple of {PSI_BINS}.")
+        self.log_dir = log_dir
+        self.state_path = state_path
+        self.bins = bins
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._writer_lock = None  # Open lock file while this process is the checkpoint writer
+        self._stop = threading.Event()
+        self._refresher = None
+        self._offsets = {}  # log file name -> bytes consumed
+        self._windows = {}  # window start (epoch seconds) -> _Profile
+        self._rows_ingested = 0
+        self._reference = None
+        self._reference_key = None
+        self._reference_source = None
+        self._load_state()
+
+    # --- Checkpoint ---
+    def _config(self):
+        return {"format": STATE_FORMAT, "bins": self.bins, "window_seconds": self.window_seconds}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        # A checkpoint written with other bins or windows is discarded and the logs are read again
+        if state.get("config") != self._config():
+            return
+        self._offsets = state["offsets"]
+        self._windows = {int(start): _Profile.from_dict(profile, self.bins) for start, profile in state["windows"].items()}
+        self._rows_ingested = state["rows_ingested"]
+
+    def _is_writer(self):
+        if fcntl is None:
+            return True
+        if self._writer_lock is not None and self._writer_lock[0] == os.getpid():
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        lock = open(f"{self.state_path}.lock", 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()  # Another worker writes the checkpoint
+            return False
+        self._writer_lock = (os.getpid(), lock)  # Held until this process exits
+        return True
+
+    def _save_state(self):
+        if not self._is_writer():
+            return
+        state = {
+            "config": self._config(),
+            "offsets": self._offsets,
+            "windows": {str(start): profile.to_dict() for start, profile in self._windows.items()},
+            "rows_ingested": self._rows_ingested,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Ingestion ---
+    def _window_start(self, timestamp, cache):
+        start = cache.get(timestamp)
+        if start is None:
+            epoch = datetime.fromisoformat(timestamp).timestamp()
+            start = cache[timestamp] = int(epoch // self.window_seconds) * self.window_seconds
+        return start
+
+    def _ingest_lines(self, text, timestamp_cache):
+        columns = {feature: ([], []) for feature in DRIFT_FEATURES}  # feature -> (window starts, values)
+        rows = 0
+        for line in text.splitlines():
+            if not line:
+                continue
+            row = json.loads(line)
+            start = self._window_start(row["timestamp"], timestamp_cache)
+            for feature in DRIFT_FEATURES:
+                value = row.get(feature)
+                if value is not None:
+                    columns[feature][0].append(start)
+                    columns[feature][1].append(value)
+            rows += 1
+        for feature, (starts, values) in columns.items():
+            if not starts:
+                continue
+            starts, values = np.asarray(starts), np.asarray(values, dtype=np.float64)
+            for start in np.unique(starts):
+                start = int(start)
+                profile = self._windows.get(start)
+                if profile is None:
+                    profile = self._windows[start] = _Profile(self.bins)
+                profile.add(feature, values[starts == start], self.bins)
+        self._rows_ingested += rows
+        return rows
+
+    def _ingest_file(self, path, timestamp_cache):
+        name = os.path.basename(path)
+        offset = self._offsets.get(name, 0)
+        if os.path.getsize(path) <= offset:
+            return 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        rows = 0
+        while data:
+            member = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            text = member.decompress(data)
+            if not member.eof:
+                break  # Member still being written
+            rows += self._ingest_lines(text.decode('utf-8'), timestamp_cache)
+            offset += len(data) - len(member.unused_data)
+            data = member.unused_data
+        self._offsets[name] = offset
+        return rows
+
+    def _trim_windows(self):
+        if len(self._windows) > self.max_windows:
+            for start in sorted(self._windows)[:-self.max_windows]:
+                del self._windows[start]
+
+    def refresh(self):
+        """Reads the rows appended to the logs since the last call; returns how many."""
+        with self._lock:
+            paths = sorted(glob.glob(os.path.join(self.log_dir, LOG_PATTERN)))
+            timestamp_cache = {}
+            rows = sum(self._ingest_file(path, timestamp_cache) for path in paths)
+            # Forget the offsets of files deleted by log retention
+            existing = {os.path.basename(path) for path in paths}
+            self._offsets = {name: offset for name, offset in self._offsets.items() if name in existing}
+            self._trim_windows()
+            if rows:
+                self._save_state()
+            return rows
+
+    # --- Background refresh ---
+    def _refresh_loop(self, hook):
+        while True:
+            try:
+                self.refresh()
+                if hook is not None:
+                    hook()
+            except Exception as e:
+                # Keep serving the current statistics; the logs are read again on the next run
+                print(f"Drift monitoring refresh failed: {type(e).__name__}: {e}")
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+    def start_refreshing(self, hook=None):
+        """Starts the background refresh (once now, then every refresh_seconds); hook() runs after each refresh."""
+        if self.refresh_seconds > 0 and self._refresher is None:
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(hook,), name="drift-refresh", daemon=True)
+            self._refresher.start()
+
+    def stop_refreshing(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=self.refresh_seconds + 1)
+            self._refresher = None
+
+    # --- Reference ---
+    @property
+    def reference_key(self):
+        return self._reference_key
+
+    def set_reference(self, key, samples, source=None):
+        """
+        Sets the reference profile.
+
+        Args:
+            key (str): Identity of the reference data; callers skip recomputing when it is unchanged.
+            samples (dict): {feature: array of values}; missing features have no reference.
+            source (dict, optional): Descriptive fields returned with the summary.
+        """
+        reference = _Profile(self.bins)
+        for feature, values in samples.items():
+            values = np.asarray(values, dtype=np.float64)
+            reference.add(feature, values[~np.isnan(values)], self.bins)
+        with self._lock:
+            self._reference, self._reference_key, self._reference_source = reference, key, source
+
+    # --- Summary ---
+    def summary(self, windows=None):
+        """
+        Drift statistics: per window (count, mean, PSI, KS) and merged over the last
+        `windows` windows (all retained windows if None), with histograms.
+        """
+        with self._lock:
+            starts = sorted(self._windows)
+            selected = starts[-windows:] if windows else starts
+            overall = _Profile(self.bins)
+            for start in selected:
+                overall.merge(self._windows[start])
+            reference = self._reference
+            return {
+                "features": list(DRIFT_FEATURES),
+                "bins": self.bins,
+                "bin_edges": np.linspace(0.0, 1.0, self.bins + 1).round(6).tolist(),
+                "window_seconds": self.window_seconds,
+                "rows_ingested": self._rows_ingested,
+                "reference": None if reference is None else {
+                    "source": self._reference_source,
+                    "features": {feature: reference.describe(feature, histogram=True) for feature in DRIFT_FEATURES},
+                },
+                "overall": {
+                    "windows": len(selected),
+                    "features": {feature: overall.describe(feature, reference, histogram=True) for feature in DRIFT_FEATURES},
+                },
+                "windows": [
+                    {
+                        "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                        "features": {feature: self._windows[start].describe(feature, reference) for feature in DRIFT_FEATURES},
+                    }
+                    for start in selected
+                ],
+            }
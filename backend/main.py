@@ -1,34 +1,39 @@
 import os
-import glob
-import joblib
 import pandas as pd
 import uvicorn
 import json
 import logging 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+import joblib
+from functools import partial
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Optional
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
-
-# --- Logging config ---
-prediction_logger = logging.getLogger("prediction_logger")
-prediction_logger.setLevel(logging.INFO)
-# define 'a' as append
-handler = logging.FileHandler("predictions.log", mode='a')
-# Log format
-formatter = logging.Formatter('%(asctime)s - %(message)s')
-handler.setFormatter(formatter)
-prediction_logger.addHandler(handler)
+from typing import Any, Dict, Optional
 
 # --- Project Structure Setup ---
 import sys
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(BASE_DIR)
 
-from src.ml.feature_extractor import extract_features
-from src.ml.create_training_data import calculate_skill_match, calculate_level_match
+from src.ml.feature_extractor import extract_features, extract_features_batch, extractor_version
+from src.ml.feature_matrix import FeatureMatrix, FEATURE_COLUMNS, score_applicant, score_vacancy, select_rows, top_k_indices, predict_proba_deduplicated, ProbabilityTable
 from src.ml.train import run_training_pipeline as trigger_training
+from src.ml.processed_store import read_table, source_path, TRAINING_DATASET
+from src.ml.model_metadata import ModelEvaluator, file_fingerprint, TARGET_COLUMN
+from src.ml.forest_engine import load_for_inference
+from src.ml.vacancy_store import VacancyDetailsStore, VACANCY_DETAILS_PATH, project_vacancy, MISSING_VALUE
+from src.ml.enhance_features import vacancy_text
+from backend.model_registry import ModelRegistry, ModelNotFoundError, LATEST_ALIAS
+from backend.prediction_log import PredictionLogSink
+from backend.drift_monitor import DriftMonitor, DEFAULT_WINDOW_SECONDS as DEFAULT_DRIFT_WINDOW_SECONDS, DEFAULT_MAX_WINDOWS as DEFAULT_DRIFT_MAX_WINDOWS, \
+    DEFAULT_REFRESH_SECONDS as DEFAULT_DRIFT_REFRESH_SECONDS
+from backend.training_jobs import TrainingJobManager, JobNotFoundError
+from backend.vacancy_catalog import VacancyCatalog, VacancyNotFoundError, DEFAULT_POLL_SECONDS as DEFAULT_CATALOG_POLL_SECONDS
+from backend.metrics import LatencyMetrics, render_metric, PROMETHEUS_CONTENT_TYPE, DEFAULT_WINDOW as DEFAULT_METRICS_WINDOW
+from backend.dataset_browser import DatasetBrowser, StaleCursorError, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backend import shared_state
+from backend.prediction_cache import PredictionCache, prediction_key, DEFAULT_MAX_ENTRIES as DEFAULT_PREDICTION_CACHE_ENTRIES, DEFAULT_TTL_SECONDS as DEFAULT_PREDICTION_CACHE_TTL
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -38,23 +43,125 @@ app = FastAPI(
 )
 
 # --- Configuration & Data Loading ---
-MODEL_DIR = os.path.join(BASE_DIR, 'models')
-PROCESSED_DATA_DIR = os.path.join(BASE_DIR, 'data', 'processed')
-RAW_DATA_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+# MODEL_DIR and PROCESSED_DATA_DIR are also read by the training and processed-table modules,
+# so training jobs write to and read from the same directories the API serves
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, 'models'))
+PROCESSED_DATA_DIR = os.getenv("PROCESSED_DATA_DIR", os.path.join(BASE_DIR, 'data', 'processed'))
 
 VACANCIES_ENHANCED_PATH = os.path.join(PROCESSED_DATA_DIR, 'vacancies_enhanced.json')
-TRAINING_DATASET_PATH = os.path.join(PROCESSED_DATA_DIR, 'training_dataset.json')
-VAGAS_RAW_PATH = os.path.join(RAW_DATA_DIR, 'vagas.json')
+APPLICANTS_ENHANCED_PATH = os.path.join(PROCESSED_DATA_DIR, 'applicants_enhanced.json')
+# Vacancies added, changed or closed through PUT/DELETE /vacancies/{vaga_id}, replayed over vacancies_enhanced.json
+VACANCY_UPDATES_PATH = os.getenv("VACANCY_UPDATES_PATH", os.path.join(PROCESSED_DATA_DIR, 'vacancy_updates.jsonl'))
+# How often vacancies_enhanced.json and the journal are checked for a new version (0 disables reloading)
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", str(DEFAULT_CATALOG_POLL_SECONDS)))
+
+# --- Shared serving state config ---
+# Set SHARED_STATE=1 when running several workers: the vacancy and applicant arrays are attached
+# from memory-mapped snapshots under SHARED_STATE_DIR (built once, by the first worker that needs
+# them), compiled forests are mapped from their files and the details store is read through mmap,
+# so every worker shares one copy of the read-only state in the page cache
+SHARED_STATE = os.getenv("SHARED_STATE", "0").lower() in ("1", "true", "yes")
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", os.path.join(BASE_DIR, 'data', 'serving'))
+
+# Set MODEL_WARMUP=1 to load the latest model at startup instead of on the first request
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0").lower() in ("1", "true", "yes")
+MAX_LOADED_MODELS = int(os.getenv("MAX_LOADED_MODELS", "4"))
+# "numpy" serves models from the compiled forest tables written at training time (same
+# probabilities, faster load and scoring), falling back to the joblib file; "sklearn" always unpickles
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "numpy").lower()
+MODEL_REGISTRY = ModelRegistry(MODEL_DIR, max_loaded=MAX_LOADED_MODELS, loader=partial(load_for_inference, mmap=SHARED_STATE) if MODEL_ENGINE == "numpy" else joblib.load)
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 100
+# "table" memoizes each model's probabilities per distinct feature tuple (tied to the model
+# version in the registry); "model" calls predict_proba on the distinct rows of every request
+SCORING_MODE = os.getenv("SCORING_MODE", "table").lower()
+# Upper bound on applicant x vacancy rows sent to a single predict_proba call in /predict/batch
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "200000"))
+
+# --- Prediction log config ---
+# Rows are written by a background thread to rotating gzip NDJSON files; requests never wait on disk
+PREDICTION_LOG_DIR = os.getenv("PREDICTION_LOG_DIR", os.path.join(BASE_DIR, 'logs', 'predictions'))
+PREDICTION_LOG = PredictionLogSink(
+    PREDICTION_LOG_DIR,
+    sampling=os.getenv("PREDICTION_LOG_SAMPLING", "scored"),
+    queue_size=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "1000")),
+)
+
+# Drift statistics of the logged predictions, read incrementally from the log files in a background
+# thread (every DRIFT_REFRESH_SECONDS; 0 reads them in the request instead) and served at GET /monitoring/drift
+DRIFT_REFRESH_SECONDS = float(os.getenv("DRIFT_REFRESH_SECONDS", str(DEFAULT_DRIFT_REFRESH_SECONDS)))
+DRIFT_MONITOR = DriftMonitor(
+    PREDICTION_LOG_DIR,
+    os.getenv("DRIFT_STATE_PATH", os.path.join(BASE_DIR, 'logs', 'drift_state.json')),
+    window_seconds=int(os.getenv("DRIFT_WINDOW_SECONDS", str(DEFAULT_DRIFT_WINDOW_SECONDS))),
+    max_windows=int(os.getenv("DRIFT_MAX_WINDOWS", str(DEFAULT_DRIFT_MAX_WINDOWS))),
+    refresh_seconds=DRIFT_REFRESH_SECONDS,
+)
+
+# Test-set metrics per (model, dataset), served from the model's sidecar metadata when it is current
+MODEL_EVALUATOR = ModelEvaluator(
+    lambda: source_path(TRAINING_DATASET),
+    lambda path: read_table(TRAINING_DATASET, columns=FEATURE_COLUMNS + [TARGET_COLUMN], path=path),
+    FEATURE_COLUMNS,
+)
+
+# --- Latency metrics config ---
+# Per-stage timers of /predict, /evaluate and /train, served at GET /metrics (Prometheus format)
+API_METRICS = LatencyMetrics(window=int(os.getenv("METRICS_WINDOW", str(DEFAULT_METRICS_WINDOW))))
+# Set TIMING_HEADERS=1 to also return the stage timings of each request in a Server-Timing header
+TIMING_HEADERS = os.getenv("TIMING_HEADERS", "0").lower() in ("1", "true", "yes")
 
+# --- Prediction cache config ---
+# /predict responses memoized per (normalized CV, model file, catalog version, top_k, exhaustive); 0 entries disables it.
+# Set PREDICTION_CACHE_PATH to a SQLite file to share the cache between workers and restarts
+PREDICTION_CACHE_ENTRIES = int(os.getenv("PREDICTION_CACHE_ENTRIES", str(DEFAULT_PREDICTION_CACHE_ENTRIES)))
+PREDICTION_CACHE = PredictionCache(
+    max_entries=PREDICTION_CACHE_ENTRIES,
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", str(DEFAULT_PREDICTION_CACHE_TTL))),
+    db_path=os.getenv("PREDICTION_CACHE_PATH") or None,
+    max_bytes=int(os.getenv("PREDICTION_CACHE_MAX_MB", "64")) * 1024 * 1024,
+) if PREDICTION_CACHE_ENTRIES > 0 else None
+PREDICTION_CACHE_HEADER = "X-Prediction-Cache"
+
+# --- Training jobs config ---
+# Training runs in child processes; POST /train returns a job id and never blocks a request thread
+MAX_TRAINING_JOBS = int(os.getenv("MAX_TRAINING_JOBS", "1"))
+# With several workers the jobs are recorded in a shared SQLite file, so any worker answers /jobs
+# and single-flight holds across workers; otherwise they are kept in memory
+TRAINING_JOBS_PATH = os.getenv("TRAINING_JOBS_PATH") or (os.path.join(SHARED_STATE_DIR, 'training_jobs.sqlite') if SHARED_STATE else None)
+TRAINING_JOBS = TrainingJobManager(
+    trigger_training,
+    max_parallel=MAX_TRAINING_JOBS,
+    on_success=lambda result: training_job_succeeded(result),
+    state_path=TRAINING_JOBS_PATH,
+)
+
+# Vacancy features and their scoring arrays (skills, levels, counts), swapped as a whole on every change
+VACANCY_CATALOG = VacancyCatalog(VACANCIES_ENHANCED_PATH, VACANCY_UPDATES_PATH, poll_seconds=CATALOG_POLL_SECONDS,
+                                 shared_root=SHARED_STATE_DIR if SHARED_STATE else None)
 try:
-    with open(VAGAS_RAW_PATH, 'r', encoding='utf-8') as f:
-        VAGAS_RAW_DATA = json.load(f)
-    with open(VACANCIES_ENHANCED_PATH, 'r', encoding='utf-8') as f:
-        VACANCIES_ENHANCED_DATA = json.load(f)
+    VACANCY_CATALOG.load()
 except FileNotFoundError as e:
     print(f"Error loading data on startup: {e}. Ensure all data files are present.")
-    VAGAS_RAW_DATA = {}
-    VACANCIES_ENHANCED_DATA = {}
+
+# Training set served page by page at GET /training-data, from the memory-mapped columnar table
+TRAINING_DATA = DatasetBrowser(TRAINING_DATASET)
+
+# Display fields of the returned vacancies, read on demand from the store built by src/ml/vacancy_store.py
+# (built from data/raw/vagas.json at startup when missing or outdated, and reopened whenever it is rebuilt)
+VACANCY_DETAILS = VacancyDetailsStore(VACANCY_DETAILS_PATH, mmap_bytes=shared_state.SQLITE_MMAP_BYTES if SHARED_STATE else 0)
+
+# Applicant pool for reverse matching; shares the skill vocabulary so both sides use the same ids
+# (a shared snapshot has its own: queries are only ever looked up in the vocabulary of the matrix they score)
+try:
+    if SHARED_STATE:
+        APPLICANT_MATRIX = shared_state.attach(APPLICANTS_ENHANCED_PATH, SHARED_STATE_DIR).matrix
+    else:
+        with open(APPLICANTS_ENHANCED_PATH, 'r', encoding='utf-8') as f:
+            APPLICANT_MATRIX = FeatureMatrix(json.load(f), vocabulary=VACANCY_CATALOG.vocabulary)
+except FileNotFoundError as e:
+    print(f"Error loading applicant pool on startup: {e}. Reverse matching will return no applicants.")
+    APPLICANT_MATRIX = FeatureMatrix({}, vocabulary=VACANCY_CATALOG.vocabulary)
 
 
 # --- Pydantic Models ---
@@ -64,113 +171,474 @@ class RawApplicant(BaseModel):
     class Config:
         extra = 'allow'
 
+class RawVacancy(BaseModel):
+    informacoes_basicas: Dict[str, Any] = Field(default_factory=dict, description="Basic info (titulo_vaga, cliente, tipo_contratacao, ...), as in vagas.json.")
+    perfil_vaga: Dict[str, Any] = Field(default_factory=dict, description="Vacancy profile (principais_atividades, competencia_tecnicas_e_comportamentais, ...).")
+    class Config:
+        extra = 'allow'
+
 # --- Helper Functions ---
+def request_timer(endpoint, response):
+    return API_METRICS.timer(endpoint, response.headers if TIMING_HEADERS else None)
+
+def training_job_succeeded(result):
+    # The new file lands in MODEL_DIR; force the manifest to pick it up immediately
+    MODEL_REGISTRY.refresh(force=True)
+    for stage, seconds in result.get("stage_seconds", {}).items():
+        API_METRICS.observe("training_job", stage, seconds)
+
 def get_latest_model_path():
-    list_of_models = glob.glob(os.path.join(MODEL_DIR, '*.joblib'))
-    if not list_of_models:
+    try:
+        return MODEL_REGISTRY.resolve(LATEST_ALIAS).path
+    except ModelNotFoundError:
         return None
-    return max(list_of_models, key=os.path.getctime)
+
+def model_not_found(model_filename, error):
+    # A missing 'latest' means nothing was trained yet, which is a server-side problem
+    status_code = 500 if model_filename == LATEST_ALIAS else 404
+    return HTTPException(status_code=status_code, detail=str(error))
+
+def resolve_model(model_filename):
+    """The registry entry of a model without loading it, mapping lookup failures to HTTP errors."""
+    try:
+        return MODEL_REGISTRY.resolve(model_filename)
+    except ModelNotFoundError as e:
+        raise model_not_found(model_filename, e)
+
+def load_model(model_filename):
+    """Fetches a model from the registry, mapping lookup failures to HTTP errors."""
+    try:
+        return MODEL_REGISTRY.get(model_filename)
+    except ModelNotFoundError as e:
+        raise model_not_found(model_filename, e)
+
+def vacancy_details_many(catalog, vaga_ids):
+    """Display fields of vacancies changed through the API come from the catalog, the rest from the store."""
+    vaga_ids = list(dict.fromkeys(vaga_ids))
+    details = VACANCY_DETAILS.get_many(vaga_id for vaga_id in vaga_ids if vaga_id not in catalog.details)
+    return {vaga_id: catalog.details.get(vaga_id) or details[vaga_id] for vaga_id in vaga_ids}
+
+def vacancy_details(catalog, vaga_id):
+    return vacancy_details_many(catalog, [vaga_id])[vaga_id]
+
+def enrich_matches(catalog, matches_df):
+    matches = matches_df.to_dict(orient='records')
+    details = vacancy_details_many(catalog, (match['vaga_id'] for match in matches))
+    for match in matches:
+        match['vaga_details'] = details[match['vaga_id']]
+    return matches
+
+def prediction_cache_key(applicant_raw, model_entry, catalog, top_k, exhaustive):
+    return prediction_key(applicant_raw.cv_pt, model_entry.content_hash, model_entry.filename, catalog.fingerprint, extractor_version(), top_k=top_k, exhaustive=exhaustive)
+
+def render_prediction_cache_metrics():
+    if PREDICTION_CACHE is None:
+        return ""
+    stats = PREDICTION_CACHE.stats()
+    return "".join([
+        render_metric("prediction_cache_lookups_total", "counter", "Lookups of the /predict response cache by result.",
+                      [({"result": result}, stats[key]) for result, key in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))]),
+        render_metric("prediction_cache_hit_ratio", "gauge", "Share of /predict lookups answered from the cache since startup.",
+                      [({}, f"{stats['hit_rate']:.6f}")]),
+        render_metric("prediction_cache_removed_total", "counter", "Cache entries removed, by reason.",
+                      [({"reason": reason}, stats[key]) for reason, key in (("lru", "memory_evictions"), ("disk_lru", "disk_evictions"), ("ttl", "expirations"), ("catalog_change", "invalidations"))]),
+        render_metric("prediction_cache_entries", "gauge", "Cached /predict responses per tier.",
+                      [({"tier": "memory"}, stats["memory_entries"]), ({"tier": "disk"}, stats["disk_entries"])]),
+        render_metric("prediction_cache_memory_bytes", "gauge", "Serialized size of the responses held in memory.",
+                      [({}, stats["memory_bytes"])]),
+    ])
+
+def refresh_drift_reference():
+    """Sets the drift reference from the training set, scored by the latest model; recomputed only when either changes."""
+    try:
+        dataset_path = source_path(TRAINING_DATASET)
+        dataset_hash = file_fingerprint(dataset_path)
+    except FileNotFoundError:
+        return
+    try:
+        model_entry = MODEL_REGISTRY.resolve(LATEST_ALIAS)
+    except ModelNotFoundError:
+        model_entry = None
+    key = f"{dataset_hash}:{model_entry.content_hash if model_entry else '-'}"
+    if DRIFT_MONITOR.reference_key == key:
+        return
+    training_df = read_table(TRAINING_DATASET, columns=FEATURE_COLUMNS, path=dataset_path)
+    samples = {"skill_match_score": training_df["skill_match_score"], "level_match_score": training_df["level_match_score"]}
+    if model_entry is not None:
+        # The probabilities the model gives the training rows are the reference for match_probability
+        model_entry, model = load_model(model_entry.filename)
+        samples["match_probability"] = predict_match_probabilities(model_entry, model, training_df)
+    DRIFT_MONITOR.set_reference(key, samples, source={
+        "training_rows": len(training_df),
+        "dataset_sha256": dataset_hash,
+        "model": model_entry.filename if model_entry else None,
+    })
+
+def predict_match_probabilities(model_entry, model, features):
+    """Positive-class probabilities for a FEATURE_COLUMNS frame, identical in both scoring modes."""
+    if SCORING_MODE == "table":
+        return MODEL_REGISTRY.attached(model_entry, model, "probability_table", ProbabilityTable).predict(features)
+    return predict_proba_deduplicated(model, features)
+
+def _score_batch_chunk(catalog, model_entry, model, chunk, top_k):
+    """Scores a chunk of (applicant_id, features, rows) in one call and yields per-applicant results."""
+    frames = [
+        pd.DataFrame({"vaga_id": catalog.matrix.id_array[rows], **score_applicant(catalog.matrix, features, rows)})
+        for _, features, rows in chunk
+    ]
+    df_chunk = pd.concat(frames, ignore_index=True)
+    probabilities = predict_match_probabilities(model_entry, model, df_chunk[FEATURE_COLUMNS])
+    df_chunk['match_probability'] = probabilities
+
+    offsets = np.cumsum([0] + [len(frame) for frame in frames])
+    for (applicant_id, features, _), start, end in zip(chunk, offsets[:-1], offsets[1:]):
+        top_positions = top_k_indices(probabilities[start:end], top_k)
+        top_matches_df = df_chunk.iloc[start + top_positions]
+        PREDICTION_LOG.submit(df_chunk.iloc[start:end], top_positions, model_entry.filename, applicant_id)
+        yield {
+            "applicant_id": applicant_id,
+            "applicant_extracted_features": features,
+            "top_matches": enrich_matches(catalog, top_matches_df)
+        }
+
+def iter_batch_predictions(model_entry, model, applicants, top_k):
+    """
+    Yields top-k results per applicant. Features are extracted for the whole batch up front,
+    then applicant x vacancy rows are scored in chunks of at most BATCH_MAX_ROWS rows
+    (a single applicant larger than that still forms its own chunk). The whole batch is
+    scored against the catalog version current when it starts.
+    """
+    catalog = VACANCY_CATALOG.current
+    extracted = list(zip(applicants, extract_features_batch([applicant.cv_pt for applicant in applicants.values()], 'applicant')))
+
+    chunk, chunk_rows = [], 0
+    for applicant_id, features in extracted:
+        rows = select_rows(catalog.matrix, features, top_k)
+        if chunk and chunk_rows + len(rows) > BATCH_MAX_ROWS:
+            yield from _score_batch_chunk(catalog, model_entry, model, chunk, top_k)
+            chunk, chunk_rows = [], 0
+        chunk.append((applicant_id, features, rows))
+        chunk_rows += len(rows)
+    if chunk:
+        yield from _score_batch_chunk(catalog, model_entry, model, chunk, top_k)
+
+# --- Startup ---
+@app.on_event("startup")
+def warm_up_models():
+    if MODEL_WARMUP:
+        loaded = MODEL_REGISTRY.warm_up()
+        print(f"Model registry warm-up loaded: {loaded or 'no models'}")
+
+@app.on_event("startup")
+def watch_vacancy_catalog():
+    VACANCY_CATALOG.start_watching()
+
+@app.on_event("shutdown")
+def stop_watching_vacancy_catalog():
+    VACANCY_CATALOG.stop_watching()
+
+@app.on_event("startup")
+def refresh_drift_statistics():
+    DRIFT_MONITOR.start_refreshing(refresh_drift_reference)
+
+@app.on_event("shutdown")
+def stop_refreshing_drift_statistics():
+    DRIFT_MONITOR.stop_refreshing()
+
+@app.on_event("shutdown")
+def flush_prediction_log():
+    PREDICTION_LOG.close()
+
+@app.on_event("startup")
+def prepare_vacancy_details():
+    # The only place the API builds the store; lookups just read whatever file exists
+    VACANCY_DETAILS.build_if_stale()
+
+@app.on_event("shutdown")
+def close_vacancy_details():
+    VACANCY_DETAILS.close()
+
+@app.on_event("shutdown")
+def stop_training_jobs():
+    TRAINING_JOBS.shutdown()
 
 # --- API Routes ---
 @app.get("/")
 def index():
     return {"message": "Recruitment Model API is running."}
 
-@app.post("/train", status_code=201)
-def train_model_endpoint():
+@app.post("/train", status_code=202)
+def train_model_endpoint(response: Response):
+    # Single-flight: while a training job is queued or running, its id is returned instead
+    with request_timer("train_model_endpoint", response) as timer, timer.stage("submit"):
+        job, created = TRAINING_JOBS.submit()
+    message = "Training job started." if created else "A training job is already in progress."
+    return {"status": "accepted", "message": message, "job_id": job["job_id"], "job": job}
+
+@app.get("/jobs")
+def list_jobs():
+    return {"status": "success", "jobs": TRAINING_JOBS.list_jobs()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    try:
+        return TRAINING_JOBS.get(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    try:
+        job, cancelled = TRAINING_JOBS.cancel(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already {job['state']}.")
+    return job
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(API_METRICS.render_prometheus() + render_prediction_cache_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/training-data")
+def browse_training_data(
+    columns: Optional[str] = Query(None, description="Comma-separated columns to return (all by default)."),
+    hired: Optional[int] = Query(None, ge=0, le=1, description="Only hired (1) or not hired (0) rows."),
+    vaga_id: Optional[str] = Query(None, description="Only rows of this vacancy."),
+    applicant_id: Optional[str] = Query(None, description="Only rows of this applicant."),
+    applicant_level: Optional[str] = Query(None),
+    vacancy_level: Optional[str] = Query(None),
+    min_skill_match_score: Optional[float] = Query(None),
+    max_skill_match_score: Optional[float] = Query(None),
+    min_level_match_score: Optional[float] = Query(None),
+    max_level_match_score: Optional[float] = Query(None),
+    sort_by: Optional[str] = Query(None, description="Sort column (file order by default)."),
+    descending: bool = Query(False),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Rows per page."),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page."),
+):
+    try:
+        page = TRAINING_DATA.query(
+            columns=[column.strip() for column in columns.split(",") if column.strip()] if columns else None,
+            equals={"hired": hired, "vaga_id": vaga_id, "applicant_id": applicant_id, "applicant_level": applicant_level, "vacancy_level": vacancy_level},
+            ranges={"skill_match_score": (min_skill_match_score, max_skill_match_score), "level_match_score": (min_level_match_score, max_level_match_score)},
+            sort_by=sort_by,
+            descending=descending,
+            limit=limit,
+            cursor=cursor,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except StaleCursorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", **page}
+
+@app.get("/monitoring/drift")
+def monitoring_drift(
+    windows: Optional[int] = Query(None, ge=1, description="Merge only the most recent N time windows into 'overall' (all by default)."),
+):
     try:
-        trigger_training()
-        latest_model = get_latest_model_path()
-        return {"status": "success", "message": "Model training complete.", "new_model_file": os.path.basename(latest_model) if latest_model else "N/A"}
+        if DRIFT_REFRESH_SECONDS <= 0:
+            DRIFT_MONITOR.refresh()
+            refresh_drift_reference()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.error(f"Drift monitoring refresh failed with error: {e}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    return {"status": "success", **DRIFT_MONITOR.summary(windows)}
 
 @app.get("/models")
 def list_models():
-    models = [os.path.basename(f) for f in glob.glob(os.path.join(MODEL_DIR, '*.joblib'))]
+    models = MODEL_REGISTRY.list_models()
     if not models:
         raise HTTPException(status_code=404, detail="No models found.")
-    return {"status": "success", "models": sorted(models, reverse=True)}
+    return {"status": "success", "models": models}
 
 @app.get("/evaluate/{model_filename}")
-def evaluate_specific_model(model_filename: str):
-    model_path = os.path.join(MODEL_DIR, model_filename)
-    if not os.path.exists(model_path):
-        raise HTTPException(status_code=404, detail=f"Model '{model_filename}' not found.")
+def evaluate_specific_model(model_filename: str, response: Response):
+    with request_timer("evaluate_specific_model", response) as timer:
+        try:
+            with timer.stage("model_resolve"):
+                entry = MODEL_REGISTRY.resolve(model_filename)
+        except ModelNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        def load_for_evaluation():
+            with timer.stage("model_load"):
+                return load_model(entry.filename)[1]
+
+        try:
+            # Cached per (model hash, dataset hash); the model is only loaded if the dataset changed since training
+            with timer.stage("evaluation"):
+                metrics, source = MODEL_EVALUATOR.evaluate(entry.path, entry.content_hash, load_for_evaluation)
+            return {
+                "model_filename": entry.filename,
+                "accuracy": f"{metrics['accuracy']:.2%}",
+                "confusion_matrix": metrics["confusion_matrix"],
+                "classification_report": metrics["classification_report"],
+                "model_sha256": entry.content_hash,
+                "evaluation_source": source,
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+# Declared before /predict/{model_filename} so "batch" is not taken as a model name
+@app.post("/predict/batch")
+def predict_batch(
+    applicants: Dict[str, RawApplicant],
+    model_filename: str = Query(LATEST_ALIAS, description="Model file to use, or 'latest'."),
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K, description="Number of vacancies to return per applicant."),
+    stream: bool = Query(False, description="Stream one NDJSON line per applicant instead of a single JSON body."),
+):
+    model_entry, model = load_model(model_filename)
+    if stream:
+        lines = (json.dumps(result, ensure_ascii=False) + "\n" for result in iter_batch_predictions(model_entry, model, applicants, top_k))
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers={"X-Model-Used": model_entry.filename})
     try:
-        model = joblib.load(model_path)
-        df = pd.read_json(TRAINING_DATASET_PATH)
-        features = ['skill_match_score', 'level_match_score', 'applicant_skills_count', 'vacancy_skills_count']
-        target = 'hired'
-        _, X_test, _, y_test = train_test_split(df[features], df[target], test_size=0.2, random_state=42, stratify=df[target])
-        predictions = model.predict(X_test)
-        accuracy = accuracy_score(y_test, predictions)
-        conf_matrix = confusion_matrix(y_test, predictions)
-        class_report = classification_report(y_test, predictions, target_names=['Not Hired', 'Hired'], output_dict=True, zero_division=0)
-        return {"model_filename": model_filename, "accuracy": f"{accuracy:.2%}", "confusion_matrix": conf_matrix.tolist(), "classification_report": class_report}
+        results = list(iter_batch_predictions(model_entry, model, applicants, top_k))
+        return {
+            "status": "success",
+            "model_used": model_entry.filename,
+            "applicants_scored": len(results),
+            "results": results
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.error(f"Batch prediction failed with error: {e}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @app.post("/predict/{model_filename}")
-def predict_match(model_filename: str, applicant_raw: RawApplicant):
-    try:
-        if model_filename == "latest":
-            model_path = get_latest_model_path()
-            if not model_path:
-                raise HTTPException(status_code=500, detail="No trained model found.")
-        else:
-            model_path = os.path.join(MODEL_DIR, model_filename)
-            if not os.path.exists(model_path):
-                raise HTTPException(status_code=404, detail=f"Model '{model_filename}' not found.")
-        
-        model = joblib.load(model_path)
-        
-        applicant_features = extract_features(applicant_raw.cv_pt, 'applicant')
-
-
-        prediction_records = []
-        for vaga_id, vacancy_features in VACANCIES_ENHANCED_DATA.items():
-            skill_match = calculate_skill_match(applicant_features.get("technical_skills", []), vacancy_features.get("technical_skills", []))
-            level_match = calculate_level_match(applicant_features.get("experience_level"), vacancy_features.get("experience_level"))
-            record = {"vaga_id": vaga_id, "skill_match_score": skill_match, "level_match_score": level_match, "applicant_skills_count": len(applicant_features.get("technical_skills", [])), "vacancy_skills_count": len(vacancy_features.get("technical_skills", []))}
-            prediction_records.append(record)
-
-        df_predict = pd.DataFrame(prediction_records)
-        feature_order = ['skill_match_score', 'level_match_score', 'applicant_skills_count', 'vacancy_skills_count']
-        probabilities = model.predict_proba(df_predict[feature_order])[:, 1]
-        df_predict['match_probability'] = probabilities
-        
-        # Prediction log
-        for record in df_predict.to_dict(orient='records'):
-            prediction_logger.info(json.dumps(record))
-
-        top_5_matches_df = df_predict.sort_values(by='match_probability', ascending=False).head(5)
-        
-        top_matches_enriched = []
-        for match in top_5_matches_df.to_dict(orient='records'):
-            vaga_id = match['vaga_id']
-            raw_vaga = VAGAS_RAW_DATA.get(vaga_id, {})
-            basic_info = raw_vaga.get("informacoes_basicas", {})
-            profile_info = raw_vaga.get("perfil_vaga", {})
-            
-            match['vaga_details'] = {
-                "title": basic_info.get("titulo_vaga", "N/A"),
-                "client": basic_info.get("cliente", "N/A"),
-                "contract_type": basic_info.get("tipo_contratacao", "N/A"),
-                "main_activities": profile_info.get("principais_atividades", "N/A")
+def predict_match(
+    model_filename: str,
+    applicant_raw: RawApplicant,
+    response: Response,
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K, description="Number of vacancies to return."),
+    exhaustive: bool = Query(False, description="Score the full catalog instead of the skill-index candidates."),
+):
+    with request_timer("predict_match", response) as timer:
+        with timer.stage("model_resolve"):
+            model_entry = resolve_model(model_filename)
+        # One catalog version for the whole request, even if the catalog changes meanwhile
+        catalog = VACANCY_CATALOG.current
+        if PREDICTION_CACHE is not None:
+            with timer.stage("cache_lookup"):
+                cache_key = prediction_cache_key(applicant_raw, model_entry, catalog, top_k, exhaustive)
+                cached = PREDICTION_CACHE.get(cache_key, catalog.fingerprint)
+            response.headers[PREDICTION_CACHE_HEADER] = "miss" if cached is None else "hit"
+            if cached is not None:
+                # Hits are not written to the prediction log: it records each distinct scoring once
+                return {**cached, "applicant_id": applicant_raw.codigo_profissional or "N/A"}
+
+        with timer.stage("model_load"):
+            model_entry, model = load_model(model_entry.filename)
+        try:
+            with timer.stage("extract_features"):
+                # extract_features normalizes the CV the same way the response cache key does
+                applicant_features = extract_features(applicant_raw.cv_pt, 'applicant')
+
+            # Retrieval: skill-index candidates plus one representative set per feature group
+            with timer.stage("retrieval"):
+                rows = select_rows(catalog.matrix, applicant_features, top_k, exhaustive=exhaustive)
+            with timer.stage("features"):
+                df_predict = pd.DataFrame({"vaga_id": catalog.matrix.id_array[rows], **score_applicant(catalog.matrix, applicant_features, rows)})
+            with timer.stage("predict_proba"):
+                probabilities = predict_match_probabilities(model_entry, model, df_predict[FEATURE_COLUMNS])
+            df_predict['match_probability'] = probabilities
+
+            with timer.stage("ranking"):
+                top_positions = top_k_indices(probabilities, top_k)
+                top_matches_df = df_predict.iloc[top_positions]
+            with timer.stage("logging"):
+                PREDICTION_LOG.submit(df_predict, top_positions, model_entry.filename, applicant_raw.codigo_profissional)
+            with timer.stage("enrichment"):
+                top_matches_enriched = enrich_matches(catalog, top_matches_df)
+
+            result = {
+                "status": "success",
+                "applicant_id": applicant_raw.codigo_profissional or "N/A",
+                "model_used": model_entry.filename,
+                "vacancies_scored": len(df_predict),
+                "applicant_extracted_features": applicant_features,
+                "top_matches": top_matches_enriched
             }
-            top_matches_enriched.append(match)
+            if PREDICTION_CACHE is not None:
+                # Keyed by the model actually loaded, in case the file changed since it was resolved
+                PREDICTION_CACHE.put(prediction_cache_key(applicant_raw, model_entry, catalog, top_k, exhaustive), catalog.fingerprint, result)
+            return result
+        except Exception as e:
+            # Log error
+            logging.error(f"Prediction failed with error: {e}")
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@app.put("/vacancies/{vaga_id}")
+def upsert_vacancy(vaga_id: str, vacancy_raw: RawVacancy, response: Response):
+    """Adds or replaces a vacancy; requests started after the update already score it."""
+    raw_vaga = vacancy_raw.model_dump()
+    text = vacancy_text(raw_vaga)
+    if not text:
+        raise HTTPException(status_code=422, detail="The vacancy needs a title, main activities or required skills to extract features from.")
+    vaga_features = extract_features(text, 'vaga')
+    details = {name: MISSING_VALUE if value is None else value for name, value in project_vacancy(raw_vaga).items()}
+    catalog, created = VACANCY_CATALOG.upsert(vaga_id, vaga_features, details)
+    response.status_code = 201 if created else 200
+    return {
+        "status": "success",
+        "vaga_id": vaga_id,
+        "created": created,
+        "extracted_features": vaga_features,
+        "vaga_details": details,
+        "catalog_version": catalog.number,
+        "total_vacancies": len(catalog.features),
+    }
+
+@app.delete("/vacancies/{vaga_id}")
+def delete_vacancy(vaga_id: str):
+    """Closes a vacancy: it is no longer returned by /predict or accepted by top-applicants."""
+    try:
+        catalog = VACANCY_CATALOG.remove(vaga_id)
+    except VacancyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "success", "vaga_id": vaga_id, "catalog_version": catalog.number, "total_vacancies": len(catalog.features)}
+
+@app.get("/vacancies/{vaga_id}/top-applicants")
+def top_applicants_for_vacancy(
+    vaga_id: str,
+    model_filename: str = Query(LATEST_ALIAS, description="Model file to use, or 'latest'."),
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K, description="Page size."),
+    offset: int = Query(0, ge=0, description="Number of ranked applicants to skip."),
+):
+    catalog = VACANCY_CATALOG.current
+    vacancy_features = catalog.features.get(vaga_id)
+    if vacancy_features is None:
+        raise HTTPException(status_code=404, detail=f"Vacancy '{vaga_id}' not found.")
+    model_entry, model = load_model(model_filename)
+    try:
+        # Same retrieval as /predict, with the applicant pool as the indexed side
+        page_end = offset + top_k
+        rows = select_rows(APPLICANT_MATRIX, vacancy_features, page_end)
+        df_rank = pd.DataFrame(score_vacancy(APPLICANT_MATRIX, vacancy_features, rows))
+        probabilities = predict_match_probabilities(model_entry, model, df_rank[FEATURE_COLUMNS])
+        df_rank['match_probability'] = probabilities
 
+        # Applicant ids are attached to the requested page only
+        page = top_k_indices(probabilities, page_end)[offset:]
+        ranked_df = df_rank.iloc[page]
+        ranked_df.insert(0, "applicant_id", APPLICANT_MATRIX.id_array[rows[page]])
+        next_offset = page_end if page_end < len(APPLICANT_MATRIX) else None
         return {
             "status": "success",
-            "applicant_id": applicant_raw.codigo_profissional or "N/A",
-            "model_used": os.path.basename(model_path),
-            "applicant_extracted_features": applicant_features,
-            "top_matches": top_matches_enriched
+            "vaga_id": vaga_id,
+            "vaga_details": vacancy_details(catalog, vaga_id),
+            "model_used": model_entry.filename,
+            "total_applicants": len(APPLICANT_MATRIX),
+            "offset": offset,
+            "next_offset": next_offset,
+            "top_applicants": ranked_df.to_dict(orient='records')
         }
     except Exception as e:
-        # Log error
-        logging.error(f"Prediction failed with error: {e}")
+        logging.error(f"Reverse matching failed with error: {e}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+import time
+import threading
+from collections import deque
+
+# --- Configuration ---
+DEFAULT_WINDOW = 1024  # Most recent samples per series used for the quantiles
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "api_stage_latency_seconds"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+class _Series:
+    __slots__ = ("samples", "total", "count")
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+        self.count = 0
+
+
+class LatencyMetrics:
+    """
+    In-process latency summaries per (endpoint, stage).
+
+    observe() only appends to a bounded window and bumps a running sum and count, so
+    timing is cheap enough to stay on in production. Quantiles are computed when the
+    metrics are read, over the last `window` samples of each series; sum and count
+    cover the whole process lifetime, as Prometheus summaries expect.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, stage, seconds):
+        key = (endpoint, stage)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.samples.append(seconds)
+            series.total += seconds
+            series.count += 1
+
+    def timer(self, endpoint, headers=None):
+        """A RequestTimer for one call of `endpoint`; see RequestTimer."""
+        return RequestTimer(self, endpoint, headers)
+
+    def snapshot(self):
+        """{(endpoint, stage): {"count", "sum", "quantiles": {q: seconds}}}, sorted by key."""
+        with self._lock:
+            copies = {key: (list(series.samples), series.total, series.count) for key, series in self._series.items()}
+        summary = {}
+        for key in sorted(copies):
+            samples, total, count = copies[key]
+            samples.sort()
+            summary[key] = {
+                "count": count,
+                "sum": total,
+                "quantiles": {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES},
+            }
+        return summary
+
+    def render_prometheus(self):
+        """The summaries in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_NAME} Latency of API request stages (quantiles over the last {self.window} samples).",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for (endpoint, stage), series in self.snapshot().items():
+            labels = f'endpoint="{endpoint}",stage="{stage}"'
+            for q, seconds in series["quantiles"].items():
+                lines.append(f'{METRIC_NAME}{{{labels},quantile="{q}"}} {seconds:.9f}')
+            lines.append(f"{METRIC_NAME}_sum{{{labels}}} {series['sum']:.9f}")
+            lines.append(f"{METRIC_NAME}_count{{{labels}}} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def render_metric(name, metric_type, help_text, samples):
+    """
+    One counter or gauge in the Prometheus text format.
+
+    Args:
+        samples (list): (labels dict, value) pairs.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timer.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class RequestTimer:
+    """
+    Times one request. Used as a context manager around the handler body, with
+    `with timer.stage(name):` around each step; every stage is recorded as it ends
+    (also when it raises) and the request is recorded as stage 'total' on exit.
+
+    If `headers` (a mutable mapping, e.g. Response.headers) is given, the stage
+    durations are written to it as a Server-Timing header.
+    """
+
+    def __init__(self, metrics, endpoint, headers=None):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.headers = headers
+        self.stages = []  # (stage, seconds) in completion order
+        self.started = None
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        self.stages.append((name, seconds))
+        self.metrics.observe(self.endpoint, name, seconds)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record("total", time.perf_counter() - self.started)
+        if self.headers is not None:
+            self.headers[SERVER_TIMING_HEADER] = ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages)
+        return False
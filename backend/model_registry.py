@@ -0,0 +1,211 @@
+import os
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import joblib
+
+# --- Configuration ---
+DEFAULT_MAX_LOADED_MODELS = 4
+LATEST_ALIAS = "latest"
+
+
+class ModelNotFoundError(LookupError):
+    """Raised when a model filename (or the 'latest' alias) cannot be resolved."""
+
+
+class ModelEntry:
+    """Manifest entry describing one model file on disk."""
+
+    def __init__(self, filename, path, stat_result, content_hash):
+        self.filename = filename
+        self.path = path
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.size = stat_result.st_size
+        self.ctime = stat_result.st_ctime
+        self.content_hash = content_hash
+
+    def is_stale(self, stat_result):
+        return stat_result.st_mtime_ns != self.mtime_ns or stat_result.st_size != self.size
+
+    @property
+    def cache_key(self):
+        return (self.filename, self.content_hash)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Returns the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of deserialized models.
+
+    Models are kept in a bounded LRU keyed by (filename, content hash), so a file
+    that is rewritten in place is reloaded while unchanged files are never read twice.
+    The 'latest' alias is resolved from a cached manifest that is only rebuilt when
+    the model directory itself changes (a file is added, removed or renamed).
+    Objects derived from a loaded model (see attached()) live and die with that version.
+    Models are loaded outside the registry lock, so a slow load never blocks requests
+    for models already in memory; concurrent requests for the same version share one load.
+    """
+
+    def __init__(self, model_dir, max_loaded=DEFAULT_MAX_LOADED_MODELS, pattern='*.joblib', loader=joblib.load):
+        self.model_dir = model_dir
+        self.max_loaded = max_loaded
+        self.pattern = pattern
+        self.loader = loader
+        self._lock = threading.RLock()
+        self._manifest = {}
+        self._dir_mtime_ns = None
+        self._loaded = OrderedDict()
+        self._loading = {}  # cache_key -> Future of the load in progress
+        self._attached = {}
+
+    # --- Manifest ---
+    def _build_entry(self, filename, path, stat_result):
+        previous = self._manifest.get(filename)
+        if previous is not None and not previous.is_stale(stat_result):
+            return previous
+        return ModelEntry(filename, path, stat_result, hash_file(path))
+
+    def refresh(self, force=False):
+        """Rebuilds the manifest if the model directory changed (or if forced)."""
+        with self._lock:
+            try:
+                dir_mtime_ns = os.stat(self.model_dir).st_mtime_ns
+            except FileNotFoundError:
+                self._manifest = {}
+                self._dir_mtime_ns = None
+                return
+            if not force and dir_mtime_ns == self._dir_mtime_ns:
+                return
+
+            manifest = {}
+            for path in glob.glob(os.path.join(self.model_dir, self.pattern)):
+                filename = os.path.basename(path)
+                try:
+                    manifest[filename] = self._build_entry(filename, path, os.stat(path))
+                except FileNotFoundError:
+                    continue
+            self._manifest = manifest
+            self._dir_mtime_ns = dir_mtime_ns
+
+            # Drop loaded models whose file disappeared or changed
+            valid_keys = {entry.cache_key for entry in manifest.values()}
+            for key in [k for k in self._loaded if k not in valid_keys]:
+                self._forget(key)
+
+    def list_models(self):
+        """Returns the filenames of all known models, newest name first."""
+        self.refresh()
+        return sorted(self._manifest, reverse=True)
+
+    def resolve(self, model_filename):
+        """Returns the ModelEntry for a filename or the 'latest' alias."""
+        with self._lock:
+            self.refresh()
+            if model_filename == LATEST_ALIAS:
+                if not self._manifest:
+                    raise ModelNotFoundError("No trained model found.")
+                entry = max(self._manifest.values(), key=lambda e: e.ctime)
+            else:
+                entry = self._manifest.get(model_filename)
+                if entry is None:
+                    raise ModelNotFoundError(f"Model '{model_filename}' not found.")
+
+            # A file rewritten in place does not touch the directory mtime, so check it here
+            try:
+                stat_result = os.stat(entry.path)
+            except FileNotFoundError:
+                self.refresh(force=True)
+                raise ModelNotFoundError(f"Model '{entry.filename}' not found.")
+            if entry.is_stale(stat_result):
+                self._forget(entry.cache_key)
+                entry = self._build_entry(entry.filename, entry.path, stat_result)
+                self._manifest[entry.filename] = entry
+            return entry
+
+    # --- Loaded models ---
+    def _forget(self, key):
+        self._loaded.pop(key, None)
+        self._attached.pop(key, None)
+
+    def get(self, model_filename):
+        """Returns (entry, model), loading the model only on a cache miss."""
+        with self._lock:
+            entry = self.resolve(model_filename)
+            key = entry.cache_key
+            model = self._loaded.get(key)
+            if model is not None:
+                self._loaded.move_to_end(key)
+                return entry, model
+            pending = self._loading.get(key)
+            if pending is None:
+                future = self._loading[key] = Future()
+        if pending is not None:
+            return entry, pending.result()  # Loaded by another thread (its error is raised here too)
+
+        try:
+            model = self.loader(entry.path)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._loading.pop(key, None)
+            current = self._manifest.get(entry.filename)
+            # Not cached if the file changed or was invalidated while it was loading
+            if current is not None and current.cache_key == key:
+                self._loaded[key] = model
+                while len(self._loaded) > self.max_loaded:
+                    self._forget(next(iter(self._loaded)))
+        future.set_result(model)
+        return entry, model
+
+    def attached(self, entry, model, name, factory):
+        """
+        Returns the object stored under `name` for this model version, creating it with
+        factory(model) on first use. It is discarded when the model is evicted, rewritten
+        or removed, so it can never outlive the model it was derived from.
+        """
+        with self._lock:
+            key = entry.cache_key
+            if key not in self._loaded:
+                return factory(model)  # Evicted meanwhile; not worth keeping
+            slot = self._attached.setdefault(key, {})
+            if name not in slot:
+                slot[name] = factory(model)
+            return slot[name]
+
+    def invalidate(self, model_filename=None):
+        """Forgets one model (or everything) and forces a manifest rebuild on next access."""
+        with self._lock:
+            if model_filename is None:
+                self._loaded.clear()
+                self._attached.clear()
+                self._manifest = {}
+            else:
+                entry = self._manifest.pop(model_filename, None)
+                if entry is not None:
+                    self._forget(entry.cache_key)
+            self._dir_mtime_ns = None
+
+    def warm_up(self, model_filenames=(LATEST_ALIAS,)):
+        """Loads the given models ahead of the first request. Missing models are skipped."""
+        loaded = []
+        for model_filename in model_filenames:
+            try:
+                entry, _ = self.get(model_filename)
+                loaded.append(entry.filename)
+            except ModelNotFoundError:
+                continue
+        return loaded
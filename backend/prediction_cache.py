@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.ml.feature_cache import normalize_text
+
+# --- Configuration ---
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # Serialized size of the memory tier
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_DISK_ENTRIES = 200000
+TRIM_EVERY_PUTS = 1000  # Expired and excess disk rows are deleted every this many writes
+
+
+def prediction_key(cv_text, model_hash, model_filename, catalog_fingerprint, extractor_version, **params):
+    """
+    sha256 of everything a /predict response depends on: the normalized CV, the model
+    file (content and name, which the response echoes), the catalog content, the
+    feature extractor and the request parameters (top_k, exhaustive).
+    """
+    parts = [model_hash, model_filename, catalog_fingerprint, extractor_version, json.dumps(params, sort_keys=True), normalize_text(cv_text)]
+    return hashlib.sha256("\x00".join(parts).encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """
+    Memoized /predict responses, keyed by prediction_key().
+
+    The memory tier is an LRU bounded by entry count and serialized size; entries expire
+    after ttl_seconds. The optional disk tier (db_path) is a SQLite file shared by every
+    API worker, so a CV scored by one worker is a hit for the others.
+
+    A new model file or catalog version never matches existing keys, so stale responses
+    are unreachable as soon as either changes. When a lookup arrives with a catalog
+    fingerprint different from the previous one, the entries of other catalogs are also
+    dropped (memory and disk) instead of waiting for LRU or TTL eviction.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, db_path=None,
+                 max_bytes=DEFAULT_MAX_BYTES, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()  # key -> (expires_at, catalog, size, response)
+        self._memory_bytes = 0
+        self._catalog = None
+        self._connection = None
+        self._connection_pid = None
+        self._puts_since_trim = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "memory_evictions": 0, "expirations": 0, "invalidations": 0, "disk_evictions": 0}
+
+    # --- Disk tier ---
+    def _db(self):
+        if self.db_path is None:
+            return None
+        # Connections are not shared across fork (each uvicorn worker opens its own)
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, catalog TEXT NOT NULL, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _trim_disk(self, db):
+        self._puts_since_trim = 0
+        expired = db.execute("DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+        self._counters["expirations"] += expired
+        (count,) = db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            db.execute("DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_used LIMIT ?)", (excess,))
+            self._counters["disk_evictions"] += excess
+
+    # --- Memory tier ---
+    def _forget(self, key):
+        _, _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+
+    def _remember(self, key, expires_at, catalog, size, response):
+        if key in self._memory:
+            self._forget(key)
+        self._memory[key] = (expires_at, catalog, size, response)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or (self._memory_bytes > self.max_bytes and len(self._memory) > 1):
+            self._forget(next(iter(self._memory)))
+            self._counters["memory_evictions"] += 1
+
+    def _observe_catalog(self, catalog):
+        if catalog == self._catalog:
+            return
+        if self._catalog is not None:
+            stale = [key for key, entry in self._memory.items() if entry[1] != catalog]
+            for key in stale:
+                self._forget(key)
+            self._counters["invalidations"] += len(stale)
+            db = self._db()
+            if db is not None:
+                self._counters["invalidations"] += db.execute("DELETE FROM predictions WHERE catalog != ?", (catalog,)).rowcount
+        self._catalog = catalog
+
+    # --- Public API ---
+    def get(self, key, catalog):
+        """
+        The cached response for `key`, or None on a miss. The returned dict is shared:
+        callers must copy it before changing top-level fields.
+        """
+        now = time.time()
+        with self._lock:
+            self._observe_catalog(catalog)
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[3]
+                self._forget(key)
+                self._counters["expirations"] += 1
+            db = self._db()
+            row = None
+            if db is not None:
+                row = db.execute("SELECT response, created_at FROM predictions WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            db.execute("UPDATE predictions SET last_used = ? WHERE key = ?", (now, key))
+            response = json.loads(row[0])
+            self._remember(key, row[1] + self.ttl_seconds, catalog, len(row[0]), response)
+            self._counters["disk_hits"] += 1
+            return response
+
+    def put(self, key, catalog, response):
+        """Stores a response; it must not be modified afterwards."""
+        serialized = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._observe_catalog(catalog)
+            self._remember(key, now + self.ttl_seconds, catalog, len(serialized), response)
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, catalog, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, catalog, serialized, now, now),
+                )
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= TRIM_EVERY_PUTS:
+                    self._trim_disk(db)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM predictions")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+            counters["memory_bytes"] = self._memory_bytes
+            db = self._db()
+            counters["disk_entries"] = db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] if db is not None else 0
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_rate"] = (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        return counters
@@ -0,0 +1,192 @@
+import os
+import json
+import gzip
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+# --- Configuration ---
+SAMPLING_MODES = ("scored", "topk", "summary")
+
+# Column name -> Python type every written row is cast to. Missing values are written as null.
+PREDICTION_LOG_SCHEMA = {
+    "timestamp": str,
+    "request_id": str,
+    "model": str,
+    "applicant_id": str,
+    "vaga_id": str,
+    "rank": int,
+    "skill_match_score": float,
+    "level_match_score": float,
+    "applicant_skills_count": int,
+    "vacancy_skills_count": int,
+    "match_probability": float,
+    "n_scored": int,
+}
+
+
+def _cast(value, column_type):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return column_type(value)
+
+
+class PredictionLogSink:
+    """
+    Background writer for prediction logs.
+
+    Requests hand over their scored frame with submit(), which never blocks: items go to
+    a bounded in-memory queue and, when it is full, the newest item is dropped and counted
+    (drop-newest policy, see stats()). A daemon thread applies the sampling mode, batches
+    rows and appends them to gzip-compressed NDJSON files that rotate once they reach
+    max_file_bytes. Each flush is a separate gzip member, so a crash loses at most the
+    batch in flight and never corrupts earlier data. The column layout is fixed by
+    PREDICTION_LOG_SCHEMA, which is also written next to the logs as schema.json.
+
+    Sampling modes:
+        scored:  every (applicant, vacancy) row sent to the model. /predict scores only the
+                 retrieval candidates unless exhaustive=true, so these are a pruned subset of
+                 the catalog, not all of it
+        topk:    only the rows returned to the client
+        summary: one row per request (the best match) with n_scored set
+    """
+
+    def __init__(self, log_dir, sampling="scored", queue_size=1000, batch_rows=5000, flush_interval=1.0, max_file_bytes=64 * 1024 * 1024):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}'. Expected one of {SAMPLING_MODES}.")
+        self.log_dir = log_dir
+        self.sampling = sampling
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._counters = {"submitted": 0, "dropped": 0, "rows_written": 0, "flushes": 0, "write_errors": 0}
+        self._counter_lock = threading.Lock()
+        self._current_path = None
+        self._stop = threading.Event()
+
+        os.makedirs(log_dir, exist_ok=True)
+        with open(os.path.join(log_dir, "schema.json"), "w", encoding="utf-8") as f:
+            json.dump({name: column_type.__name__ for name, column_type in PREDICTION_LOG_SCHEMA.items()}, f, indent=4)
+
+        self._thread = threading.Thread(target=self._run, name="prediction-log-sink", daemon=True)
+        self._thread.start()
+
+    # --- Request side ---
+    def submit(self, scored_df, top_positions, model, applicant_id=None):
+        """
+        Queues one request's scored rows without blocking.
+
+        Args:
+            scored_df (pd.DataFrame): Rows sent to the model, with 'match_probability'.
+            top_positions (np.ndarray): Positions of the returned matches in scored_df, best first.
+            model (str): Model filename used.
+            applicant_id (str, optional): Applicant identifier, if known.
+
+        Returns:
+            bool: False if the item was dropped because the queue is full.
+        """
+        if self.sampling == "topk":
+            scored_df = scored_df.iloc[top_positions]
+            top_positions = np.arange(len(top_positions))
+        elif self.sampling == "summary":
+            n_scored = len(scored_df)
+            scored_df = scored_df.iloc[top_positions[:1]]
+            top_positions = np.arange(len(scored_df))
+        item = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "request_id": uuid.uuid4().hex,
+            "model": model,
+            "applicant_id": applicant_id,
+            "frame": scored_df,
+            "top_positions": top_positions,
+            "n_scored": n_scored if self.sampling == "summary" else None,
+        }
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        counters["queued"] = self._queue.qsize()
+        counters["sampling"] = self.sampling
+        return counters
+
+    def close(self, timeout=5.0):
+        """Flushes everything queued so far and stops the writer thread."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # --- Writer side ---
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def _rows(self, item):
+        frame = item["frame"]
+        ranks = np.full(len(frame), -1, dtype=np.int64)
+        ranks[item["top_positions"]] = np.arange(len(item["top_positions"]))
+        request_fields = {name: item[name] for name in ("timestamp", "request_id", "model", "applicant_id", "n_scored")}
+        columns = {name: frame[name].tolist() for name in PREDICTION_LOG_SCHEMA if name in frame.columns and name not in request_fields}
+        for i in range(len(frame)):
+            row = {name: values[i] for name, values in columns.items()}
+            row.update(request_fields)
+            row["rank"] = int(ranks[i]) if ranks[i] >= 0 else None
+            yield {name: _cast(row.get(name), column_type) for name, column_type in PREDICTION_LOG_SCHEMA.items()}
+
+    def _target_path(self):
+        if self._current_path is None or (os.path.exists(self._current_path) and os.path.getsize(self._current_path) >= self.max_file_bytes):
+            # Every API worker writes its own files: the pid keeps the names apart and 'xb' makes sure one is never shared
+            while True:
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S_%f")
+                path = os.path.join(self.log_dir, f"predictions-{stamp}-{os.getpid()}.ndjson.gz")
+                try:
+                    open(path, "xb").close()
+                    break
+                except FileExistsError:
+                    continue
+            self._current_path = path
+        return self._current_path
+
+    def _flush(self, items):
+        lines = [json.dumps(row, ensure_ascii=False) for item in items for row in self._rows(item)]
+        if not lines:
+            return
+        try:
+            with gzip.open(self._target_path(), "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            self._count("rows_written", len(lines))
+            self._count("flushes")
+        except OSError as e:
+            self._count("write_errors")
+            print(f"Prediction log flush failed: {e}")
+
+    def _run(self):
+        pending, pending_rows = [], 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                pending.append(item)
+                pending_rows += len(item["frame"])
+            except queue.Empty:
+                pass
+            due = time.monotonic() - last_flush >= self.flush_interval
+            stopping = self._stop.is_set()
+            if pending and (pending_rows >= self.batch_rows or due or stopping):
+                self._flush(pending)
+                pending, pending_rows = [], 0
+                last_flush = time.monotonic()
+            elif due:
+                last_flush = time.monotonic()
+            if stopping and self._queue.empty() and not pending:
+                return
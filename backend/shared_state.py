@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds are settled by the atomic rename alone
+    fcntl = None
+
+from src.ml.feature_matrix import FeatureMatrix
+from src.ml.model_metadata import file_fingerprint
+
+# --- Configuration ---
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = 'snapshot.json'
+FEATURES_BLOB = 'features.bin'  # Each entity's features as compact JSON, back to back in row order
+FEATURE_ARRAYS = ('features_offsets', 'sorted_ids', 'sorted_rows')
+KEEP_SNAPSHOTS = 2  # Per source file: the current one and the previous one (workers may still be switching)
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024  # PRAGMA mmap_size for the details store in shared mode
+
+
+def snapshot_path(source_path, root, fingerprint=None):
+    """data/processed/vacancies_enhanced.json -> <root>/vacancies_enhanced-<first 16 chars of its sha256>"""
+    fingerprint = fingerprint or file_fingerprint(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(root, f"{stem}-{fingerprint[:16]}")
+
+
+def build_snapshot(source_path, root):
+    """
+    Writes the snapshot of an enhanced file ({id: features}) under `root` unless it
+    already exists; returns its directory. The snapshot is written aside and renamed into
+    place, so readers only ever see complete snapshots.
+    """
+    with open(source_path, 'rb') as f:
+        raw = f.read()
+    # Hashed from the bytes parsed below, so the name always matches the content even if the file is replaced meanwhile
+    fingerprint = hashlib.sha256(raw).hexdigest()
+    directory = snapshot_path(source_path, root, fingerprint)
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        return directory
+    entities = json.loads(raw)
+    del raw
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    matrix = FeatureMatrix(entities)
+    matrix.save(tmp_dir)
+    offsets = np.zeros(len(matrix) + 1, dtype=np.int64)
+    with open(os.path.join(tmp_dir, FEATURES_BLOB), 'wb') as f:
+        for row, entity_id in enumerate(matrix.ids):
+            encoded = json.dumps(entities[entity_id], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            f.write(encoded)
+            offsets[row + 1] = offsets[row] + len(encoded)
+    order = np.argsort(matrix.id_array.astype(str), kind='stable')
+    arrays = {'features_offsets': offsets, 'sorted_ids': matrix.id_array.astype(str)[order], 'sorted_rows': order.astype(np.int64)}
+    for name in FEATURE_ARRAYS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), arrays[name], allow_pickle=False)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"format": SNAPSHOT_FORMAT, "source": os.path.abspath(source_path), "fingerprint": fingerprint,
+                   "entities": len(matrix), "created_at": datetime.now(timezone.utc).isoformat()}, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # Another process published it first
+    return directory
+
+
+def _prune_snapshots(source_path, root, keep=KEEP_SNAPSHOTS):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    snapshots = [path for path in glob.glob(os.path.join(root, f"{stem}-*")) if os.path.isdir(path) and not path.endswith('.tmp')]
+    # Processes still mapping a deleted snapshot keep reading it; the files go away with their last mapping
+    for path in sorted(snapshots, key=os.path.getmtime)[:-keep]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def ensure_snapshot(source_path, root):
+    """
+    The snapshot directory of `source_path`, built first if needed.
+
+    The build runs in a spawned child process, so the parsed JSON never lands in the
+    (long-lived) heap of the caller, and under a lock file, so workers starting together
+    build it once.
+
+    Raises:
+        FileNotFoundError: If the source file does not exist.
+    """
+    directory = snapshot_path(source_path, root)
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        return directory
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.build.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            return directory  # Built by the process that held the lock before us
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            directory = pool.submit(build_snapshot, source_path, root).result()
+        _prune_snapshots(source_path, root)
+    return directory
+
+
+class SnapshotFeatures(Mapping):
+    """
+    Read-only {id: features} over a snapshot. Nothing is decoded up front: ids are found
+    by binary search in the mapped sorted id array, and each value is parsed from the
+    mapped blob when it is read.
+    """
+
+    def __init__(self, directory):
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r', allow_pickle=False) for name in FEATURE_ARRAYS}
+        self._offsets = arrays['features_offsets']
+        self._sorted_ids = arrays['sorted_ids']
+        self._sorted_rows = arrays['sorted_rows']
+        self._ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r', allow_pickle=False)  # Row order (FeatureMatrix.save)
+        blob_path = os.path.join(directory, FEATURES_BLOB)
+        # np.memmap cannot map an empty file
+        self._blob = np.memmap(blob_path, dtype=np.uint8, mode='r') if os.path.getsize(blob_path) else np.zeros(0, dtype=np.uint8)
+
+    def _row(self, entity_id):
+        if not isinstance(entity_id, str) or not len(self._sorted_ids):
+            return None
+        position = int(np.searchsorted(self._sorted_ids, entity_id))
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == entity_id:
+            return int(self._sorted_rows[position])
+        return None
+
+    def __getitem__(self, entity_id):
+        row = self._row(entity_id)
+        if row is None:
+            raise KeyError(entity_id)
+        return json.loads(self._blob[self._offsets[row]:self._offsets[row + 1]].tobytes())
+
+    def __contains__(self, entity_id):
+        return self._row(entity_id) is not None
+
+    def __iter__(self):
+        return (str(entity_id) for entity_id in self._ids)
+
+    def __len__(self):
+        return len(self._sorted_ids)
+
+
+class Snapshot:
+    """A snapshot attached read-only: `matrix` (FeatureMatrix) and `features` (SnapshotFeatures) over memory-mapped files."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.fingerprint = manifest["fingerprint"]
+        self.matrix = FeatureMatrix.load(directory, mmap=True)
+        self.features = SnapshotFeatures(directory)
+
+
+def attach(source_path, root):
+    """
+    Attaches the snapshot of an enhanced file, building it first if needed.
+
+    Every process attaching the same snapshot maps the same files, so the arrays exist
+    once in the page cache however many workers serve them.
+
+    Raises:
+        FileNotFoundError: If the source file does not exist.
+    """
+    return Snapshot(ensure_snapshot(source_path, root))
+
+
+if __name__ == "__main__":
+    # Prebuilds the snapshots before the workers start (they would otherwise build them on first use)
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    root = os.getenv("SHARED_STATE_DIR", os.path.join(base_dir, 'data', 'serving'))
+    paths = sys.argv[1:] or [os.path.join(base_dir, 'data', 'processed', name) for name in ('vacancies_enhanced.json', 'applicants_enhanced.json')]
+    for source_path in paths:
+        if not os.path.exists(source_path):
+            print(f"-> Skipping {source_path}: file not found")
+            continue
+        print(f"-> Snapshot of {os.path.basename(source_path)}: {ensure_snapshot(source_path, root)}")
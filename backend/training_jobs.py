@@ -0,0 +1,342 @@
+import os
+import json
+import uuid
+import queue
+import sqlite3
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: the job store is only shared by the threads of one process
+    fcntl = None
+
+# --- Configuration ---
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+DEFAULT_MAX_PARALLEL = 1
+DEFAULT_HISTORY = 50  # Finished jobs kept for GET /jobs
+CHILD_NICENESS = 10  # Job processes yield the CPU to the API process
+POLL_INTERVAL = 0.2
+
+
+class JobNotFoundError(LookupError):
+    """Raised when a job id is unknown (or has been dropped from the history)."""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Managers created in this process; a job owned by this pid but by none of them belongs to an
+# earlier process that had the same pid
+_LIVE_OWNERS = set()
+
+
+def _pid_alive(pid):
+    if os.name != "posix":
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _run_job(target, params, events):
+    """Entry point of a job process: runs target(progress=..., **params) and reports back through `events`."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(CHILD_NICENESS)
+        except OSError:
+            pass
+
+    def progress(stage, fraction=None):
+        events.put(("progress", stage, fraction))
+
+    try:
+        result = target(progress=progress, **params)
+        events.put(("result", result, None))
+    except BaseException as e:
+        events.put(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+class TrainingJob:
+    """State of one job as exposed by the API."""
+
+    def __init__(self, job_id, key, params):
+        self.job_id = job_id
+        self.key = key
+        self.params = params
+        self.state = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "key": self.key,
+            "params": self.params,
+            "state": self.state,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["job_id"], data["key"], data["params"])
+        for name in ("state", "stage", "progress", "result", "error", "created_at", "started_at", "finished_at"):
+            setattr(job, name, data[name])
+        return job
+
+
+class TrainingJobManager:
+    """
+    Runs training jobs in separate processes so requests never wait on model fitting.
+
+    submit() is single-flight: while a job with the same key is queued or running, it
+    returns that job instead of starting another one. At most max_parallel jobs run at
+    once; the rest wait in FIFO order. Each running job has a watcher thread that reads
+    its progress events and records the outcome; on success on_success(result) is
+    called in the API process before the job is marked as succeeded (used to refresh
+    the model registry). Job processes are
+    started with 'spawn', which is safe in a multi-threaded server, and run at lower
+    CPU priority.
+
+    Jobs are recorded in SQLite: in memory by default, or in the file state_path, which
+    lets every API worker see the same jobs. Changes to a shared store are serialized by
+    a lock file, so single-flight and max_parallel hold across workers. Any worker can
+    answer for or cancel any job; the worker running it sees the cancellation on its next
+    poll and terminates the process. Jobs of a worker that exited are marked as failed,
+    and queued jobs are started by whichever worker has a free slot.
+    """
+
+    def __init__(self, target, max_parallel=DEFAULT_MAX_PARALLEL, history=DEFAULT_HISTORY, on_success=None, start_method="spawn", state_path=None):
+        self.target = target
+        self.max_parallel = max_parallel
+        self.history = history
+        self.on_success = on_success
+        self.state_path = state_path or None
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.RLock()
+        self._connection = None
+        self._connection_pid = None
+        self._owner = uuid.uuid4().hex
+        _LIVE_OWNERS.add(self._owner)
+        self._processes = {}  # Jobs run by this process: job_id -> Process
+
+    # --- Public API ---
+    def submit(self, key="train", **params):
+        """
+        Queues a job, or joins the queued/running job with the same key.
+
+        Returns:
+            tuple: (job dict, created) where created is False for a deduplicated request.
+        """
+        with self._exclusive() as db:
+            self._reap(db)
+            row = db.execute("SELECT data FROM jobs WHERE key = ? AND state IN ('queued', 'running') ORDER BY seq LIMIT 1", (key,)).fetchone()
+            if row is not None:
+                return json.loads(row[0]), False
+            job = TrainingJob(uuid.uuid4().hex, key, params)
+            self._store(db, job)
+            self._start_waiting(db)
+            self._trim_history(db)
+            return self._job(db, job.job_id).to_dict(), True
+
+    def get(self, job_id):
+        with self._exclusive() as db:
+            self._reap(db)
+            return self._job(db, job_id).to_dict()
+
+    def list_jobs(self):
+        with self._exclusive() as db:
+            self._reap(db)
+            return [json.loads(data) for (data,) in db.execute("SELECT data FROM jobs ORDER BY seq DESC")]
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or running job (a running job's process is terminated).
+
+        Returns:
+            tuple: (job dict, cancelled) where cancelled is False if the job had already finished.
+        """
+        with self._exclusive() as db:
+            job = self._job(db, job_id)
+            if job.state in FINISHED_STATES:
+                return job.to_dict(), False
+            process = self._processes.get(job_id)
+            if process is not None:
+                process.terminate()
+            # A job running in another worker is terminated by that worker's watcher
+            self._finish(db, job, "cancelled", error="Cancelled by request.")
+            self._start_waiting(db)
+            return job.to_dict(), True
+
+    def shutdown(self):
+        """Cancels the jobs run by this process (and, with a private store, the queued ones)."""
+        with self._exclusive() as db:
+            if self.state_path is None:
+                active = [job_id for (job_id,) in db.execute("SELECT job_id FROM jobs WHERE state IN ('queued', 'running')")]
+            else:
+                active = list(self._processes)
+        for job_id in active:
+            self.cancel(job_id)
+
+    # --- Job store ---
+    def _db(self):
+        # Connections are not shared across fork (each uvicorn worker opens its own)
+        if self._connection is None or self._connection_pid != os.getpid():
+            if self.state_path is not None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            connection = sqlite3.connect(self.state_path or ":memory:", timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT UNIQUE NOT NULL, key TEXT NOT NULL, "
+                "state TEXT NOT NULL, owner_pid INTEGER, owner TEXT, data TEXT NOT NULL)"
+            )
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _exclusive(self):
+        """The job store, locked against the other threads of this process and (with state_path) the other workers."""
+        with self._lock:
+            if self.state_path is None or fcntl is None:
+                yield self._db()
+                return
+            db = self._db()
+            with open(f"{self.state_path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # Released on close
+                yield db
+
+    def _store(self, db, job, owned=False):
+        owner_pid, owner = (os.getpid(), self._owner) if owned else (None, None)
+        db.execute(
+            "INSERT INTO jobs (job_id, key, state, owner_pid, owner, data) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, owner_pid = excluded.owner_pid, owner = excluded.owner, data = excluded.data",
+            (job.job_id, job.key, job.state, owner_pid, owner, json.dumps(job.to_dict())),
+        )
+
+    def _state(self, job_id):
+        with self._lock:
+            row = self._db().execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    # --- Internals (called with the store locked) ---
+    def _job(self, db, job_id):
+        row = db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Job '{job_id}' not found.")
+        return TrainingJob.from_dict(json.loads(row[0]))
+
+    def _finish(self, db, job, state, result=None, error=None):
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished_at = _now()
+        if state == "succeeded":
+            job.progress = 1.0
+        self._store(db, job)
+        self._processes.pop(job.job_id, None)
+
+    def _reap(self, db):
+        """Fails the running jobs whose worker exited (or restarted under the same pid), then fills the free slots."""
+        orphans = [
+            job_id for job_id, owner_pid, owner in db.execute("SELECT job_id, owner_pid, owner FROM jobs WHERE state = 'running'")
+            if not _pid_alive(owner_pid) or (owner_pid == os.getpid() and owner not in _LIVE_OWNERS)
+        ]
+        for job_id in orphans:
+            self._finish(db, self._job(db, job_id), "failed", error="The API worker running this job exited.")
+        if orphans:
+            self._start_waiting(db)
+
+    def _trim_history(self, db):
+        finished = [job_id for (job_id,) in db.execute(f"SELECT job_id FROM jobs WHERE state IN {FINISHED_STATES} ORDER BY seq")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def _start_waiting(self, db):
+        (running,) = db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()
+        while running < self.max_parallel:
+            row = db.execute("SELECT data FROM jobs WHERE state = 'queued' ORDER BY seq LIMIT 1").fetchone()
+            if row is None:
+                break
+            job = TrainingJob.from_dict(json.loads(row[0]))
+            events = self._context.Queue()
+            process = self._context.Process(target=_run_job, args=(self.target, job.params, events), name=f"training-job-{job.job_id[:8]}", daemon=True)
+            process.start()
+            job.state = "running"
+            job.started_at = _now()
+            self._processes[job.job_id] = process
+            self._store(db, job, owned=True)
+            threading.Thread(target=self._watch, args=(job.job_id, process, events), name=f"training-watch-{job.job_id[:8]}", daemon=True).start()
+            running += 1
+
+    # --- Watcher thread ---
+    def _watch(self, job_id, process, events):
+        outcome = None
+        while outcome is None:
+            try:
+                kind, value, detail = events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                if self._state(job_id) != "running":
+                    process.terminate()  # Cancelled through another worker
+                continue
+            if kind == "progress":
+                with self._exclusive() as db:
+                    job = self._job(db, job_id)
+                    if job.state == "running":
+                        job.stage = value
+                        if detail is not None:
+                            job.progress = float(detail)
+                        self._store(db, job, owned=True)
+            else:
+                outcome = (kind, value, detail)
+        process.join()
+
+        # The model registry is refreshed before the job reports success, so a client that
+        # sees 'succeeded' can use the new model straight away
+        callback_error = None
+        if outcome is not None and outcome[0] == "result" and outcome[1] is not None and self.on_success is not None:
+            try:
+                self.on_success(outcome[1])
+            except Exception as e:
+                callback_error = f"{type(e).__name__}: {e}"
+
+        with self._exclusive() as db:
+            job = self._job(db, job_id)
+            if job.state != "running":
+                self._processes.pop(job_id, None)
+                return  # Cancelled while running; already recorded
+            if outcome is None:
+                self._finish(db, job, "failed", error=f"Job process exited with code {process.exitcode} without reporting a result.")
+            elif outcome[0] == "error":
+                self._finish(db, job, "failed", error=outcome[1])
+                print(f"Training job {job.job_id} failed:\n{outcome[2]}")
+            elif outcome[1] is None:
+                self._finish(db, job, "failed", error="Training finished without producing a model (see the API logs).")
+            elif callback_error is not None:
+                self._finish(db, job, "failed", result=outcome[1], error=f"Post-training step failed: {callback_error}")
+            else:
+                self._finish(db, job, "succeeded", result=outcome[1])
+            self._start_waiting(db)
+            self._trim_history(db)
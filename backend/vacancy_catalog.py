@@ -0,0 +1,290 @@
+import os
+import json
+import hashlib
+import threading
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: journal appends are not locked
+    fcntl = None
+
+from src.ml.feature_matrix import FeatureMatrix, SkillVocabulary
+from src.ml.model_metadata import file_fingerprint
+from backend import shared_state
+
+# --- Configuration ---
+DEFAULT_POLL_SECONDS = 2.0
+
+
+class VacancyNotFoundError(LookupError):
+    """Raised when a vacancy id is not in the catalog."""
+
+
+def chain_fingerprint(fingerprint, change):
+    """Fingerprint after applying a journaled change (its timestamp excluded)."""
+    payload = json.dumps({key: value for key, value in change.items() if key != "at"}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(f"{fingerprint}\n{payload}".encode('utf-8')).hexdigest()
+
+
+class FeatureOverlay(Mapping):
+    """
+    Read-only {vaga_id: features}: a base mapping (the enhanced file) with upserted and
+    removed vacancies on top. A change copies only the overlay, never the base.
+    `removed` only holds base ids that are not upserted again; `moved` holds the base ids
+    upserted again after a removal. Iteration follows FeatureMatrix.updated(): base ids
+    first, then upserted ids that are new or moved, so every process lays out its rows alike.
+    """
+
+    def __init__(self, base, upserts=None, removed=(), moved=()):
+        self.base = base
+        self.upserts = dict(upserts or {})
+        self.removed = frozenset(removed)
+        self.moved = frozenset(moved)
+
+    def __getitem__(self, vaga_id):
+        if vaga_id in self.upserts:
+            return self.upserts[vaga_id]
+        if vaga_id in self.removed:
+            raise KeyError(vaga_id)
+        return self.base[vaga_id]
+
+    def __contains__(self, vaga_id):
+        return vaga_id in self.upserts or (vaga_id not in self.removed and vaga_id in self.base)
+
+    def __iter__(self):
+        for vaga_id in self.base:
+            if vaga_id not in self.removed and vaga_id not in self.moved:
+                yield vaga_id
+        for vaga_id in self.upserts:
+            if vaga_id in self.moved or vaga_id not in self.base:
+                yield vaga_id
+
+    def __len__(self):
+        return len(self.base) + sum(vaga_id not in self.base for vaga_id in self.upserts) - len(self.removed)
+
+    def with_upsert(self, vaga_id, features):
+        moved = self.moved | {vaga_id} if vaga_id in self.removed else self.moved
+        return FeatureOverlay(self.base, {**self.upserts, vaga_id: features}, self.removed - {vaga_id}, moved)
+
+    def with_removal(self, vaga_id):
+        upserts = {key: value for key, value in self.upserts.items() if key != vaga_id}
+        return FeatureOverlay(self.base, upserts, self.removed | {vaga_id} if vaga_id in self.base else self.removed, self.moved - {vaga_id})
+
+
+class CatalogVersion:
+    """
+    One immutable version of the catalog.
+
+    Attributes:
+        number (int): Increases with every change (per process).
+        fingerprint (str): Content hash (enhanced file plus the changes applied on top),
+            equal in every process serving the same catalog.
+        features (FeatureOverlay): {vaga_id: enhanced features}.
+        matrix (FeatureMatrix): Scoring structures built from `features`.
+        details (dict): Display fields of vacancies added or changed through the API,
+            which the details store built by the pipeline does not know about.
+    """
+
+    def __init__(self, number, fingerprint, features, matrix, details, source):
+        self.number = number
+        self.fingerprint = fingerprint
+        self.features = features
+        self.matrix = matrix
+        self.details = details
+        self.source = source
+        self.created_at = datetime.now(timezone.utc).isoformat()
+
+    def to_dict(self):
+        return {"version": self.number, "fingerprint": self.fingerprint, "vacancies": len(self.features), "api_changes": len(self.details), "source": self.source, "created_at": self.created_at}
+
+
+class VacancyCatalog:
+    """
+    The vacancy catalog served by the API, replaceable without a restart.
+
+    Requests read `current` once and use that CatalogVersion until they finish, so a
+    change never alters the data under an in-flight request and readers never wait on
+    a lock. Writers (upsert, remove and reloads of the enhanced file) build the next
+    version aside, one at a time, and publish it with a single reference assignment.
+    upsert/remove only parse the changed vacancy (FeatureMatrix.updated).
+
+    Changes made through the API are appended to a journal (JSON lines) and replayed on
+    top of the enhanced file at every load, so they survive restarts and pipeline
+    re-runs until the journal is deleted. A watcher thread reloads the catalog when the
+    size or mtime of the file or of the journal changes, so with several API workers a
+    change made through one of them reaches the others within poll_seconds.
+
+    With shared_root (see backend.shared_state), the enhanced file is not parsed: the
+    catalog attaches its memory-mapped snapshot, shared by every worker, and only the
+    journaled changes are held in process memory.
+    """
+
+    def __init__(self, path, journal_path, vocabulary=None, poll_seconds=DEFAULT_POLL_SECONDS, shared_root=None):
+        self.path = path
+        self.journal_path = journal_path
+        self.vocabulary = vocabulary if vocabulary is not None else SkillVocabulary()
+        self.poll_seconds = poll_seconds
+        self.shared_root = shared_root
+        self._write_lock = threading.Lock()
+        self._signature = None
+        self._stop = threading.Event()
+        self._watcher = None
+        self.current = CatalogVersion(0, "empty", FeatureOverlay({}), FeatureMatrix({}, vocabulary=self.vocabulary), {}, "empty")
+
+    # --- Loading ---
+    @staticmethod
+    def _stat_signature(path):
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+
+    def _file_signature(self):
+        return (self._stat_signature(self.path), self._stat_signature(self.journal_path))
+
+    def _read_journal(self):
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def load(self):
+        """
+        (Re)builds the catalog from the enhanced file plus the journal and publishes it.
+
+        Raises:
+            FileNotFoundError: If the enhanced file does not exist (the journal alone is still applied).
+        """
+        with self._write_lock:
+            missing = self._load()
+        if missing is not None:
+            raise missing
+        return self.current
+
+    def _load(self):
+        """load() with the write lock held; returns the FileNotFoundError of a missing file instead of raising it."""
+        # Taken before reading: if a file changes meanwhile, the next check reloads again
+        signature = self._file_signature()
+        base, matrix, missing, fingerprint = {}, None, None, "missing"
+        try:
+            if self.shared_root:
+                snapshot = shared_state.attach(self.path, self.shared_root)
+                base, matrix, fingerprint = snapshot.features, snapshot.matrix, snapshot.fingerprint
+            else:
+                fingerprint = file_fingerprint(self.path)
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    base = json.load(f)
+        except FileNotFoundError as e:
+            missing = e
+        features, details = FeatureOverlay(base), {}
+        for change in self._read_journal():
+            fingerprint = chain_fingerprint(fingerprint, change)
+            if change["op"] == "upsert":
+                features = features.with_upsert(change["vaga_id"], change["features"])
+                details[change["vaga_id"]] = change["details"]
+            else:
+                features = features.with_removal(change["vaga_id"])
+                details.pop(change["vaga_id"], None)
+        if matrix is None:
+            matrix = FeatureMatrix(dict(features.items()), vocabulary=self.vocabulary)
+        elif features.upserts or features.removed:
+            # The snapshot stays mapped; only the changed rows are parsed and copied (moved rows go to the end)
+            matrix = matrix.updated(features.upserts, features.removed | features.moved)
+        self._publish(fingerprint, features, matrix, details, "file")
+        self._signature = signature
+        return missing
+
+    def reload_if_changed(self):
+        """Reloads the catalog if the enhanced file or the journal changed since the last load; returns True if it did."""
+        if self._file_signature() == self._signature:
+            return False
+        self.load()
+        return True
+
+    # --- Changes ---
+    def _publish(self, fingerprint, features, matrix, details, source):
+        self.current = CatalogVersion(self.current.number + 1, fingerprint, features, matrix, details, source)
+
+    def _journal(self, change):
+        """
+        Appends a change; returns False if the journal also holds changes this process has
+        not loaded yet (written by another worker), in which case the caller reloads.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)  # Released on close
+            up_to_date = self._signature is not None and self._stat_signature(self.journal_path) == self._signature[1]
+            f.write(json.dumps(change, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            if up_to_date:
+                # Our own write must not trigger a reload
+                self._signature = (self._signature[0], self._stat_signature(self.journal_path))
+        return up_to_date
+
+    def upsert(self, vaga_id, vaga_features, vaga_details):
+        """
+        Adds or replaces one vacancy.
+
+        Returns:
+            tuple: (new CatalogVersion, created) where created is False for a replacement.
+        """
+        with self._write_lock:
+            current = self.current
+            change = {"op": "upsert", "vaga_id": vaga_id, "features": vaga_features, "details": vaga_details, "at": datetime.now(timezone.utc).isoformat()}
+            if not self._journal(change):
+                self._load()
+                return self.current, vaga_id not in current.features
+            details = dict(current.details)
+            details[vaga_id] = vaga_details
+            self._publish(chain_fingerprint(current.fingerprint, change), current.features.with_upsert(vaga_id, vaga_features),
+                          current.matrix.updated({vaga_id: vaga_features}), details, "api")
+            return self.current, vaga_id not in current.features
+
+    def remove(self, vaga_id):
+        """
+        Closes one vacancy.
+
+        Raises:
+            VacancyNotFoundError: If the vacancy is not in the catalog.
+        """
+        with self._write_lock:
+            current = self.current
+            if vaga_id not in current.features:
+                raise VacancyNotFoundError(f"Vacancy '{vaga_id}' not found.")
+            change = {"op": "delete", "vaga_id": vaga_id, "at": datetime.now(timezone.utc).isoformat()}
+            if not self._journal(change):
+                self._load()
+                return self.current
+            details = dict(current.details)
+            details.pop(vaga_id, None)
+            self._publish(chain_fingerprint(current.fingerprint, change), current.features.with_removal(vaga_id),
+                          current.matrix.updated(removals=[vaga_id]), details, "api")
+            return self.current
+
+    # --- File watcher ---
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self.reload_if_changed():
+                    print(f"Vacancy catalog reloaded from {self.path} (version {self.current.number}, {len(self.current.features)} vacancies).")
+            except Exception as e:
+                # Keep serving the current version; the file is checked again on the next poll
+                print(f"Vacancy catalog reload failed: {type(e).__name__}: {e}")
+
+    def start_watching(self):
+        if self.poll_seconds > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="vacancy-catalog-watch", daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_seconds + 1)
+            self._watcher = None
@@ -3,41 +3,43 @@ import requests
 import pandas as pd
 import json
 import os
+import sys
+import time
+import numpy as np
 import matplotlib.pyplot as plt
 
 # --- Settings ---
 API_BASE_URL = "http://backend:8000"
+TRAINING_POLL_SECONDS = 2
+TRAINING_PAGE_SIZES = [50, 100, 500, 1000]
+DRIFT_REFRESH_SECONDS = 30
+DRIFT_PLOT_BINS = 20
+PSI_LEVEL_LABELS = {"stable": "estável", "moderate": "moderado", "significant": "significativo"}
 
 # --- Path Logic ---
 try:
     BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     TRAINING_DATA_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'training_dataset.json')
-    PREDICTIONS_LOG_PATH = os.path.join(BASE_DIR, 'predictions.log')
 except NameError:
     BASE_DIR = os.path.abspath('.')
     TRAINING_DATA_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'training_dataset.json')
-    PREDICTIONS_LOG_PATH = os.path.join(BASE_DIR, 'predictions.log')
+
+sys.path.insert(0, BASE_DIR)
+from src.ml.processed_store import TRAINING_DATASET_SCHEMA
+
+TRAINING_DATA_COLUMNS = TRAINING_DATASET_SCHEMA.names
 
 # --- Dashboard panel ---
-@st.cache_data
-def load_monitoring_data():
-    """Carrega os dados de treinamento e os logs de predição para o painel."""
-    try:
-        training_df = pd.read_json(TRAINING_DATA_PATH)
-    except FileNotFoundError:
-        training_df = pd.DataFrame()
+@st.cache_data(ttl=DRIFT_REFRESH_SECONDS)
+def load_drift_summary(windows):
+    """Busca no backend as estatísticas de drift já agregadas (tamanho constante, independente do volume de logs)."""
+    response = requests.get(f"{API_BASE_URL}/monitoring/drift", params={"windows": windows})
+    response.raise_for_status()
+    return response.json()
 
-    try:
-        log_lines = []
-        with open(PREDICTIONS_LOG_PATH, 'r', encoding='utf-8') as f:
-            for line in f:
-                json_part = line.split(' - ')[-1]
-                log_lines.append(json.loads(json_part))
-        predictions_df = pd.DataFrame(log_lines)
-    except (FileNotFoundError, json.JSONDecodeError, IndexError):
-        predictions_df = pd.DataFrame()
-        
-    return training_df, predictions_df
+def rebin(histogram, bins):
+    """Soma bins finos adjacentes para exibição."""
+    return np.asarray(histogram).reshape(bins, -1).sum(axis=1)
 
 # --- Main UI---
 st.set_page_config(layout="wide")
@@ -53,15 +55,36 @@ if page == "Aplicação Principal":
 
     st.sidebar.header("Ações do Modelo")
     if st.sidebar.button("Treinar Novo Modelo"):
-        with st.spinner("Treinamento em andamento... Isso pode levar alguns minutos."):
-            try:
-                response = requests.post(f"{API_BASE_URL}/train")
-                if response.status_code == 201:
-                    st.sidebar.success(f"Novo modelo treinado com sucesso! Arquivo: {response.json().get('new_model_file')}")
+        try:
+            response = requests.post(f"{API_BASE_URL}/train")
+            if response.status_code == 202:
+                # Training runs as a background job on the API; poll it until it finishes
+                job_id = response.json()["job_id"]
+                progress_bar = st.sidebar.progress(0.0, text="Treinamento na fila...")
+                while True:
+                    job_response = requests.get(f"{API_BASE_URL}/jobs/{job_id}")
+                    if job_response.status_code != 200:
+                        job = None
+                        break
+                    job = job_response.json()
+                    if job["state"] in ("succeeded", "failed", "cancelled"):
+                        break
+                    progress_bar.progress(job["progress"], text=f"Treinamento em andamento: {job['stage'] or 'iniciando'}...")
+                    time.sleep(TRAINING_POLL_SECONDS)
+                progress_bar.empty()
+                if job is None:
+                    st.sidebar.error(f"Não foi possível consultar o job de treinamento: {job_response.text}")
+                elif job["state"] == "succeeded":
+                    result = job["result"]
+                    st.sidebar.success(f"Novo modelo treinado com sucesso! Arquivo: {result['new_model_file']} (acurácia: {result['accuracy']:.2%})")
+                elif job["state"] == "cancelled":
+                    st.sidebar.warning("O treinamento foi cancelado.")
                 else:
-                    st.sidebar.error(f"O treinamento falhou: {response.text}")
-            except requests.exceptions.RequestException as e:
-                st.sidebar.error(f"Erro de conexão com a API: {e}")
+                    st.sidebar.error(f"O treinamento falhou: {job['error']}")
+            else:
+                st.sidebar.error(f"O treinamento falhou: {response.text}")
+        except requests.exceptions.RequestException as e:
+            st.sidebar.error(f"Erro de conexão com a API: {e}")
 
     st.header("1. Avaliar Desempenho do Modelo")
     col1, col2 = st.columns(2)
@@ -133,36 +156,54 @@ if page == "Aplicação Principal":
                 applicant_data_full = json.loads(input_json_str)
                 applicant_data_to_send = next(iter(applicant_data_full.values()))
                 
-                with st.spinner("Encontrando as melhores correspondências..."):
-                    predict_response = requests.post(f"{API_BASE_URL}/predict/latest", json=applicant_data_to_send)
+                if len(applicant_data_full) > 1:
+                    # Several applicants: score them all in a single request
+                    with st.spinner(f"Encontrando as melhores correspondências para {len(applicant_data_full)} candidatos..."):
+                        batch_response = requests.post(f"{API_BASE_URL}/predict/batch", json=applicant_data_full)
+
+                    if batch_response.status_code == 200:
+                        batch_results = batch_response.json()
+                        st.success(f"Predição em lote completa para {batch_results['applicants_scored']} candidatos usando o modelo: `{batch_results['model_used']}`")
+                        for result in batch_results.get('results', []):
+                            extracted_features = result.get('applicant_extracted_features', {})
+                            with st.expander(f"**Candidato {result.get('applicant_id')}** - Nível: {extracted_features.get('experience_level', 'N/A').capitalize()}"):
+                                st.info(f"**Habilidades:** {', '.join(extracted_features.get('technical_skills', [])) or 'Nenhuma encontrada'}")
+                                for match in result.get('top_matches', []):
+                                    vaga_details = match.get('vaga_details', {})
+                                    st.markdown(f"- **{vaga_details.get('title', 'N/A')}** (`{match.get('vaga_id')}`) - Probabilidade de Match: {match.get('match_probability', 0):.2%}")
+                    else:
+                        st.error(f"A predição em lote falhou: {batch_response.text}")
+                else:
+                    with st.spinner("Encontrando as melhores correspondências..."):
+                        predict_response = requests.post(f"{API_BASE_URL}/predict/latest", json=applicant_data_to_send)
 
-                    if predict_response.status_code == 200:
-                        results = predict_response.json()
-                        st.success(f"Predição completa usando o modelo: `{results['model_used']}`")
+                        if predict_response.status_code == 200:
+                            results = predict_response.json()
+                            st.success(f"Predição completa usando o modelo: `{results['model_used']}`")
                         
-                        st.subheader("Características do Candidato (Extraídas pelo Gemini)")
-                        extracted_features = results.get('applicant_extracted_features', {})
-                        cols = st.columns(3)
-                        cols[0].metric("Nível de Experiência", extracted_features.get('experience_level', 'N/A').capitalize())
-                        cols[1].info(f"**Habilidades:** {', '.join(extracted_features.get('technical_skills', [])) or 'Nenhuma encontrada'}")
-                        cols[2].info(f"**Idiomas:** {json.dumps(extracted_features.get('languages', {})) or 'Nenhum encontrado'}")
+                            st.subheader("Características do Candidato (Extraídas pelo Gemini)")
+                            extracted_features = results.get('applicant_extracted_features', {})
+                            cols = st.columns(3)
+                            cols[0].metric("Nível de Experiência", extracted_features.get('experience_level', 'N/A').capitalize())
+                            cols[1].info(f"**Habilidades:** {', '.join(extracted_features.get('technical_skills', [])) or 'Nenhuma encontrada'}")
+                            cols[2].info(f"**Idiomas:** {json.dumps(extracted_features.get('languages', {})) or 'Nenhum encontrado'}")
                         
-                        st.subheader("Top 5 Vagas Correspondentes")
+                            st.subheader("Top 5 Vagas Correspondentes")
                         
-                        for match in results.get('top_matches', []):
-                            probability = match.get('match_probability', 0)
-                            vaga_details = match.get('vaga_details', {})
-                            with st.expander(f"**{vaga_details.get('title', 'N/A')}** - Probabilidade de Match: {probability:.2%}"):
-                                st.markdown(f"**ID da Vaga:** `{match.get('vaga_id')}`")
-                                st.markdown(f"**Cliente:** {vaga_details.get('client', 'N/A')}")
-                                st.markdown(f"**Tipo de Contrato:** {vaga_details.get('contract_type', 'N/A')}")
-                                st.markdown(f"**Pontuação de Habilidades:** {match.get('skill_match_score', 0):.2f}")
-                                st.markdown("---")
-                                st.markdown("**Principais Atividades:**")
-                                st.info(vaga_details.get('main_activities', 'Não especificado.'))
+                            for match in results.get('top_matches', []):
+                                probability = match.get('match_probability', 0)
+                                vaga_details = match.get('vaga_details', {})
+                                with st.expander(f"**{vaga_details.get('title', 'N/A')}** - Probabilidade de Match: {probability:.2%}"):
+                                    st.markdown(f"**ID da Vaga:** `{match.get('vaga_id')}`")
+                                    st.markdown(f"**Cliente:** {vaga_details.get('client', 'N/A')}")
+                                    st.markdown(f"**Tipo de Contrato:** {vaga_details.get('contract_type', 'N/A')}")
+                                    st.markdown(f"**Pontuação de Habilidades:** {match.get('skill_match_score', 0):.2f}")
+                                    st.markdown("---")
+                                    st.markdown("**Principais Atividades:**")
+                                    st.info(vaga_details.get('main_activities', 'Não especificado.'))
 
-                    else:
-                        st.error(f"A predição falhou: {predict_response.text}")
+                        else:
+                            st.error(f"A predição falhou: {predict_response.text}")
 
             except (json.JSONDecodeError, StopIteration):
                 st.error("Formato de JSON inválido. Por favor, verifique os dados. O formato esperado é {'ID_CANDIDATO': { ...dados... }}")
@@ -173,58 +214,118 @@ if page == "Aplicação Principal":
 
     st.header("3. Navegar pelo Conjunto de Dados de Treinamento")
     if st.checkbox("Carregar e Mostrar Dados de Treinamento"):
+        # The API filters, sorts and paginates; only the current page is fetched and rendered
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            hired_filter = st.selectbox("Contratado", ["Todos", "Sim", "Não"])
+            vaga_filter = st.text_input("ID da vaga")
+        with col2:
+            skill_range = st.slider("skill_match_score", 0.0, 1.0, (0.0, 1.0))
+            level_range = st.slider("level_match_score", 0.0, 1.0, (0.0, 1.0))
+        with col3:
+            sort_by = st.selectbox("Ordenar por", ["(ordem do arquivo)"] + TRAINING_DATA_COLUMNS)
+            descending = st.checkbox("Ordem decrescente")
+            page_size = st.selectbox("Linhas por página", TRAINING_PAGE_SIZES, index=1)
+        selected_columns = st.multiselect("Colunas", TRAINING_DATA_COLUMNS, default=TRAINING_DATA_COLUMNS)
+
+        params = {"limit": page_size, "columns": ",".join(selected_columns) or None, "descending": descending}
+        if hired_filter != "Todos":
+            params["hired"] = 1 if hired_filter == "Sim" else 0
+        if vaga_filter.strip():
+            params["vaga_id"] = vaga_filter.strip()
+        if skill_range != (0.0, 1.0):
+            params["min_skill_match_score"], params["max_skill_match_score"] = skill_range
+        if level_range != (0.0, 1.0):
+            params["min_level_match_score"], params["max_level_match_score"] = level_range
+        if sort_by in TRAINING_DATA_COLUMNS:
+            params["sort_by"] = sort_by
+
+        # A new filter or sort starts again from the first page; the stack holds the cursor of each visited page
+        query_signature = json.dumps(params, sort_keys=True)
+        if st.session_state.get("training_query") != query_signature:
+            st.session_state.training_query = query_signature
+            st.session_state.training_cursors = [None]
+        cursors = st.session_state.training_cursors
+
         try:
-            st.info(f"Tentando carregar dados de: {TRAINING_DATA_PATH}")
-            df_training = pd.read_json(TRAINING_DATA_PATH)
-            st.dataframe(df_training)
-        except FileNotFoundError:
-            st.error(f"Não foi possível encontrar o conjunto de dados de treinamento em {TRAINING_DATA_PATH}. Por favor, certifique-se de que o arquivo existe.")
-        except Exception as e:
-            st.error(f"Ocorreu um erro: {e}")
+            data_response = requests.get(f"{API_BASE_URL}/training-data", params={**params, "cursor": cursors[-1]})
+            if data_response.status_code == 409:
+                # The dataset was rebuilt since the last page; start over on the new version
+                st.warning("O conjunto de dados foi atualizado. Voltando para a primeira página.")
+                cursors[:] = [None]
+                data_response = requests.get(f"{API_BASE_URL}/training-data", params=params)
+            if data_response.status_code == 200:
+                data = data_response.json()
+                st.caption(f"Página {len(cursors)} — {len(data['rows'])} de {data['total_rows']} registros encontrados.")
+                st.dataframe(pd.DataFrame(data["rows"], columns=selected_columns or None))
+                prev_col, next_col = st.columns(2)
+                with prev_col:
+                    st.button("Página anterior", disabled=len(cursors) == 1, on_click=cursors.pop)
+                with next_col:
+                    st.button("Próxima página", disabled=data["next_cursor"] is None, on_click=cursors.append, args=(data["next_cursor"],))
+            elif data_response.status_code == 404:
+                st.error(f"Não foi possível encontrar o conjunto de dados de treinamento em {TRAINING_DATA_PATH}. Por favor, certifique-se de que o arquivo existe.")
+            else:
+                st.error(f"Erro ao carregar os dados: {data_response.text}")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Erro de conexão com a API: {e}")
 
 # --- Dashboard panel rendering ---
 elif page == "Painel de Monitoramento":
     st.title("Painel de Monitoramento de Drift do Modelo")
     
-    training_df, predictions_df = load_monitoring_data()
+    recent_windows = st.sidebar.number_input("Janelas mais recentes (0 = todas)", min_value=0, value=0, step=1)
+    try:
+        drift = load_drift_summary(recent_windows or None)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erro ao carregar as estatísticas de drift da API: {e}")
+        st.stop()
 
-    if training_df.empty:
+    reference = drift["reference"]
+    overall = drift["overall"]["features"]
+    if reference is None:
         st.error(f"Arquivo de treinamento não encontrado. Verifique o caminho: {TRAINING_DATA_PATH}")
-    if predictions_df.empty:
+    if drift["rows_ingested"] == 0:
         st.warning(f"Nenhum log de predição encontrado. Execute algumas predições na 'Aplicação Principal' primeiro.")
-    
-    st.info(f"Carregados {len(training_df)} registros de treinamento e {len(predictions_df)} registros de predição.")
 
-    if not training_df.empty and not predictions_df.empty:
-        features_to_monitor = ['skill_match_score', 'level_match_score', 'match_probability']
-        
+    training_rows = reference["source"]["training_rows"] if reference else 0
+    st.info(f"Referência com {training_rows} registros de treinamento; {drift['rows_ingested']} registros de predição processados em {drift['overall']['windows']} janela(s) de {drift['window_seconds'] // 60} min.")
+
+    if reference is not None and drift["rows_ingested"] > 0:
         st.header("Comparação da Distribuição de Dados")
-        
-        for feature in features_to_monitor:
-            if feature not in predictions_df.columns or feature not in training_df.columns:
+        edges = np.linspace(0.0, 1.0, DRIFT_PLOT_BINS + 1)
+
+        for feature in drift["features"]:
+            reference_stats, current_stats = reference["features"][feature], overall[feature]
+            if reference_stats["count"] == 0 or current_stats["count"] == 0:
                 continue
-                
+
             st.subheader(f"Análise de Drift para: `{feature}`")
-            
+
             fig, ax = plt.subplots()
-            
-            training_df[feature].hist(ax=ax, bins=20, alpha=0.5, label='Dados de Treinamento', density=True)
-            predictions_df[feature].hist(ax=ax, bins=20, alpha=0.5, label='Dados de Predição (Produção)', density=True)
-            
+            for stats, label in ((reference_stats, 'Dados de Treinamento'), (current_stats, 'Dados de Predição (Produção)')):
+                counts = rebin(stats["histogram"], DRIFT_PLOT_BINS)
+                ax.stairs(counts / counts.sum() * DRIFT_PLOT_BINS, edges, fill=True, alpha=0.5, label=label)
             ax.legend()
             ax.set_title(f"Distribuição de '{feature}'")
             ax.set_xlabel("Valor")
             ax.set_ylabel("Densidade")
-            
             st.pyplot(fig)
-            
-            mean_training = training_df[feature].mean()
-            mean_prediction = predictions_df[feature].mean()
-            
-            col1, col2 = st.columns(2)
+
+            mean_training, mean_prediction = reference_stats["mean"], current_stats["mean"]
+            col1, col2, col3 = st.columns(3)
             with col1:
                 st.metric(label="Média nos Dados de Treinamento", value=f"{mean_training:.2f}")
             with col2:
                 st.metric(label="Média nos Dados de Predição", value=f"{mean_prediction:.2f}", delta=f"{mean_prediction - mean_training:.2f} (Diferença)")
-            
-            st.markdown("---")
\ No newline at end of file
+            with col3:
+                st.metric(label=f"PSI ({PSI_LEVEL_LABELS[current_stats['psi_level']]})", value=f"{current_stats['psi']:.3f}", help=f"KS: {current_stats['ks']:.3f}")
+
+            st.markdown("---")
+
+        st.header("PSI por Janela de Tempo")
+        psi_df = pd.DataFrame(
+            {feature: [window["features"][feature].get("psi") for window in drift["windows"]] for feature in drift["features"]},
+            index=pd.to_datetime([window["start"] for window in drift["windows"]]),
+        )
+        st.line_chart(psi_df)
@@ -1,7 +1,14 @@
 import json
 import os
+import sys
 import random
 
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.json_stream import iter_json_object, write_json_array
+from src.ml.processed_store import TableWriter, PROSPECTS_AGGREGATED, EXPORT_JSON, flatten_aggregated, table_path
+
 # --- Configuration ---
 # Define paths using the recommended project structure
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
@@ -10,40 +17,16 @@ VAGAS_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'vagas.json')
 APPLICANTS_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'applicants.json')
 OUTPUT_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'prospects_aggregated.json')
 SAMPLE_SIZE = 5000
+SAMPLE_SEED = None  # Set an int for a reproducible prospect sample
 
-def run_aggregation():
-    """
-    Main function to load data, perform the aggregation, and save the result.
-    """
-    print("--- Starting Data Aggregation Pipeline ---")
-
-    # --- 1. Load Data ---
-    print(f"-> Loading prospects from: {PROSPECTS_PATH}")
-    with open(PROSPECTS_PATH, 'r', encoding='utf-8') as f:
-        prospects_data = json.load(f)
-
-    print(f"-> Loading vacancies from: {VAGAS_PATH}")
-    with open(VAGAS_PATH, 'r', encoding='utf-8') as f:
-        vagas_data = json.load(f)
-
-    print(f"-> Loading applicants from: {APPLICANTS_PATH}")
-    with open(APPLICANTS_PATH, 'r', encoding='utf-8') as f:
-        applicants_data = json.load(f)
-    print("-> All data loaded successfully.")
-
-    # --- 2. Sample Prospects ---
-    prospect_keys = list(prospects_data.keys())
+def sample_prospect_keys(prospect_keys, rng):
     if len(prospect_keys) < SAMPLE_SIZE:
         print(f"Warning: Total prospects ({len(prospect_keys)}) is less than sample size ({SAMPLE_SIZE}). Using all prospects.")
-        sampled_keys = prospect_keys
-    else:
-        sampled_keys = random.sample(prospect_keys, SAMPLE_SIZE)
-    print(f"\n-> Randomly selected {len(sampled_keys)} prospects for aggregation.")
+        return prospect_keys
+    return rng.sample(prospect_keys, SAMPLE_SIZE)
 
-    # --- 3. Aggregate Data ---
-    print("-> Aggregating vacancy and applicant details...")
-    aggregated_data = []
-    processed_count = 0
+def aggregate_prospects(sampled_keys, prospects_data, vagas_data, applicants_data):
+    """Yields one aggregated record per sampled prospect that has a vacancy and at least one known applicant."""
     for key in sampled_keys:
         prospect_info = prospects_data.get(key)
         vaga_info = vagas_data.get(key)
@@ -73,17 +56,107 @@ def run_aggregation():
 
         # Only add the record if it contains applicants with full profiles
         if aggregated_prospect["prospects_with_details"]:
-            aggregated_data.append(aggregated_prospect)
-            processed_count += 1
+            yield aggregated_prospect
+
+def save_aggregated(records):
+    """
+    Writes aggregated records to the columnar store (one row per application) and, if
+    enabled, to the JSON export, consuming the records one at a time.
+
+    Returns:
+        int: The number of aggregated prospects written.
+    """
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    with TableWriter(PROSPECTS_AGGREGATED) as table:
+        def tee():
+            for record in records:
+                table.write_rows(flatten_aggregated([record]))
+                yield record
+        if EXPORT_JSON:
+            print(f"\n-> Saving aggregated file to: {OUTPUT_PATH}")
+            count = write_json_array(OUTPUT_PATH, tee())
+        else:
+            count = sum(1 for _ in tee())
+    print(f"-> Saved columnar table to: {table_path(PROSPECTS_AGGREGATED)}")
+    return count
+
+def run_streaming_aggregation(rng):
+    """
+    Same output as the in-memory pipeline, but the raw files are parsed incrementally:
+    prospects are read first to pick the sample and the applicant ids it needs, then
+    vagas.json and applicants.json are streamed keeping only matching records.
+    """
+    # --- 1. Sample Prospects ---
+    print(f"-> Scanning prospect keys in: {PROSPECTS_PATH}")
+    prospect_keys = list(dict.fromkeys(key for key, _ in iter_json_object(PROSPECTS_PATH)))
+    sampled_keys = sample_prospect_keys(prospect_keys, rng)
+    sampled_set = set(sampled_keys)
+    del prospect_keys
+    print(f"\n-> Randomly selected {len(sampled_keys)} prospects for aggregation.")
+
+    prospects_data = {key: value for key, value in iter_json_object(PROSPECTS_PATH) if key in sampled_set}
+    needed_applicants = {
+        applicant_summary.get("codigo")
+        for prospect_info in prospects_data.values() if prospect_info
+        for applicant_summary in prospect_info.get("prospects", [])
+    }
+
+    # --- 2. Stream Only the Needed Records ---
+    print(f"-> Streaming vacancies from: {VAGAS_PATH}")
+    vagas_data = {key: value for key, value in iter_json_object(VAGAS_PATH) if key in sampled_set}
+    print(f"-> Streaming applicants from: {APPLICANTS_PATH}")
+    applicants_data = {key: value for key, value in iter_json_object(APPLICANTS_PATH) if key in needed_applicants}
+    print(f"-> Kept {len(vagas_data)} vacancies and {len(applicants_data)} applicants.")
+
+    # --- 3. Aggregate and Save ---
+    print("-> Aggregating vacancy and applicant details...")
+    processed_count = save_aggregated(aggregate_prospects(sampled_keys, prospects_data, vagas_data, applicants_data))
+    print(f"-> Successfully aggregated {processed_count} prospects with their full data.")
+
+def run_aggregation(streaming=True):
+    """
+    Main function to load data, perform the aggregation, and save the result.
+
+    Args:
+        streaming (bool): Parse the raw files incrementally (default). Set to False to
+            load them fully with json.load, as the original pipeline did.
+    """
+    print("--- Starting Data Aggregation Pipeline ---")
+    rng = random.Random(SAMPLE_SEED) if SAMPLE_SEED is not None else random
+
+    if streaming:
+        run_streaming_aggregation(rng)
+        print("\n--- Data Aggregation Pipeline Finished Successfully! ---")
+        return
+
+    # --- 1. Load Data ---
+    print(f"-> Loading prospects from: {PROSPECTS_PATH}")
+    with open(PROSPECTS_PATH, 'r', encoding='utf-8') as f:
+        prospects_data = json.load(f)
+
+    print(f"-> Loading vacancies from: {VAGAS_PATH}")
+    with open(VAGAS_PATH, 'r', encoding='utf-8') as f:
+        vagas_data = json.load(f)
+
+    print(f"-> Loading applicants from: {APPLICANTS_PATH}")
+    with open(APPLICANTS_PATH, 'r', encoding='utf-8') as f:
+        applicants_data = json.load(f)
+    print("-> All data loaded successfully.")
+
+    # --- 2. Sample Prospects ---
+    prospect_keys = list(prospects_data.keys())
+    sampled_keys = sample_prospect_keys(prospect_keys, rng)
+    print(f"\n-> Randomly selected {len(sampled_keys)} prospects for aggregation.")
+
+    # --- 3. Aggregate Data ---
+    print("-> Aggregating vacancy and applicant details...")
+    aggregated_data = list(aggregate_prospects(sampled_keys, prospects_data, vagas_data, applicants_data))
+    processed_count = len(aggregated_data)
 
     print(f"-> Successfully aggregated {processed_count} prospects with their full data.")
 
     # --- 4. Save Output ---
-    # Ensure the output directory exists
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-    print(f"\n-> Saving aggregated file to: {OUTPUT_PATH}")
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(aggregated_data, f, indent=4, ensure_ascii=False)
+    save_aggregated(aggregated_data)
 
     print("\n--- Data Aggregation Pipeline Finished Successfully! ---")
 
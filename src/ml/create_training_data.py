@@ -1,12 +1,18 @@
 import json
 import os
+import sys
+
+import pandas as pd
+
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.processed_store import read_table, write_table, json_path, PROSPECTS_AGGREGATED, TRAINING_DATASET, TRAINING_DATASET_SCHEMA
 
 # --- Configuration ---
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
-AGGREGATED_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'prospects_aggregated.json')
 VACANCIES_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'vacancies_enhanced.json')
 APPLICANTS_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'applicants_enhanced.json')
-OUTPUT_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'training_dataset.json')
 
 # --- Feature Engineering Functions ---
 
@@ -50,8 +56,8 @@ def run_dataset_creation():
 
     # --- 1. Load All Necessary Data ---
     try:
-        with open(AGGREGATED_PATH, 'r', encoding='utf-8') as f:
-            aggregated_data = json.load(f)
+        # Only the three columns needed here are read from the columnar store
+        applications = read_table(PROSPECTS_AGGREGATED, columns=['vaga_id', 'codigo', 'situacao_candidado'])
         with open(VACANCIES_PATH, 'r', encoding='utf-8') as f:
             vacancies_enhanced = json.load(f)
         with open(APPLICANTS_PATH, 'r', encoding='utf-8') as f:
@@ -65,55 +71,47 @@ def run_dataset_creation():
 
     print("-> Assembling training records and engineering features...")
     # --- 2. Iterate and Build Records ---
-    for prospect_entry in aggregated_data:
-        vaga_id = prospect_entry.get("vaga_id")
+    for vaga_id, applicant_id, situacao in applications.itertuples(index=False, name=None):
         vacancy_features = vacancies_enhanced.get(vaga_id)
+        applicant_features = applicants_enhanced.get(applicant_id)
 
-        if not vacancy_features:
+        if not vacancy_features or not applicant_features:
             continue
 
-        for application in prospect_entry.get("prospects_with_details", []):
-            applicant_id = application.get("codigo")
-            applicant_features = applicants_enhanced.get(applicant_id)
-
-            if not applicant_features:
-                continue
-
-            # --- 3. Feature Engineering ---
-            skill_match = calculate_skill_match(
-                applicant_features.get("technical_skills", []),
-                vacancy_features.get("technical_skills", [])
-            )
-            level_match = calculate_level_match(
-                applicant_features.get("experience_level"),
-                vacancy_features.get("experience_level")
-            )
-
-            # --- 4. Define Target Variable ---
-            hired = 1 if application.get("situacao_candidado") == "Contratado pela Decision" else 0
-
-            # --- 5. Assemble the Record ---
-            record = {
-                "vaga_id": vaga_id,
-                "applicant_id": applicant_id,
-                "skill_match_score": round(skill_match, 4),
-                "level_match_score": level_match,
-                # For simplicity, we add the raw features too, which can be useful later
-                "applicant_level": applicant_features.get("experience_level"),
-                "vacancy_level": vacancy_features.get("experience_level"),
-                "applicant_skills_count": len(applicant_features.get("technical_skills", [])),
-                "vacancy_skills_count": len(vacancy_features.get("technical_skills", [])),
-                # This is our target for the ML model
-                "hired": hired
-            }
-            training_dataset.append(record)
+        # --- 3. Feature Engineering ---
+        skill_match = calculate_skill_match(
+            applicant_features.get("technical_skills", []),
+            vacancy_features.get("technical_skills", [])
+        )
+        level_match = calculate_level_match(
+            applicant_features.get("experience_level"),
+            vacancy_features.get("experience_level")
+        )
+
+        # --- 4. Define Target Variable ---
+        hired = 1 if situacao == "Contratado pela Decision" else 0
+
+        # --- 5. Assemble the Record ---
+        record = {
+            "vaga_id": vaga_id,
+            "applicant_id": applicant_id,
+            "skill_match_score": round(skill_match, 4),
+            "level_match_score": level_match,
+            # For simplicity, we add the raw features too, which can be useful later
+            "applicant_level": applicant_features.get("experience_level"),
+            "vacancy_level": vacancy_features.get("experience_level"),
+            "applicant_skills_count": len(applicant_features.get("technical_skills", [])),
+            "vacancy_skills_count": len(vacancy_features.get("technical_skills", [])),
+            # This is our target for the ML model
+            "hired": hired
+        }
+        training_dataset.append(record)
 
     print(f"-> Created {len(training_dataset)} training records.")
 
     # --- 6. Save Final Dataset ---
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(training_dataset, f, indent=4, ensure_ascii=False)
-    print(f"-> Saved final training dataset to: {OUTPUT_PATH}")
+    table_file = write_table(pd.DataFrame(training_dataset, columns=TRAINING_DATASET_SCHEMA.names), TRAINING_DATASET)
+    print(f"-> Saved final training dataset to: {table_file} (JSON export: {json_path(TRAINING_DATASET)})")
     print("\n--- Training Dataset Creation Finished Successfully! ---")
 
 
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml import feature_extractor
+from src.ml.json_stream import iter_json_object, write_json_object
+from src.ml.gemini_client import MAX_CONCURRENCY as GEMINI_MAX_CONCURRENCY, DOCS_PER_REQUEST as GEMINI_DOCS_PER_REQUEST
+
+# --- Configuration ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+RAW_DATA_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
+VAGAS_PATH = os.path.join(RAW_DATA_DIR, 'vagas.json')
+APPLICANTS_PATH = os.path.join(RAW_DATA_DIR, 'applicants.json')
+PROSPECTS_PATH = os.path.join(RAW_DATA_DIR, 'prospects.json')
+VACANCIES_OUTPUT_PATH = os.path.join(PROCESSED_DIR, 'vacancies_enhanced.json')
+APPLICANTS_OUTPUT_PATH = os.path.join(PROCESSED_DIR, 'applicants_enhanced.json')
+# Finished shards are checkpointed here; delete a shard file to have it recomputed
+SHARDS_DIR = os.path.join(PROCESSED_DIR, 'enhancement_shards')
+SHARD_SIZE = 500
+# Process pool size for the simulated extractor
+WORKERS = int(os.getenv("ENHANCE_WORKERS", str(os.cpu_count() or 1)))
+# Only enhance applicants that appear in prospects.json (what the old notebook filter did)
+ONLY_PROSPECT_APPLICANTS = True
+MANIFEST_NAME = '_manifest.json'
+
+
+# --- Text Extraction ---
+def vacancy_text(vaga):
+    """Job description text fed to the extractor: title, main activities and required skills."""
+    basic_info = vaga.get("informacoes_basicas", {})
+    profile = vaga.get("perfil_vaga", {})
+    parts = [basic_info.get("titulo_vaga"), profile.get("principais_atividades"), profile.get("competencia_tecnicas_e_comportamentais")]
+    return "\n".join(part for part in parts if part)
+
+
+def applicant_text(applicant):
+    return applicant.get("cv_pt") or ""
+
+
+def prospect_applicant_ids(prospects_path):
+    """Codes of every applicant listed in prospects.json."""
+    return {
+        str(prospect.get("codigo"))
+        for _, prospect_info in iter_json_object(prospects_path)
+        for prospect in prospect_info.get("prospects", [])
+        if prospect.get("codigo")
+    }
+
+
+# --- Shards ---
+def shard_path(shards_dir, index):
+    return os.path.join(shards_dir, f'shard-{index:05d}.json')
+
+
+def iter_shards(source_path, text_fn, shard_size, keep_ids=None):
+    """Streams the raw file and yields (shard index, {id: text}) in file order."""
+    shard = {}
+    index = 0
+    for entity_id, record in iter_json_object(source_path):
+        if keep_ids is not None and entity_id not in keep_ids:
+            continue
+        shard[entity_id] = text_fn(record)
+        if len(shard) >= shard_size:
+            yield index, shard
+            index += 1
+            shard = {}
+    if shard:
+        yield index, shard
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _prepare_shards_dir(shards_dir, manifest):
+    """
+    Keeps existing shards only if they were produced from the same input with the same
+    settings; otherwise they are discarded so stale features are never merged.
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    manifest_path = os.path.join(shards_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == manifest:
+                return
+        print(f"-> Input or settings changed since the last run, discarding shards in {shards_dir}")
+    for path in glob.glob(os.path.join(shards_dir, 'shard-*.json*')):
+        os.remove(path)
+    _write_json_atomic(manifest_path, manifest)
+
+
+def enhance_shard(path, entity_type, texts):
+    """Process-pool worker: extracts the features of one shard and checkpoints them to disk."""
+    features = dict(zip(texts, feature_extractor.extract_features_batch(list(texts.values()), entity_type)))
+    _write_json_atomic(path, features)
+    return len(features)
+
+
+# --- Runners ---
+def run_shards_in_pool(pending, entity_type, workers):
+    """Runs enhance_shard over pending shards, one shard per task, keeping at most 2 tasks per worker queued."""
+    if workers <= 1:
+        return sum(enhance_shard(path, entity_type, texts) for path, texts in pending)
+    enhanced = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for path, texts in pending:
+            if len(in_flight) >= 2 * workers:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                enhanced += sum(future.result() for future in finished)
+            in_flight.add(pool.submit(enhance_shard, path, entity_type, texts))
+        enhanced += sum(future.result() for future in in_flight)
+    return enhanced
+
+
+def merge_shards(shards_dir, shard_count, output_path):
+    """Concatenates shards 0..shard_count-1 into the final {id: features} file, one shard in memory at a time."""
+    def pairs():
+        for index in range(shard_count):
+            with open(shard_path(shards_dir, index), 'r', encoding='utf-8') as f:
+                yield from json.load(f).items()
+
+    tmp_path = output_path + '.tmp'
+    count = write_json_object(tmp_path, pairs())
+    os.replace(tmp_path, output_path)
+    return count
+
+
+def enhance_entities(entity_type, source_path, output_path, text_fn, shards_dir, shard_size=SHARD_SIZE, workers=WORKERS, keep_ids=None):
+    """
+    Runs extract_features over every entity of a raw file and writes {id: features} to output_path.
+    Shards already on disk from a previous run with the same input are reused.
+
+    Returns:
+        dict: Counts of shards (total / reused) and entities (enhanced now / written).
+    """
+    use_llm = feature_extractor.USE_REAL_LLM
+    source_stat = os.stat(source_path)
+    manifest = {
+        "source": os.path.abspath(source_path),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "shard_size": shard_size,
+        "extractor": feature_extractor.extractor_version(),
+        "ids_filter": hashlib.sha256("\n".join(sorted(keep_ids)).encode('utf-8')).hexdigest() if keep_ids is not None else None,
+    }
+    _prepare_shards_dir(shards_dir, manifest)
+
+    stats = {"shards": 0, "shards_reused": 0, "enhanced": 0, "written": 0}
+
+    def pending():
+        for index, texts in iter_shards(source_path, text_fn, shard_size, keep_ids):
+            stats["shards"] += 1
+            path = shard_path(shards_dir, index)
+            if os.path.exists(path):
+                stats["shards_reused"] += 1
+                continue
+            yield path, texts
+
+    if use_llm:
+        # Shards run one at a time; the Gemini client sends each shard as concurrent multi-document requests
+        stats["enhanced"] = run_shards_in_pool(pending(), entity_type, workers=1)
+    else:
+        stats["enhanced"] = run_shards_in_pool(pending(), entity_type, workers)
+    stats["written"] = merge_shards(shards_dir, stats["shards"], output_path)
+    return stats
+
+
+def run_enhancement():
+    """Builds vacancies_enhanced.json and applicants_enhanced.json from the raw data."""
+    print("--- Starting Feature Enhancement Pipeline ---")
+    mode = f"Gemini API, {GEMINI_MAX_CONCURRENCY} concurrent requests of up to {GEMINI_DOCS_PER_REQUEST} texts" if feature_extractor.USE_REAL_LLM else f"simulated extractor, {WORKERS} worker(s)"
+    print(f"-> Using {mode}, {SHARD_SIZE} entities per shard.")
+
+    keep_ids = None
+    if ONLY_PROSPECT_APPLICANTS:
+        keep_ids = prospect_applicant_ids(PROSPECTS_PATH)
+        print(f"-> Restricting applicants to the {len(keep_ids)} found in prospects.json.")
+
+    stages = [
+        ("vaga", VAGAS_PATH, VACANCIES_OUTPUT_PATH, vacancy_text, None),
+        ("applicant", APPLICANTS_PATH, APPLICANTS_OUTPUT_PATH, applicant_text, keep_ids),
+    ]
+    for entity_type, source_path, output_path, text_fn, ids in stages:
+        start = time.perf_counter()
+        stats = enhance_entities(entity_type, source_path, output_path, text_fn, os.path.join(SHARDS_DIR, entity_type), shard_size=SHARD_SIZE, keep_ids=ids)
+        elapsed = time.perf_counter() - start
+        print(f"-> {entity_type}: {stats['shards']} shards ({stats['shards_reused']} reused), "
+              f"{stats['enhanced']} entities enhanced in {elapsed:.1f}s, {stats['written']} saved to {output_path}")
+
+    print("\n--- Feature Enhancement Finished Successfully! ---")
+
+
+if __name__ == "__main__":
+    run_enhancement()
@@ -0,0 +1,148 @@
+import os
+import re
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- Configuration ---
+DEFAULT_MAX_MEMORY_ENTRIES = 10000
+DEFAULT_MAX_DISK_ENTRIES = 1000000
+TRIM_EVERY_PUTS = 1000  # The disk row count is checked every this many writes, not on each one
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Collapses whitespace runs and trims, so formatting-only differences share a cache entry."""
+    return _WHITESPACE_RUN.sub(' ', text or '').strip()
+
+
+def cache_key(text, entity_type, version):
+    payload = "\x00".join([version, entity_type, normalize_text(text)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FeatureCache:
+    """
+    Two-tier memoization for extract_features results.
+
+    Entries are keyed by sha256(version, entity_type, normalized text), and get_or_compute()
+    extracts from that same normalized text, so an entry never depends on which spelling
+    of the text was seen first. The first tier is a
+    bounded in-process LRU; the second is a SQLite file shared by every process (API
+    workers, pipeline pool workers) that survives restarts. The version is part of the
+    key, so changing the keyword lists or the prompt invalidates everything without
+    touching the file: rows of other versions are never read again and age out of the
+    disk tier, which is trimmed to max_disk_entries, least recently used first, or are
+    removed at once with prune_versions().
+    """
+
+    def __init__(self, db_path, version, max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.db_path = db_path
+        self.version = version
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()
+        self._connection = None
+        self._connection_pid = None
+        self._puts_since_trim = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "memory_evictions": 0, "disk_evictions": 0}
+
+    # --- Disk tier ---
+    def _db(self):
+        # Connections are not shared across fork (process pool workers open their own)
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL with synchronous=NORMAL skips the fsync per insert; a crash can only lose recent cache entries
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, version TEXT NOT NULL, entity_type TEXT NOT NULL, "
+                "features TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used)")
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _trim_disk(self, db):
+        self._puts_since_trim = 0
+        (count,) = db.execute("SELECT COUNT(*) FROM features").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            db.execute("DELETE FROM features WHERE key IN (SELECT key FROM features ORDER BY last_used LIMIT ?)", (excess,))
+            self._counters["disk_evictions"] += excess
+
+    # --- Memory tier ---
+    def _remember(self, key, features):
+        self._memory[key] = features
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+    # --- Public API ---
+    def get(self, text, entity_type):
+        """Returns a copy of the cached features, or None on a miss."""
+        key = cache_key(text, entity_type, self.version)
+        with self._lock:
+            features = self._memory.get(key)
+            if features is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return copy.deepcopy(features)
+            db = self._db()
+            row = db.execute("SELECT features FROM features WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            db.execute("UPDATE features SET last_used = ? WHERE key = ?", (time.time(), key))
+            features = json.loads(row[0])
+            self._remember(key, features)
+            self._counters["disk_hits"] += 1
+            return copy.deepcopy(features)
+
+    def put(self, text, entity_type, features):
+        key = cache_key(text, entity_type, self.version)
+        with self._lock:
+            self._remember(key, copy.deepcopy(features))
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO features (key, version, entity_type, features, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, entity_type, json.dumps(features, ensure_ascii=False), time.time()),
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= TRIM_EVERY_PUTS:
+                self._trim_disk(db)
+
+    def get_or_compute(self, text, entity_type, compute):
+        text = normalize_text(text)
+        features = self.get(text, entity_type)
+        if features is None:
+            features = compute(text, entity_type)
+            self.put(text, entity_type, features)
+        return features
+
+    def prune_versions(self):
+        """Deletes the disk rows written under any other extractor version; returns how many."""
+        with self._lock:
+            return self._db().execute("DELETE FROM features WHERE version != ?", (self.version,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db().execute("DELETE FROM features")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+            counters["disk_entries"] = self._db().execute("SELECT COUNT(*) FROM features").fetchone()[0]
+        counters["version"] = self.version
+        return counters
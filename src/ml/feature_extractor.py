@@ -1,9 +1,18 @@
 import os
-import re
+import sys
+import copy
+import argparse
 import json
-import google.generativeai as genai
+import hashlib
 from dotenv import load_dotenv
 
+# Make the project importable when this module is loaded by path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.feature_cache import FeatureCache, normalize_text
+from src.ml.keyword_matcher import KeywordMatcher
+from src.ml.gemini_client import GeminiClient, GeminiAPIError, GEMINI_MODEL_NAME, BATCH_PROMPT_TEMPLATE, DOCUMENT_TEMPLATE
+
 # --- Configuration ---
 # This will load the LLM_API_KEY from your .env file
 load_dotenv(os.path.join(os.path.dirname(__file__), '../../.env'))
@@ -12,13 +21,47 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '../../.env'))
 # It is recommended to test with a small sample size first.
 USE_REAL_LLM = False 
 
-# Configure the real Gemini API client
-if USE_REAL_LLM:
-    try:
-        genai.configure(api_key=os.getenv("LLM_API_KEY"))
-    except Exception as e:
-        print(f"Error configuring Gemini API: {e}")
-        USE_REAL_LLM = False # Fallback to simulation if config fails
+# Persistent cache of extracted features: "auto" caches Gemini results only (the simulated
+# extractor is cheaper than a cache lookup), "1" always caches, "0" never does
+FEATURE_CACHE_MODE = os.getenv("FEATURE_CACHE", "auto").lower()
+FEATURE_CACHE_PATH = os.getenv("FEATURE_CACHE_PATH", os.path.join(os.path.dirname(__file__), '../../data/cache/features.sqlite'))
+FEATURE_CACHE_MEMORY_ENTRIES = int(os.getenv("FEATURE_CACHE_MEMORY_ENTRIES", "10000"))
+
+# --- Extraction vocabulary (simulated extractor) ---
+SKILL_KEYWORDS = ['sap', 'python', 'c#', 'java', 'selenium', 'cypress', 'jenkins', 'aws', 'ruby', 'appium', 'cucumber', 'vb.net', 'sql', 'git', 'maven', 'jira', 'scrum', 'kanban', 'power bi', 'docker', 'oracle', '.net', 'react', 'angular', 'peoplesoft', 'abap']
+LANGUAGE_LEVELS = {'english': ['básico', 'intermediário', 'avançado', 'fluente', 'basic', 'intermediate', 'advanced', 'fluent'], 'spanish': ['básico', 'intermediário', 'avançado', 'fluente', 'básico', 'intermedio', 'avanzado', 'fluido']}
+# Checked in order; the first level with a matching keyword wins
+EXPERIENCE_LEVEL_KEYWORDS = [
+    ('leadership', ['leadership', 'gerente', 'coordenador', 'lead']),
+    ('senior', ['senior', 'sênior', 'sr', 'especialista']),
+    ('pleno', ['pleno', 'pl']),
+    ('junior', ['junior', 'jr']),
+]
+
+# Compiled once; matches every keyword as a whole word
+SIMULATED_MATCHER = KeywordMatcher(SKILL_KEYWORDS, LANGUAGE_LEVELS, EXPERIENCE_LEVEL_KEYWORDS)
+
+# Configure the real Gemini API client (requests, batching and rate limits live in gemini_client.py)
+if USE_REAL_LLM and not os.getenv("LLM_API_KEY"):
+    print("Error configuring Gemini API: LLM_API_KEY is not set")
+    USE_REAL_LLM = False # Fallback to simulation if config fails
+
+_gemini_client = None
+
+def get_gemini_client() -> GeminiClient:
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = GeminiClient(os.getenv("LLM_API_KEY"))
+    return _gemini_client
+
+def _with_fallback(texts: list, results: list, entity_type: str) -> list:
+    """Features of each ExtractionResult; failed documents fall back to the simulation, and this is reported."""
+    failed = [result.error for result in results if not result.ok]
+    if failed:
+        print(f"Gemini extraction failed for {len(failed)} of {len(texts)} {entity_type} texts "
+              f"(first error: {failed[0]}); using the simulated extractor for them.")
+    return [result.features if result.ok else simulated_gemini_feature_extraction(text, entity_type)
+            for text, result in zip(texts, results)]
 
 def real_gemini_feature_extraction(text: str, entity_type: str) -> dict:
     """
@@ -31,79 +74,112 @@ def real_gemini_feature_extraction(text: str, entity_type: str) -> dict:
     Returns:
         dict: A dictionary with extracted features.
     """
-    if not text:
-        return {"technical_skills": [], "languages": {}, "experience_level": "not specified"}
+    return real_gemini_feature_extraction_batch([text], entity_type)[0]
 
-    # Define the Gemini model to use
-    model = genai.GenerativeModel('gemini-1.5-flash')
+def real_gemini_feature_extraction_batch(texts: list, entity_type: str) -> list:
+    """Batched Gemini extraction: several texts per request, with concurrency and rate limits."""
+    return _with_fallback(texts, get_gemini_client().extract_many_sync(texts, entity_type), entity_type)
 
-    # Create a detailed prompt for the LLM
-    prompt = f"""
-    Analyze the following text from a recruitment {entity_type} and extract the information below.
-    Return the output ONLY as a valid JSON object.
+def _call_gemini(text: str, entity_type: str) -> dict:
+    """Single Gemini extraction; raises on API or validation errors instead of falling back."""
+    result = get_gemini_client().extract_many_sync([text], entity_type)[0]
+    if not result.ok:
+        raise GeminiAPIError(result.error)
+    return result.features
 
-    1.  "technical_skills": A list of key technical skills, tools, and methodologies. Examples: "Python", "SQL", "AWS", "Scrum", "SAP", "Java".
-    2.  "languages": A dictionary of languages and their proficiency levels. Examples: {{"English": "advanced", "Spanish": "intermediate"}}.
-    3.  "experience_level": Classify the experience level into one of these four categories ONLY: "junior", "pleno", "senior", or "leadership".
+def simulated_gemini_feature_extraction(text: str, entity_type: str) -> dict:
+    """
+    Simulates a call to an LLM by extracting keywords. This is fast and free.
+    """
+    return SIMULATED_MATCHER.extract(text)
 
-    Here is the text to analyze:
-    ---
-    {text}
-    ---
+# --- Feature Cache ---
+def extractor_version() -> str:
+    """
+    Fingerprint of everything that shapes extraction output: the active extractor, its
+    vocabulary and the prompt. Cached results from any other version are never reused.
     """
+    if USE_REAL_LLM:
+        spec = {"extractor": "gemini", "model": GEMINI_MODEL_NAME, "prompt": BATCH_PROMPT_TEMPLATE, "document": DOCUMENT_TEMPLATE}
+    else:
+        spec = {"extractor": "simulated", "matching": "whole-word", "skills": SKILL_KEYWORDS, "languages": LANGUAGE_LEVELS, "levels": EXPERIENCE_LEVEL_KEYWORDS}
+    return hashlib.sha256(json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+_feature_cache = None
+
+def get_feature_cache():
+    """The process-wide FeatureCache, (re)created when the extractor version changes."""
+    global _feature_cache
+    version = extractor_version()
+    if _feature_cache is None or _feature_cache.version != version:
+        _feature_cache = FeatureCache(FEATURE_CACHE_PATH, version, max_memory_entries=FEATURE_CACHE_MEMORY_ENTRIES)
+    return _feature_cache
 
+def feature_cache_enabled() -> bool:
+    if FEATURE_CACHE_MODE == "auto":
+        return USE_REAL_LLM
+    return FEATURE_CACHE_MODE in ("1", "true", "yes")
+
+def _extract_uncached(text: str, entity_type: str) -> dict:
+    if USE_REAL_LLM:
+        return _call_gemini(text, entity_type)
+    return simulated_gemini_feature_extraction(text, entity_type)
+
+# --- Main Function ---
+# The rest of your application will now call this function.
+# It will use the real or simulated version based on the USE_REAL_LLM flag.
+# When the feature cache is enabled, a text seen before costs no extraction.
+# Text is normalized first either way, so the cache setting never changes the result.
+def extract_features(text: str, entity_type: str) -> dict:
+    text = normalize_text(text)
+    if not text or not feature_cache_enabled():
+        return real_gemini_feature_extraction(text, entity_type) if USE_REAL_LLM else simulated_gemini_feature_extraction(text, entity_type)
     try:
-        # Make the API call
-        response = model.generate_content(prompt)
-        # Clean up the response to extract only the JSON part
-        json_response = response.text.strip().replace('```json', '').replace('```', '')
-        # Parse the JSON string into a Python dictionary
-        return json.loads(json_response)
+        return get_feature_cache().get_or_compute(text, entity_type, _extract_uncached)
     except Exception as e:
+        # A failed Gemini call falls back to the simulation without caching the fallback result
+        if not USE_REAL_LLM:
+            raise
         print(f"An error occurred during the Gemini API call: {e}")
-        # Fallback to the simulation if the real API call fails
         return simulated_gemini_feature_extraction(text, entity_type)
 
-def simulated_gemini_feature_extraction(text: str, entity_type: str) -> dict:
+def extract_features_batch(texts: list, entity_type: str) -> list:
     """
-    Simulates a call to an LLM by extracting keywords. This is fast and free.
+    extract_features over a list of texts. Repeated texts are extracted once and, with
+    Gemini, the texts missing from the cache are sent in multi-document requests.
+    Texts are normalized first, as in extract_features.
     """
-    if not text:
-        return {"technical_skills": [], "languages": {}, "experience_level": "not specified"}
-    
-    text_lower = text.lower()
-    skills_keywords = ['sap', 'python', 'c#', 'java', 'selenium', 'cypress', 'jenkins', 'aws', 'ruby', 'appium', 'cucumber', 'vb.net', 'sql', 'git', 'maven', 'jira', 'scrum', 'kanban', 'power bi', 'docker', 'oracle', '.net', 'react', 'angular', 'peoplesoft', 'abap']
-    technical_skills = sorted(list(set([skill for skill in skills_keywords if skill in text_lower])))
-    
-    languages = {}
-    lang_levels = {'english': ['básico', 'intermediário', 'avançado', 'fluente', 'basic', 'intermediate', 'advanced', 'fluent'], 'spanish': ['básico', 'intermediário', 'avançado', 'fluente', 'básico', 'intermedio', 'avanzado', 'fluido']}
-    for lang, levels in lang_levels.items():
-        pattern = re.compile(f"{lang}[\\s:-]+({'|'.join(levels)})")
-        match = pattern.search(text_lower)
-        if match:
-            languages[lang.capitalize()] = match.group(1)
-        elif lang in text_lower:
-            languages[lang.capitalize()] = 'not specified'
-
-    experience_level = "not specified"
-    if any(keyword in text_lower for keyword in ['leadership', 'gerente', 'coordenador', 'lead']):
-        experience_level = 'leadership'
-    elif any(keyword in text_lower for keyword in ['senior', 'sênior', 'sr', 'especialista']):
-        experience_level = 'senior'
-    elif any(keyword in text_lower for keyword in ['pleno', 'pl']):
-        experience_level = 'pleno'
-    elif any(keyword in text_lower for keyword in ['junior', 'jr']):
-        experience_level = 'junior'
-
-    return {"technical_skills": technical_skills, "languages": languages, "experience_level": experience_level}
+    texts = [normalize_text(text) for text in texts]
+    if not feature_cache_enabled():
+        if USE_REAL_LLM:
+            return real_gemini_feature_extraction_batch(texts, entity_type)
+        return SIMULATED_MATCHER.extract_batch(texts)
 
-# --- Main Function ---
-# The rest of your application will now call this function.
-# It will use the real or simulated version based on the USE_REAL_LLM flag.
-def extract_features(text: str, entity_type: str) -> dict:
-    if USE_REAL_LLM:
-        print("--- Using REAL Gemini API for feature extraction ---")
-        return real_gemini_feature_extraction(text, entity_type)
+    cache = get_feature_cache()
+    features = [cache.get(text, entity_type) if text else simulated_gemini_feature_extraction(text, entity_type) for text in texts]
+    missing = list(dict.fromkeys(text for text, found in zip(texts, features) if found is None))
+    if missing:
+        if USE_REAL_LLM:
+            results = get_gemini_client().extract_many_sync(missing, entity_type)
+            # Only successful extractions are cached; fallback results are recomputed next time
+            for text, result in zip(missing, results):
+                if result.ok:
+                    cache.put(text, entity_type, result.features)
+            computed = dict(zip(missing, _with_fallback(missing, results, entity_type)))
+        else:
+            computed = dict(zip(missing, SIMULATED_MATCHER.extract_batch(missing)))
+            for text, value in computed.items():
+                cache.put(text, entity_type, value)
+        features = [found if found is not None else copy.deepcopy(computed[text]) for text, found in zip(texts, features)]
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature cache maintenance.")
+    parser.add_argument('--prune-cache', action='store_true', help="Delete cached features of every other extractor version.")
+    args = parser.parse_args()
+    if args.prune_cache:
+        removed = get_feature_cache().prune_versions()
+        print(f"-> Removed {removed} cached entries of other extractor versions from: {FEATURE_CACHE_PATH}")
     else:
-        # print("--- Using SIMULATED LLM for feature extraction ---")
-        return simulated_gemini_feature_extraction(text, entity_type)
\ No newline at end of file
+        parser.print_help()
@@ -0,0 +1,418 @@
+import os
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.ml.create_training_data import calculate_level_match
+
+# --- Configuration ---
+FEATURE_COLUMNS = ['skill_match_score', 'level_match_score', 'applicant_skills_count', 'vacancy_skills_count']
+EXPERIENCE_LEVELS = ['junior', 'pleno', 'senior', 'leadership']
+UNKNOWN_LEVEL = len(EXPERIENCE_LEVELS)  # Index used for "not specified" and any unrecognised level
+DEFAULT_PROBABILITY_TABLE_ENTRIES = 1_000_000
+# Arrays written by FeatureMatrix.save(), one .npy file each
+MATRIX_ARRAYS = ('skills_data', 'skills_indices', 'skills_indptr', 'postings_data', 'postings_indices', 'postings_indptr',
+                 'levels', 'skill_counts', 'group_keys', 'grouped_rows', 'ids')
+
+
+def _build_level_table():
+    """
+    Tabulates calculate_level_match over every (applicant, vacancy) level pair, so the
+    vectorized lookup is guaranteed to agree with the scalar function.
+    The last row/column stands for unknown levels.
+    """
+    labels = EXPERIENCE_LEVELS + ["not specified"]
+    table = np.zeros((len(labels), len(labels)), dtype=np.float64)
+    for i, applicant_level in enumerate(labels):
+        for j, vacancy_level in enumerate(labels):
+            table[i, j] = calculate_level_match(applicant_level, vacancy_level)
+    return table
+
+
+LEVEL_MATCH_TABLE = _build_level_table()
+_LEVEL_INDEX = {level: i for i, level in enumerate(EXPERIENCE_LEVELS)}
+
+
+def level_index(level):
+    return _LEVEL_INDEX.get(level, UNKNOWN_LEVEL)
+
+
+def skills_of(features):
+    return features.get("technical_skills") or []
+
+
+class SkillVocabulary:
+    """Interns skill strings into dense integer ids shared by every FeatureMatrix."""
+
+    def __init__(self):
+        self.skill_to_id = {}
+
+    def __len__(self):
+        return len(self.skill_to_id)
+
+    def intern(self, skill):
+        skill_id = self.skill_to_id.get(skill)
+        if skill_id is None:
+            skill_id = len(self.skill_to_id)
+            self.skill_to_id[skill] = skill_id
+        return skill_id
+
+    def lookup(self, skills):
+        """Returns the ids of the known skills, ignoring skills never seen before (they cannot match)."""
+        ids = {self.skill_to_id[s] for s in skills if s in self.skill_to_id}
+        return np.fromiter(sorted(ids), dtype=np.int64, count=len(ids))
+
+
+class FeatureMatrix:
+    """
+    Precomputed, array-based view of a set of enhanced entities ({id: features}).
+
+    Holds a sparse row-per-entity skill matrix over interned skill ids, the experience
+    level index of each entity and its raw skill count. Built once, then reused to score a
+    single query entity against every row with NumPy operations. Used for both sides:
+    the vacancy catalog (/predict) and the applicant pool (reverse matching).
+    """
+
+    def __init__(self, entities, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else SkillVocabulary()
+        self._ids = list(entities.keys())
+        self._id_to_row = {entity_id: row for row, entity_id in enumerate(self._ids)}
+
+        indptr = [0]
+        indices = []
+        levels = np.empty(len(self.ids), dtype=np.int8)
+        skill_counts = np.empty(len(self.ids), dtype=np.int64)
+        for row, features in enumerate(entities.values()):
+            skills = skills_of(features)
+            # calculate_skill_match divides by len() of the raw list, duplicates included
+            skill_counts[row] = len(skills)
+            indices.extend(sorted({self.vocabulary.intern(s) for s in skills}))
+            indptr.append(len(indices))
+            levels[row] = level_index(features.get("experience_level"))
+
+        skills = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(self.ids), len(self.vocabulary)),
+        )
+        self._index(skills, levels, skill_counts)
+
+    def _index(self, skills, levels, skill_counts):
+        """Sets the row arrays and the lookup structures derived from them."""
+        self.skills = skills
+        self.levels = levels
+        self.skill_counts = skill_counts
+        self.id_array = np.asarray(self._ids, dtype=object)
+
+        # Inverted index: column j of the CSC copy lists the rows that have skill j
+        self.postings = self.skills.tocsc()
+
+        # Rows sharing no skill with a query all have the same features within a
+        # (level, skill count) group, so retrieval only needs the first rows of each group
+        self.group_keys = levels.astype(np.int64) * (int(skill_counts.max(initial=0)) + 1) + skill_counts
+        self.grouped_rows = np.lexsort((np.arange(len(self.ids)), self.group_keys))
+
+    @property
+    def ids(self):
+        # Matrices attached with load() keep only id_array; the list is built on first use
+        if self._ids is None:
+            self._ids = self.id_array.tolist()
+        return self._ids
+
+    @property
+    def id_to_row(self):
+        if self._id_to_row is None:
+            self._id_to_row = {entity_id: row for row, entity_id in enumerate(self.ids)}
+        return self._id_to_row
+
+    def __len__(self):
+        return len(self.id_array)
+
+    # --- Persistence ---
+    def save(self, directory):
+        """Writes the arrays (one .npy each) and the vocabulary to `directory`, for load()."""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'skills_data': self.skills.data, 'skills_indices': self.skills.indices, 'skills_indptr': self.skills.indptr,
+            'postings_data': self.postings.data, 'postings_indices': self.postings.indices, 'postings_indptr': self.postings.indptr,
+            'levels': self.levels, 'skill_counts': self.skill_counts, 'group_keys': self.group_keys, 'grouped_rows': self.grouped_rows,
+            'ids': np.asarray(self.ids, dtype=str),
+        }
+        for name in MATRIX_ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), arrays[name], allow_pickle=False)
+        skills = sorted(self.vocabulary.skill_to_id, key=self.vocabulary.skill_to_id.get)
+        with open(os.path.join(directory, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({"skills": skills, "width": self.skills.shape[1]}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        A FeatureMatrix over the arrays written by save(). With mmap, the arrays are
+        memory-mapped read-only instead of copied, so processes loading the same files
+        share one copy in the page cache.
+        """
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False) for name in MATRIX_ARRAYS}
+        with open(os.path.join(directory, 'vocabulary.json'), 'r', encoding='utf-8') as f:
+            vocabulary_data = json.load(f)
+        vocabulary = SkillVocabulary()
+        vocabulary.skill_to_id = {skill: skill_id for skill_id, skill in enumerate(vocabulary_data["skills"])}
+
+        shape = (len(arrays['ids']), vocabulary_data["width"])
+        matrix = cls.__new__(cls)
+        matrix.vocabulary = vocabulary
+        matrix._ids = None
+        matrix._id_to_row = None
+        matrix.id_array = arrays['ids']
+        matrix.skills = sparse.csr_matrix((arrays['skills_data'], arrays['skills_indices'], arrays['skills_indptr']), shape=shape, copy=False)
+        matrix.postings = sparse.csc_matrix((arrays['postings_data'], arrays['postings_indices'], arrays['postings_indptr']), shape=shape, copy=False)
+        matrix.levels = arrays['levels']
+        matrix.skill_counts = arrays['skill_counts']
+        matrix.group_keys = arrays['group_keys']
+        matrix.grouped_rows = arrays['grouped_rows']
+        return matrix
+
+    def updated(self, upserts=None, removals=()):
+        """
+        A new FeatureMatrix with rows upserted ({id: features}) and removed; this one is
+        left unchanged, so requests holding it are not affected.
+
+        Rows are laid out as if the matrix were rebuilt from the updated {id: features}
+        dict: replaced rows keep their position and new ids are appended. Removals are
+        applied first, so an id both removed and upserted moves to the end. Only the
+        upserted entities are parsed; the other rows are copied as arrays.
+        """
+        upserts = upserts or {}
+        removed = set(removals)
+        added = FeatureMatrix(upserts, vocabulary=self.vocabulary)
+        offset = len(self)
+        removed_rows = np.asarray(sorted(self.id_to_row[entity_id] for entity_id in removed if entity_id in self.id_to_row), dtype=np.int64)
+        appended = [entity_id for entity_id in upserts if entity_id not in self.id_to_row or entity_id in removed]
+
+        # Row of each new row in [old rows; upserted rows]: kept rows in order, then appended ids
+        keep = np.ones(offset, dtype=bool)
+        keep[removed_rows] = False
+        source = np.concatenate([np.flatnonzero(keep), offset + np.asarray([added.id_to_row[entity_id] for entity_id in appended], dtype=np.int64)])
+        # Replaced rows keep their position, shifted up by the removed rows before them
+        for entity_id, added_row in added.id_to_row.items():
+            old_row = self.id_to_row.get(entity_id)
+            if old_row is not None and entity_id not in removed:
+                source[old_row - np.searchsorted(removed_rows, old_row)] = offset + added_row
+
+        if len(removed_rows):
+            ids = self.id_array[keep].tolist() + appended
+            id_to_row = dict(zip(ids, range(len(ids))))
+        else:
+            ids = self.ids + appended
+            id_to_row = dict(self.id_to_row)
+            id_to_row.update(zip(appended, range(offset, len(ids))))
+
+        width = len(self.vocabulary)  # Upserts may have interned new skills
+        stacked = sparse.vstack([
+            sparse.csr_matrix((self.skills.data, self.skills.indices, self.skills.indptr), shape=(len(self), width)),
+            added.skills,
+        ], format='csr')
+
+        matrix = FeatureMatrix.__new__(FeatureMatrix)
+        matrix.vocabulary = self.vocabulary
+        matrix._ids = ids
+        matrix._id_to_row = id_to_row
+        matrix._index(stacked[source], np.concatenate([self.levels, added.levels])[source],
+                      np.concatenate([self.skill_counts, added.skill_counts])[source])
+        return matrix
+
+    def overlap(self, skill_ids, rows=None):
+        """Number of distinct query skills each row (or each of the given rows) shares with the query."""
+        query = np.zeros(self.skills.shape[1], dtype=np.int32)
+        query[skill_ids[skill_ids < self.skills.shape[1]]] = 1
+        skills = self.skills if rows is None else self.skills[rows]
+        return skills @ query
+
+    def candidate_rows(self, skill_ids):
+        """Rows sharing at least one skill with the query, read from the inverted index."""
+        skill_ids = skill_ids[skill_ids < self.postings.shape[1]]
+        indptr, indices = self.postings.indptr, self.postings.indices
+        posting_lists = [indices[indptr[j]:indptr[j + 1]] for j in skill_ids]
+        return np.unique(np.concatenate([np.empty(0, dtype=np.int64), *posting_lists]))
+
+    def group_representatives(self, excluded_rows, k):
+        """The first k rows (in catalog order) of every (level, skill count) group, skipping excluded rows."""
+        excluded = np.zeros(len(self), dtype=bool)
+        excluded[excluded_rows] = True
+        rest = self.grouped_rows[~excluded[self.grouped_rows]]
+        if len(rest) == 0:
+            return rest
+        keys = self.group_keys[rest]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        rank_in_group = np.arange(len(rest)) - np.repeat(starts, np.diff(np.r_[starts, len(rest)]))
+        return rest[rank_in_group < k]
+
+
+def _skill_match(overlap, applicant_skills_count, vacancy_skills_count):
+    """Vectorized calculate_skill_match: 1.0 for vacancies without skills, 0.0 for applicants without skills."""
+    ratio = np.divide(overlap, vacancy_skills_count, out=np.zeros(np.broadcast(overlap, vacancy_skills_count).shape), where=vacancy_skills_count > 0)
+    ratio = np.where(applicant_skills_count > 0, ratio, 0.0)
+    return np.where(vacancy_skills_count > 0, ratio, 1.0)
+
+
+def score_applicant(vacancies, applicant_features, rows=None):
+    """
+    Computes the model features of one applicant against every vacancy row.
+
+    Args:
+        vacancies (FeatureMatrix): The precomputed vacancy catalog.
+        applicant_features (dict): Output of extract_features for the applicant.
+        rows (np.ndarray, optional): Restrict scoring to these vacancy rows.
+
+    Returns:
+        dict: Column name -> array aligned with vacancies.ids (or rows), in FEATURE_COLUMNS order.
+    """
+    applicant_skills = skills_of(applicant_features)
+    applicant_count = len(applicant_skills)
+    overlap = vacancies.overlap(vacancies.vocabulary.lookup(applicant_skills), rows)
+    applicant_level = level_index(applicant_features.get("experience_level"))
+    vacancy_levels = vacancies.levels if rows is None else vacancies.levels[rows]
+    vacancy_counts = vacancies.skill_counts if rows is None else vacancies.skill_counts[rows]
+    return {
+        'skill_match_score': _skill_match(overlap, applicant_count, vacancy_counts),
+        'level_match_score': LEVEL_MATCH_TABLE[applicant_level, vacancy_levels],
+        'applicant_skills_count': np.full(len(vacancy_counts), applicant_count, dtype=np.int64),
+        'vacancy_skills_count': vacancy_counts,
+    }
+
+
+def score_vacancy(applicants, vacancy_features, rows=None):
+    """
+    Computes the model features of one vacancy against every applicant row (reverse matching).
+
+    Args:
+        applicants (FeatureMatrix): The precomputed applicant pool.
+        vacancy_features (dict): Enhanced features of the vacancy.
+        rows (np.ndarray, optional): Restrict scoring to these applicant rows.
+
+    Returns:
+        dict: Column name -> array aligned with applicants.ids (or rows), in FEATURE_COLUMNS order.
+    """
+    vacancy_skills = skills_of(vacancy_features)
+    vacancy_count = len(vacancy_skills)
+    overlap = applicants.overlap(applicants.vocabulary.lookup(vacancy_skills), rows)
+    vacancy_level = level_index(vacancy_features.get("experience_level"))
+    applicant_levels = applicants.levels if rows is None else applicants.levels[rows]
+    applicant_counts = applicants.skill_counts if rows is None else applicants.skill_counts[rows]
+    return {
+        'skill_match_score': _skill_match(overlap, applicant_counts, vacancy_count),
+        'level_match_score': LEVEL_MATCH_TABLE[applicant_levels, vacancy_level],
+        'applicant_skills_count': applicant_counts,
+        'vacancy_skills_count': np.full(len(applicant_counts), vacancy_count, dtype=np.int64),
+    }
+
+
+def select_rows(matrix, query_features, k, exhaustive=False):
+    """
+    Retrieval stage: the sorted rows of matrix worth sending to the model for a query entity.
+
+    Candidates come from the inverted skill index. Every other row has
+    skill_match_score 0 (or 1 if the vacancy lists no skills), so its features depend only
+    on its (level, skill count) group; the first k rows of each group stand in for the rest.
+    With ties broken by position, top_k_indices over these rows returns exactly what a
+    full scan would. Set exhaustive to score every row instead.
+    """
+    if exhaustive:
+        return np.arange(len(matrix))
+    candidates = matrix.candidate_rows(matrix.vocabulary.lookup(skills_of(query_features)))
+    representatives = matrix.group_representatives(candidates, k)
+    return np.union1d(candidates, representatives)
+
+
+def distinct_rows(features):
+    """
+    Deduplicates the rows of a feature frame.
+
+    Returns:
+        tuple: (first_rows, inverse) where first_rows holds the position of the first row
+        of each distinct feature tuple and features.iloc[first_rows[inverse]] equals features.
+    """
+    # Hash-based factorization per column, folded into one compact integer key per row
+    row_keys = np.zeros(len(features), dtype=np.int64)
+    for column in features.columns:
+        codes, uniques = pd.factorize(features[column].to_numpy())
+        row_keys = pd.factorize(row_keys * len(uniques) + codes)[0]
+    inverse, unique_keys = pd.factorize(row_keys)
+
+    # First row holding each distinct key (reverse assignment keeps the earliest index)
+    first_rows = np.empty(len(unique_keys), dtype=np.int64)
+    first_rows[inverse[::-1]] = np.arange(len(features) - 1, -1, -1)
+    return first_rows, inverse
+
+
+def predict_proba_deduplicated(model, features):
+    """
+    Positive-class probabilities for a feature frame, calling the model once per distinct
+    feature row. The features take few distinct values, so this is far cheaper on large frames.
+    """
+    first_rows, inverse = distinct_rows(features)
+    return model.predict_proba(features.iloc[first_rows])[:, 1][inverse]
+
+
+class ProbabilityTable:
+    """
+    Positive-class probabilities of one model, memoized per distinct feature tuple.
+
+    The four model features take few distinct values (level scores, small skill counts
+    and their ratios), so after a few requests almost every tuple is already in the table
+    and scoring a request costs a deduplication and a dictionary lookup per distinct
+    tuple. Only tuples never seen before reach the model, in one predict_proba call.
+    The table stops growing at max_entries (new tuples are then computed, not stored).
+    """
+
+    def __init__(self, model, max_entries=DEFAULT_PROBABILITY_TABLE_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self._table = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def predict(self, features):
+        """Same values as model.predict_proba(features)[:, 1]."""
+        first_rows, inverse = distinct_rows(features)
+        distinct = features.iloc[first_rows]
+        keys = list(map(tuple, distinct.to_numpy(dtype=np.float64).tolist()))
+        with self._lock:
+            probabilities = [self._table.get(key) for key in keys]
+        missing = [position for position, value in enumerate(probabilities) if value is None]
+        if missing:
+            computed = self.model.predict_proba(distinct.iloc[missing])[:, 1]
+            with self._lock:
+                for position, value in zip(missing, computed.tolist()):
+                    probabilities[position] = value
+                    if len(self._table) < self.max_entries:
+                        self._table[keys[position]] = value
+        with self._lock:
+            self._hits += len(keys) - len(missing)
+            self._misses += len(missing)
+        return np.asarray(probabilities, dtype=np.float64)[inverse]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._table), "hits": self._hits, "misses": self._misses}
+
+
+def top_k_indices(scores, k):
+    """
+    Positions of the k highest scores, best first, using a partial selection
+    instead of a full sort. Ties are broken by position so results are deterministic.
+    """
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        # Keep everything tied with the k-th score so the tie-break below sees all of them
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        selected = np.flatnonzero(scores >= kth_score)
+    else:
+        selected = np.arange(len(scores))
+    order = np.lexsort((selected, -scores[selected]))
+    return selected[order[:k]]
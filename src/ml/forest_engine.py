@@ -0,0 +1,198 @@
+import os
+import sys
+import glob
+import struct
+import zipfile
+
+import numpy as np
+import joblib
+
+# --- Configuration ---
+COMPILED_SUFFIX = '.forest.npz'
+FORMAT_VERSION = 1
+LEAF = -1  # Feature id of leaf nodes in the exported tables
+CHUNK_ROWS = 4096  # Distinct rows traversed together; bounds the (row, tree) working arrays
+TRAVERSAL_TABLES = ('split_feature', 'children', 'is_leaf')  # Derived tables, saved too so load(mmap=True) maps them
+
+
+def compiled_forest_path(model_path):
+    """models/recruitment_model_X.joblib -> models/recruitment_model_X.forest.npz"""
+    return os.path.splitext(model_path)[0] + COMPILED_SUFFIX
+
+
+def _mapped_npz(path):
+    """
+    {name: array} of an uncompressed .npz (as written by np.savez), each array
+    memory-mapped read-only where it lies inside the archive instead of being copied.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and cannot be memory-mapped")
+            # The local header repeats the name and may carry its own extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path} holds object arrays and cannot be memory-mapped")
+            if not shape or 0 in shape:  # Scalars and empty arrays: nothing worth mapping
+                arrays[name] = np.lib.format.read_array(archive.open(info.filename), allow_pickle=False)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape, order='F' if fortran_order else 'C')
+    return arrays
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into array tables, evaluated with NumPy.
+
+    All trees share one set of node tables (feature, threshold, children, leaf class
+    probabilities), with child ids already offset to the global node index. Leaves point
+    to themselves. predict_proba() walks every tree for a whole batch at once, one tree
+    level per step, over the distinct rows of the batch only, and gives the same
+    probabilities as sklearn: inputs are compared as float32 (as sklearn does), and
+    per-tree probabilities are normalized and summed in tree order.
+
+    The tables are only read, so load(mmap=True) can map them from the compiled file and
+    every process serving the model shares one copy.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_names, traversal_tables=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.n_estimators = len(roots)
+        # Traversal tables: leaves read feature 0 and step to themselves
+        if traversal_tables is None:
+            traversal_tables = (np.where(feature == LEAF, 0, feature).astype(np.int32), np.stack([left, right], axis=1).ravel(), feature == LEAF)
+        self._split_feature, self._children, self._is_leaf = traversal_tables
+
+    # --- Export / persistence ---
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flattens a fitted single-output RandomForestClassifier."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, LEAF, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset)
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+        feature_names = np.asarray(getattr(model, 'feature_names_in_', []), dtype=str)
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts), np.concatenate(rights),
+                   np.concatenate(values), np.asarray(roots, dtype=np.int32), np.asarray(model.classes_), feature_names)
+
+    def save(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, format_version=FORMAT_VERSION, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, value=self.value, roots=self.roots, classes=self.classes_, feature_names=self.feature_names_in_,
+                 split_feature=self._split_feature, children=self._children, is_leaf=self._is_leaf)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """
+        Reads a compiled forest. With mmap, the tables are memory-mapped from the file
+        instead of copied (files written before the traversal tables were saved get those
+        computed in memory).
+        """
+        if mmap:
+            data = _mapped_npz(path)
+        else:
+            with np.load(path, allow_pickle=False) as archive:
+                data = {name: archive[name] for name in archive.files}
+        if int(data['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest format in {path}")
+        traversal_tables = tuple(data[name] for name in TRAVERSAL_TABLES) if all(name in data for name in TRAVERSAL_TABLES) else None
+        return cls(data['feature'], data['threshold'], data['left'], data['right'], data['value'],
+                   data['roots'], data['classes'], data['feature_names'], traversal_tables)
+
+    # --- Inference ---
+    def _as_matrix(self, X):
+        if hasattr(X, 'columns'):
+            if len(self.feature_names_in_) and list(X.columns) != list(self.feature_names_in_):
+                X = X[list(self.feature_names_in_)]
+            X = X.to_numpy()
+        return np.asarray(X, dtype=np.float32)
+
+    def _apply_chunk(self, X):
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+        values = X.ravel()
+        active = np.flatnonzero(~self._is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_right = values[row_offsets[active] + self._split_feature[current]] > self.threshold[current]
+            following = self._children[2 * current + go_right]
+            nodes[active] = following
+            # Only (row, tree) pairs still on an internal node take the next step
+            active = active[~self._is_leaf[following]]
+        return nodes.reshape(n_rows, n_trees)
+
+    def apply(self, X):
+        """Leaf node id reached in every tree, as an (n_rows, n_trees) array."""
+        X = self._as_matrix(X)
+        # Feature rows repeat a lot (few distinct scores and counts); each distinct row is walked once
+        distinct, inverse = np.unique(X, axis=0, return_inverse=True)
+        leaves = np.concatenate([self._apply_chunk(distinct[start:start + CHUNK_ROWS])
+                                 for start in range(0, len(distinct), CHUNK_ROWS)] or [np.empty((0, len(self.roots)), dtype=np.int32)])
+        return leaves[inverse.ravel()]
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for tree_leaves in leaves.T:
+            proba += self.value[tree_leaves]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def export_forest(model, model_path):
+    """Writes the compiled tables next to a saved model; returns the compiled file path."""
+    path = compiled_forest_path(model_path)
+    CompiledForest.from_sklearn(model).save(path)
+    return path
+
+
+def load_for_inference(model_path, mmap=False):
+    """The compiled forest saved next to a model when there is one (memory-mapped with mmap), otherwise the joblib model."""
+    compiled_path = compiled_forest_path(model_path)
+    if os.path.exists(compiled_path):
+        return CompiledForest.load(compiled_path, mmap=mmap)
+    return joblib.load(model_path)
+
+
+if __name__ == "__main__":
+    # Compiles models trained before the export step existed
+    model_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../models'))
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(model_dir, 'recruitment_model_*.joblib')))
+    for model_path in paths:
+        if os.path.exists(compiled_forest_path(model_path)):
+            continue
+        print(f"-> Compiling {os.path.basename(model_path)}")
+        export_forest(joblib.load(model_path), model_path)
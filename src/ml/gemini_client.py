@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+
+import httpx
+
+# --- Configuration ---
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Documents packed into one prompt, bounded by both count and characters
+DOCS_PER_REQUEST = int(os.getenv("GEMINI_DOCS_PER_REQUEST", "8"))
+MAX_CHARS_PER_REQUEST = int(os.getenv("GEMINI_MAX_CHARS_PER_REQUEST", "60000"))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+CHARS_PER_TOKEN = 4  # Rough estimate used for the tokens-per-minute budget
+OUTPUT_TOKENS_PER_DOC = 150
+EXPERIENCE_LEVELS = ("junior", "pleno", "senior", "leadership")
+
+BATCH_PROMPT_TEMPLATE = """
+    Analyze each of the following texts from a recruitment {entity_type} and extract the information below.
+    Return the output ONLY as a valid JSON object whose keys are the document ids and whose values are objects with:
+
+    1.  "technical_skills": A list of key technical skills, tools, and methodologies. Examples: "Python", "SQL", "AWS", "Scrum", "SAP", "Java".
+    2.  "languages": A dictionary of languages and their proficiency levels. Examples: {{"English": "advanced", "Spanish": "intermediate"}}.
+    3.  "experience_level": Classify the experience level into one of these four categories ONLY: "junior", "pleno", "senior", or "leadership".
+
+    Here are the texts to analyze:
+{documents}
+    """
+DOCUMENT_TEMPLATE = "<<<DOCUMENT id={doc_id}>>>\n{text}\n<<<END DOCUMENT>>>"
+DOCUMENT_PATTERN = re.compile(r"<<<DOCUMENT id=(\w+)>>>\n(.*?)\n<<<END DOCUMENT>>>", re.DOTALL)
+
+
+class GeminiAPIError(RuntimeError):
+    """Raised when a request still fails after all retries, or fails with a non-retryable status."""
+
+
+class ExtractionResult:
+    """Outcome for one document: features on success, otherwise the reason it failed."""
+
+    def __init__(self, features=None, error=None):
+        self.features = features
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"ExtractionResult(features={self.features!r}, error={self.error!r})"
+
+
+def empty_features():
+    return {"technical_skills": [], "languages": {}, "experience_level": "not specified"}
+
+
+def validate_features(value):
+    """
+    Checks one document's output against the feature schema and normalizes it.
+
+    Raises:
+        ValueError: If the value does not have the expected shape.
+    """
+    if not isinstance(value, dict):
+        raise ValueError("document output is not an object")
+    skills = value.get("technical_skills", [])
+    languages = value.get("languages", {})
+    level = value.get("experience_level", "not specified")
+    if not isinstance(skills, list) or not all(isinstance(skill, str) for skill in skills):
+        raise ValueError("technical_skills must be a list of strings")
+    if not isinstance(languages, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in languages.items()):
+        raise ValueError("languages must map strings to strings")
+    if not isinstance(level, str):
+        raise ValueError("experience_level must be a string")
+    level = level.strip().lower()
+    return {
+        "technical_skills": skills,
+        "languages": languages,
+        "experience_level": level if level in EXPERIENCE_LEVELS else "not specified",
+    }
+
+
+def parse_response_documents(data):
+    """Extracts the {doc id: output} object from a generateContent response body."""
+    text = data["candidates"][0]["content"]["parts"][0]["text"]
+    text = text.strip().replace('```json', '').replace('```', '')
+    documents = json.loads(text)
+    if not isinstance(documents, dict):
+        raise ValueError("response is not a JSON object keyed by document id")
+    return documents
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets as continuously refilled buckets.
+
+    State is guarded by a thread lock rather than an asyncio primitive, so one limiter is
+    shared by every event loop in the process (each API request thread runs its own).
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, clock=time.monotonic):
+        self.rates = {"requests": requests_per_minute / 60.0, "tokens": tokens_per_minute / 60.0}
+        self.capacity = {"requests": float(requests_per_minute), "tokens": float(tokens_per_minute)}
+        self.level = dict(self.capacity)
+        self.clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens):
+        """Takes one request and `tokens` tokens if available; otherwise returns the seconds to wait."""
+        with self._lock:
+            now = self.clock()
+            elapsed, self._updated = now - self._updated, now
+            for name in self.level:
+                self.level[name] = min(self.capacity[name], self.level[name] + elapsed * self.rates[name])
+            needed = {"requests": 1.0, "tokens": min(float(tokens), self.capacity["tokens"])}
+            shortfall = {name: needed[name] - self.level[name] for name in needed}
+            if all(value <= 0 for value in shortfall.values()):
+                for name in needed:
+                    self.level[name] -= needed[name]
+                return 0.0
+            return max(value / self.rates[name] for name, value in shortfall.items() if value > 0)
+
+    async def acquire(self, tokens):
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than a server-provided Retry-After."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class GeminiClient:
+    """
+    Async feature-extraction client for the Gemini generateContent REST endpoint.
+
+    extract_many() packs documents into multi-document prompts, sends at most
+    max_concurrency requests at a time within the rate limiter's budget and retries
+    transient failures (timeouts, 429, 5xx) with jittered backoff. Each document's output
+    is validated on its own: a bad document fails alone, with the reason recorded in its
+    ExtractionResult and in stats(), and the caller decides how to fall back.
+    """
+
+    def __init__(self, api_key, model=GEMINI_MODEL_NAME, base_url=GEMINI_API_BASE, docs_per_request=DOCS_PER_REQUEST,
+                 max_chars_per_request=MAX_CHARS_PER_REQUEST, max_concurrency=MAX_CONCURRENCY, rate_limiter=None,
+                 max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT):
+        self.api_key = api_key
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/v1beta/models/{model}:generateContent"
+        self.docs_per_request = docs_per_request
+        self.max_chars_per_request = max_chars_per_request
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._counter_lock = threading.Lock()
+        self._counters = {"requests": 0, "retries": 0, "documents": 0, "documents_failed": 0, "failures": {}}
+
+    # --- Bookkeeping ---
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def _record_failure(self, reason, documents):
+        with self._counter_lock:
+            self._counters["documents_failed"] += documents
+            self._counters["failures"][reason] = self._counters["failures"].get(reason, 0) + documents
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+            counters["failures"] = dict(self._counters["failures"])
+        return counters
+
+    # --- Requests ---
+    def _pack(self, items):
+        """Splits (position, text) items into request-sized groups."""
+        groups, current, current_chars = [], [], 0
+        for item in items:
+            if current and (len(current) >= self.docs_per_request or current_chars + len(item[1]) > self.max_chars_per_request):
+                groups.append(current)
+                current, current_chars = [], 0
+            current.append(item)
+            current_chars += len(item[1])
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _post(self, http, payload, estimated_tokens):
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            self._count("requests")
+            retry_after = None
+            try:
+                response = await http.post(self.url, json=payload, headers={"x-goog-api-key": self.api_key})
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise GeminiAPIError(f"{error}: {response.text[:200]}")
+                try:
+                    retry_after = float(response.headers.get("retry-after", ""))
+                except ValueError:
+                    retry_after = None
+            if attempt == self.max_retries:
+                raise GeminiAPIError(f"{error} after {self.max_retries + 1} attempts")
+            self._count("retries")
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    async def _extract_group(self, http, semaphore, entity_type, group):
+        documents = "\n".join(DOCUMENT_TEMPLATE.format(doc_id=doc_id, text=text) for doc_id, (_, text) in enumerate(group))
+        prompt = BATCH_PROMPT_TEMPLATE.format(entity_type=entity_type, documents=documents)
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"responseMimeType": "application/json", "temperature": 0},
+        }
+        estimated_tokens = len(prompt) // CHARS_PER_TOKEN + OUTPUT_TOKENS_PER_DOC * len(group)
+
+        async with semaphore:
+            try:
+                documents_out = parse_response_documents(await self._post(http, payload, estimated_tokens))
+            except GeminiAPIError as e:
+                self._record_failure("api_error", len(group))
+                return [(position, ExtractionResult(error=str(e))) for position, _ in group]
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                self._record_failure("invalid_response", len(group))
+                return [(position, ExtractionResult(error=f"invalid response: {e}")) for position, _ in group]
+
+        results = []
+        for doc_id, (position, _) in enumerate(group):
+            output = documents_out.get(str(doc_id))
+            if output is None:
+                self._record_failure("missing_document", 1)
+                results.append((position, ExtractionResult(error="document missing from response")))
+                continue
+            try:
+                results.append((position, ExtractionResult(features=validate_features(output))))
+            except ValueError as e:
+                self._record_failure("invalid_document", 1)
+                results.append((position, ExtractionResult(error=f"invalid document: {e}")))
+        return results
+
+    async def extract_many(self, texts, entity_type):
+        """
+        Extracts features for a list of texts.
+
+        Returns:
+            list: One ExtractionResult per text, in input order. Empty texts succeed
+            with empty features without an API call.
+        """
+        results = [ExtractionResult(features=empty_features()) if not text else None for text in texts]
+        pending = [(position, text) for position, text in enumerate(texts) if text]
+        self._count("documents", len(pending))
+        if pending:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with httpx.AsyncClient(timeout=self.timeout) as http:
+                groups = await asyncio.gather(*(self._extract_group(http, semaphore, entity_type, group) for group in self._pack(pending)))
+            for group in groups:
+                for position, result in group:
+                    results[position] = result
+        return results
+
+    def extract_many_sync(self, texts, entity_type):
+        """Blocking wrapper for callers outside an event loop (pipeline scripts, sync API routes)."""
+        return asyncio.run(self.extract_many(texts, entity_type))
@@ -0,0 +1,131 @@
+import json
+
+# --- Configuration ---
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # Characters read per refill of the parse buffer
+_WHITESPACE = ' \t\n\r'
+_VALUE_TERMINATORS = _WHITESPACE + ',:}]'
+
+
+def _skip_whitespace(buffer, pos):
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def iter_json_object(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Incrementally parses a file holding one top-level JSON object and yields its
+    (key, value) pairs in file order, keeping only the current entry in memory.
+
+    Works for the raw dumps keyed by id (applicants.json, prospects.json, vagas.json),
+    where each value is small but the whole file is not.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def refill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def decode_next():
+            """Decodes one JSON value at pos, reading more input until it is complete."""
+            nonlocal pos
+            while True:
+                pos = _skip_whitespace(buffer, pos)
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A number cut at the buffer edge ("12" of "123", "-0" of "-0.5") still decodes,
+                    # so only accept a value once the character after it is a delimiter
+                    if eof or (end < len(buffer) and buffer[end] in _VALUE_TERMINATORS):
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                refill()
+
+        def expect(char):
+            nonlocal pos
+            while True:
+                pos = _skip_whitespace(buffer, pos)
+                if pos < len(buffer):
+                    break
+                if eof:
+                    raise ValueError(f"Unexpected end of file in {path}, expected '{char}'.")
+                refill()
+            if buffer[pos] != char:
+                raise ValueError(f"Expected '{char}' at offset {pos} of the parse buffer in {path}, found '{buffer[pos]}'.")
+            pos += 1
+
+        def peek():
+            while True:
+                p = _skip_whitespace(buffer, pos)
+                if p < len(buffer):
+                    return buffer[p]
+                if eof:
+                    return ''
+                refill()
+
+        refill()
+        expect('{')
+        if peek() == '}':
+            return
+        while True:
+            key = decode_next()
+            expect(':')
+            value = decode_next()
+            yield key, value
+            if peek() == ',':
+                expect(',')
+                continue
+            expect('}')
+            return
+
+
+def write_json_array(path, items, indent=4):
+    """
+    Writes an iterable as a JSON array one item at a time, producing exactly the bytes
+    json.dump(list(items), f, indent=indent, ensure_ascii=False) would, without ever
+    holding the full list or its encoded text.
+
+    Returns:
+        int: The number of items written.
+    """
+    count = 0
+    prefix = ' ' * indent
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write('[\n' if count == 0 else ',\n')
+            encoded = json.dumps(item, indent=indent, ensure_ascii=False)
+            # JSON strings cannot contain raw newlines, so re-indenting line by line is safe
+            f.write('\n'.join(prefix + line for line in encoded.split('\n')))
+            count += 1
+        f.write('\n]' if count else '[]')
+    return count
+
+
+def write_json_object(path, pairs, indent=4):
+    """
+    Writes (key, value) pairs as a JSON object one entry at a time, producing the same
+    bytes as json.dump(dict(pairs), f, indent=indent, ensure_ascii=False) for unique keys.
+
+    Returns:
+        int: The number of entries written.
+    """
+    count = 0
+    prefix = ' ' * indent
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, value in pairs:
+            f.write('{\n' if count == 0 else ',\n')
+            encoded = json.dumps(value, indent=indent, ensure_ascii=False)
+            f.write(prefix + json.dumps(str(key), ensure_ascii=False) + ': ' + f'\n{prefix}'.join(encoded.split('\n')))
+            count += 1
+        f.write('\n}' if count else '{}')
+    return count
@@ -0,0 +1,114 @@
+import re
+
+# --- Configuration ---
+NOT_SPECIFIED = "not specified"
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _compile_term(term):
+    """(term, check left boundary, check right boundary); boundaries only apply next to word characters."""
+    return (term, _is_word_char(term[0]), _is_word_char(term[-1]))
+
+
+def iter_term_positions(text, compiled_term):
+    """
+    Start offsets where the term occurs in text as a whole word, so 'sr' does not match
+    inside 'usr' and 'java' does not match 'javascript'. Candidates come from str.find,
+    which scans in C.
+    """
+    term, check_left, check_right = compiled_term
+    size = len(term)
+    start = text.find(term)
+    while start != -1:
+        end = start + size
+        if (not check_left or start == 0 or not _is_word_char(text[start - 1])) and \
+           (not check_right or end == len(text) or not _is_word_char(text[end])):
+            yield start
+        start = text.find(term, start + 1)
+
+
+def contains_term(text, compiled_term):
+    """Same test as iter_term_positions, inlined because it runs for every keyword of every text."""
+    term, check_left, check_right = compiled_term
+    size = len(term)
+    start = text.find(term)
+    while start != -1:
+        if check_left and start > 0:
+            before = text[start - 1]
+            if before.isalnum() or before == '_':
+                start = text.find(term, start + 1)
+                continue
+        end = start + size
+        if not check_right or end == len(text):
+            return True
+        after = text[end]
+        if not (after.isalnum() or after == '_'):
+            return True
+        start = text.find(term, start + 1)
+    return False
+
+
+class KeywordMatcher:
+    """
+    Keyword-based feature extractor compiled once from a vocabulary.
+
+    Args:
+        skills (list): Skill keywords, lowercase.
+        languages (dict): Language keyword -> accepted proficiency words, lowercase.
+        levels (list): (experience level, keywords) pairs in priority order; the first
+            level with a matching keyword wins.
+
+    Every keyword must match as a whole word. A language followed by one of its
+    proficiency words ("english: advanced") records that proficiency; a language mentioned
+    on its own is recorded as 'not specified'.
+    """
+
+    def __init__(self, skills, languages, levels):
+        self.skills = [_compile_term(skill) for skill in sorted(set(skills))]
+        self.languages = []
+        for language, proficiencies in languages.items():
+            # Longest first, so 'fluente' is preferred over its prefix 'fluent'
+            alternatives = '|'.join(re.escape(word) for word in sorted(set(proficiencies), key=len, reverse=True))
+            # Anchored at each whole-word occurrence of the language by extract()
+            pattern = re.compile(rf"{re.escape(language)}[\s:-]+({alternatives})(?!\w)")
+            self.languages.append((language.capitalize(), _compile_term(language), pattern))
+        self.levels = [(level, [_compile_term(keyword) for keyword in keywords]) for level, keywords in levels]
+
+    def extract(self, text):
+        """Returns {"technical_skills", "languages", "experience_level"} for one text."""
+        if not text:
+            return {"technical_skills": [], "languages": {}, "experience_level": NOT_SPECIFIED}
+        text_lower = text.lower()
+        technical_skills = [skill[0] for skill in self.skills if contains_term(text_lower, skill)]
+
+        languages = {}
+        for name, language, proficiency_pattern in self.languages:
+            for position in iter_term_positions(text_lower, language):
+                match = proficiency_pattern.match(text_lower, position)
+                if match:
+                    languages[name] = match.group(1)
+                    break
+                languages[name] = NOT_SPECIFIED
+
+        experience_level = NOT_SPECIFIED
+        for level, keywords in self.levels:
+            if any(contains_term(text_lower, keyword) for keyword in keywords):
+                experience_level = level
+                break
+
+        return {"technical_skills": technical_skills, "languages": languages, "experience_level": experience_level}
+
+    def extract_batch(self, texts):
+        """Extracts a list of texts; identical texts (repeated CVs, reposted vacancies) are matched once."""
+        results = {}
+        output = []
+        for text in texts:
+            features = results.get(text)
+            if features is None:
+                features = results[text] = self.extract(text)
+            # Each caller gets its own containers
+            output.append({"technical_skills": list(features["technical_skills"]), "languages": dict(features["languages"]), "experience_level": features["experience_level"]})
+        return output
@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+
+# --- Configuration ---
+METADATA_SUFFIX = '.meta.json'
+TARGET_COLUMN = 'hired'
+TARGET_NAMES = ['Not Hired', 'Hired']
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+DEFAULT_MAX_EVALUATIONS = 32
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path, chunk_size=1024 * 1024):
+    """
+    sha256 of a file's contents, memoized on (path, size, mtime) so an unchanged file is
+    hashed once per process.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+    stat_result = os.stat(path)
+    key = (os.path.abspath(path), stat_result.st_size, stat_result.st_mtime_ns)
+    with _fingerprints_lock:
+        cached = _fingerprints.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()
+    with _fingerprints_lock:
+        _fingerprints[key] = fingerprint
+    return fingerprint
+
+
+def split_indices(y):
+    """Row positions (train, test) of the stratified split shared by training and evaluation."""
+    return train_test_split(np.arange(len(y)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+
+
+def evaluation_metrics(y_true, predictions):
+    """Accuracy, confusion matrix and classification report as JSON-ready values."""
+    return {
+        "accuracy": float(accuracy_score(y_true, predictions)),
+        "confusion_matrix": confusion_matrix(y_true, predictions).tolist(),
+        "classification_report": classification_report(y_true, predictions, target_names=TARGET_NAMES, output_dict=True, zero_division=0),
+    }
+
+
+# --- Sidecar files ---
+def metadata_path(model_path):
+    """models/recruitment_model_X.joblib -> models/recruitment_model_X.meta.json"""
+    return os.path.splitext(model_path)[0] + METADATA_SUFFIX
+
+
+def write_model_metadata(model_path, dataset_path, dataset_hash, features, test_indices, metrics, model_sha256=None):
+    """
+    Writes the sidecar describing how a model was trained and how it scored.
+    model_sha256 is given when the model is still under a temporary name.
+    """
+    metadata = {
+        "model_file": os.path.basename(model_path),
+        "model_sha256": model_sha256 or file_fingerprint(model_path),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "dataset": {"file": os.path.basename(dataset_path), "sha256": dataset_hash},
+        "features": list(features),
+        "target": TARGET_COLUMN,
+        "split": {"test_size": TEST_SIZE, "random_state": RANDOM_STATE, "stratify": TARGET_COLUMN, "test_indices": [int(i) for i in test_indices]},
+        "metrics": metrics,
+    }
+    path = metadata_path(model_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def read_model_metadata(model_path):
+    """The model's sidecar, or None if it has none (models trained before sidecars existed)."""
+    try:
+        with open(metadata_path(model_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class ModelEvaluator:
+    """
+    Test-set evaluation of saved models, computed at most once per (model, dataset).
+
+    Results are keyed by (model sha256, dataset sha256). The training-time metrics in a
+    model's sidecar are used when both hashes still match; otherwise the model is scored
+    on the test split of the current dataset. That split is memoized per dataset hash,
+    so evaluating several models reads and splits the dataset once.
+
+    Args:
+        dataset_path (str or callable): The dataset file, or a function returning it (for
+            data stored in one of several formats); resolved and fingerprinted on each call.
+        load_dataset (callable): load_dataset(path) returns the dataset as a DataFrame with the feature and target columns.
+        features (list): Model input columns.
+    """
+
+    def __init__(self, dataset_path, load_dataset, features, max_entries=DEFAULT_MAX_EVALUATIONS):
+        self.dataset_path = dataset_path
+        self.load_dataset = load_dataset
+        self.features = list(features)
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._split = None  # (dataset hash, X_test, y_test)
+        self._lock = threading.Lock()
+
+    def _test_split(self, dataset_path, dataset_hash):
+        if self._split is None or self._split[0] != dataset_hash:
+            df = self.load_dataset(dataset_path)
+            test = df.iloc[split_indices(df[TARGET_COLUMN])[1]]
+            self._split = (dataset_hash, test[self.features], test[TARGET_COLUMN])
+        return self._split[1], self._split[2]
+
+    def evaluate(self, model_path, model_hash, load_model):
+        """
+        Returns (metrics, source), where source is 'cache', 'metadata' or 'computed'.
+        load_model() is only called when the metrics have to be computed.
+        """
+        dataset_path = self.dataset_path() if callable(self.dataset_path) else self.dataset_path
+        dataset_hash = file_fingerprint(dataset_path)
+        key = (model_hash, dataset_hash)
+        with self._lock:
+            metrics = self._results.get(key)
+            if metrics is not None:
+                self._results.move_to_end(key)
+                return metrics, "cache"
+
+            metadata = read_model_metadata(model_path)
+            if metadata is not None and metadata.get("model_sha256") == model_hash and metadata["dataset"]["sha256"] == dataset_hash:
+                metrics, source = metadata["metrics"], "metadata"
+            else:
+                X_test, y_test = self._test_split(dataset_path, dataset_hash)
+                metrics, source = evaluation_metrics(y_test, load_model().predict(X_test)), "computed"
+
+            self._results[key] = metrics
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            return metrics, source
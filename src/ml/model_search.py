@@ -0,0 +1,188 @@
+import os
+import time
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import roc_auc_score, average_precision_score, f1_score, balanced_accuracy_score, accuracy_score
+
+from src.ml.model_metadata import split_indices, RANDOM_STATE
+from src.ml.forest_engine import CompiledForest
+
+# --- Configuration ---
+DEFAULT_FOLDS = 5
+DEFAULT_METRIC = 'roc_auc'
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "-1"))  # -1 = all cores
+LATENCY_ROWS = 500  # Rows per timed predict_proba call, about one /predict request
+LATENCY_REPEATS = 20
+
+# family -> (estimator factory, parameter grid, fixed parameters)
+SEARCH_SPACE = {
+    "random_forest": (
+        RandomForestClassifier,
+        {"n_estimators": [100, 200], "max_depth": [None, 12], "min_samples_leaf": [1, 5]},
+        {"class_weight": "balanced", "random_state": RANDOM_STATE, "n_jobs": 1},
+    ),
+    "hist_gradient_boosting": (
+        HistGradientBoostingClassifier,
+        {"learning_rate": [0.05, 0.1], "max_iter": [100, 200], "max_leaf_nodes": [15, 31]},
+        {"class_weight": "balanced", "random_state": RANDOM_STATE},
+    ),
+    "logistic_regression": (
+        lambda **params: make_pipeline(StandardScaler(), LogisticRegression(**params)),
+        {"C": [0.1, 1.0, 10.0]},
+        {"class_weight": "balanced", "max_iter": 1000},
+    ),
+}
+
+
+def build_estimator(family, params):
+    factory, _, fixed = SEARCH_SPACE[family]
+    return factory(**fixed, **params)
+
+
+def iter_candidates(families=None, max_candidates=None):
+    """(family, params) pairs of the grid; max_candidates keeps a seeded random subset."""
+    candidates = [(family, params) for family in (families or SEARCH_SPACE) for params in ParameterGrid(SEARCH_SPACE[family][1])]
+    if max_candidates is not None and max_candidates < len(candidates):
+        chosen = np.random.default_rng(RANDOM_STATE).choice(len(candidates), size=max_candidates, replace=False)
+        candidates = [candidates[i] for i in sorted(chosen)]
+    return candidates
+
+
+def score_predictions(y_true, probabilities):
+    predictions = (probabilities >= 0.5).astype(int)
+    return {
+        "roc_auc": roc_auc_score(y_true, probabilities),
+        "average_precision": average_precision_score(y_true, probabilities),
+        "f1": f1_score(y_true, predictions, zero_division=0),
+        "balanced_accuracy": balanced_accuracy_score(y_true, predictions),
+        "accuracy": accuracy_score(y_true, predictions),
+    }
+
+
+# --- Worker side ---
+_shared_arrays = {}
+
+
+def _shared(data_dir):
+    """The memory-mapped dataset, opened once per worker process."""
+    arrays = _shared_arrays.get(data_dir)
+    if arrays is None:
+        arrays = _shared_arrays[data_dir] = (
+            np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r'),
+            np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r'),
+            np.load(os.path.join(data_dir, 'train_indices.npy'), mmap_mode='r'),
+        )
+    return arrays
+
+
+def _run_task(family, params, fold, folds, data_dir):
+    """
+    Fits one candidate. fold is a cross-validation fold of the training split, or None
+    for the final fit on the whole training split (whose model is returned).
+    """
+    X, y, train_indices = _shared(data_dir)
+    if fold is None:
+        fit_rows, eval_rows = np.asarray(train_indices), None
+    else:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+        fit_positions, eval_positions = list(splitter.split(train_indices, y[train_indices]))[fold]
+        fit_rows, eval_rows = train_indices[fit_positions], train_indices[eval_positions]
+
+    model = build_estimator(family, params)
+    started = time.perf_counter()
+    model.fit(X[fit_rows], y[fit_rows])
+    fit_seconds = time.perf_counter() - started
+    if eval_rows is None:
+        return {"model": model, "fit_seconds": fit_seconds}
+    return {"scores": score_predictions(y[eval_rows], model.predict_proba(X[eval_rows])[:, 1]), "fit_seconds": fit_seconds}
+
+
+# --- Driver ---
+def serving_model(model):
+    """The object the API would score with: random forests are served from their compiled tables."""
+    if isinstance(model, RandomForestClassifier):
+        return CompiledForest.from_sklearn(model), "numpy"
+    return model, "sklearn"
+
+
+def measure_latency(model, X_sample, repeats=LATENCY_REPEATS):
+    """Median seconds of one predict_proba call on X_sample."""
+    model.predict_proba(X_sample)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.predict_proba(X_sample)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def run_search(X, y, families=None, folds=DEFAULT_FOLDS, workers=SEARCH_WORKERS, max_candidates=None, metric=DEFAULT_METRIC):
+    """
+    Cross-validates every candidate on the training split, then refits each on the whole
+    training split to measure its holdout scores, inference latency (with the engine the
+    API would serve it with) and pickled size.
+
+    The dataset is written once as .npy files and memory-mapped by the workers, so tasks
+    carry only a candidate and a fold number. All fits (folds x candidates, plus the final
+    fits) run in one joblib pool; latency is timed afterwards in this process, one model
+    at a time, so the timings are not skewed by concurrent fits.
+
+    Returns:
+        tuple: (leaderboard DataFrame sorted by the mean CV metric, {candidate id: fitted model})
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.int64)
+    train_indices, test_indices = split_indices(y)
+    candidates = iter_candidates(families, max_candidates)
+    tasks = [(c, fold) for c in range(len(candidates)) for fold in list(range(folds)) + [None]]
+    print(f"-> Searching {len(candidates)} candidates with {folds}-fold CV ({len(tasks)} fits, workers={workers}).")
+
+    data_dir = tempfile.mkdtemp(prefix='model_search_')
+    try:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+        np.save(os.path.join(data_dir, 'train_indices.npy'), train_indices)
+        results = Parallel(n_jobs=workers, verbose=0)(
+            delayed(_run_task)(*candidates[c], fold, folds, data_dir) for c, fold in tasks
+        )
+    finally:
+        _shared_arrays.pop(data_dir, None)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    rows, models = [], {}
+    latency_sample = X[test_indices[:LATENCY_ROWS]]
+    for c, (family, params) in enumerate(candidates):
+        outcomes = [result for (task_candidate, _), result in zip(tasks, results) if task_candidate == c]
+        fold_scores = pd.DataFrame([outcome["scores"] for outcome in outcomes if "scores" in outcome])
+        model = next(outcome["model"] for outcome in outcomes if "model" in outcome)
+        holdout = score_predictions(y[test_indices], model.predict_proba(X[test_indices])[:, 1])
+        candidate_id = f"{family}-{c}"
+        models[candidate_id] = model
+        served, engine = serving_model(model)
+        rows.append({
+            "candidate": candidate_id,
+            "family": family,
+            "params": params,
+            f"cv_{metric}": fold_scores[metric].mean(),
+            f"cv_{metric}_std": fold_scores[metric].std(ddof=0),
+            **{f"cv_{name}": value for name, value in fold_scores.mean().items() if name != metric},
+            **{f"holdout_{name}": value for name, value in holdout.items()},
+            "fit_seconds": float(np.mean([outcome["fit_seconds"] for outcome in outcomes])),
+            "engine": engine,
+            "latency_ms": measure_latency(served, latency_sample) * 1000,
+            "model_kb": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+        })
+
+    leaderboard = pd.DataFrame(rows).sort_values([f"cv_{metric}", "latency_ms"], ascending=[False, True]).reset_index(drop=True)
+    leaderboard.insert(0, "rank", np.arange(1, len(leaderboard) + 1))
+    return leaderboard, models
@@ -0,0 +1,165 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# --- Configuration ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+PROCESSED_DIR = os.getenv("PROCESSED_DATA_DIR", os.path.join(BASE_DIR, 'data', 'processed'))
+# JSON copies are still written next to the columnar files for tools that expect them
+EXPORT_JSON = os.getenv("EXPORT_PROCESSED_JSON", "1").lower() in ("1", "true", "yes")
+WRITE_BATCH_ROWS = 10000
+
+TRAINING_DATASET = 'training_dataset'
+PROSPECTS_AGGREGATED = 'prospects_aggregated'
+
+TRAINING_DATASET_SCHEMA = pa.schema([
+    ('vaga_id', pa.string()),
+    ('applicant_id', pa.string()),
+    ('skill_match_score', pa.float64()),
+    ('level_match_score', pa.float64()),
+    ('applicant_level', pa.string()),
+    ('vacancy_level', pa.string()),
+    ('applicant_skills_count', pa.int32()),
+    ('vacancy_skills_count', pa.int32()),
+    ('hired', pa.int8()),
+])
+
+# One row per application; the nested raw documents are kept as JSON text columns
+PROSPECTS_AGGREGATED_SCHEMA = pa.schema([
+    ('vaga_id', pa.string()),
+    ('codigo', pa.string()),
+    ('nome', pa.string()),
+    ('situacao_candidado', pa.string()),
+    ('data_candidatura', pa.string()),
+    ('ultima_atualizacao', pa.string()),
+    ('comentario', pa.string()),
+    ('recrutador', pa.string()),
+    ('vaga_details_json', pa.string()),
+    ('full_profile_json', pa.string()),
+])
+
+SCHEMAS = {
+    TRAINING_DATASET: TRAINING_DATASET_SCHEMA,
+    PROSPECTS_AGGREGATED: PROSPECTS_AGGREGATED_SCHEMA,
+}
+
+
+def table_path(name):
+    return os.path.join(PROCESSED_DIR, f'{name}.feather')
+
+
+def json_path(name):
+    return os.path.join(PROCESSED_DIR, f'{name}.json')
+
+
+def flatten_aggregated(aggregated_records):
+    """Yields one flat row per application from prospects_aggregated records."""
+    for prospect_entry in aggregated_records:
+        vaga_details_json = json.dumps(prospect_entry.get("vaga_details", {}), ensure_ascii=False)
+        for application in prospect_entry.get("prospects_with_details", []):
+            row = {field.name: application.get(field.name) for field in PROSPECTS_AGGREGATED_SCHEMA}
+            row["vaga_id"] = prospect_entry.get("vaga_id")
+            row["vaga_details_json"] = vaga_details_json
+            row["full_profile_json"] = json.dumps(application.get("full_profile", {}), ensure_ascii=False)
+            yield {name: (str(value) if value is not None else None) for name, value in row.items()}
+
+
+def _coerce(rows, schema):
+    """Builds a typed record batch from a list of dicts, ignoring extra keys."""
+    return pa.RecordBatch.from_pylist([{field.name: row.get(field.name) for field in schema} for row in rows], schema=schema)
+
+
+class TableWriter:
+    """
+    Writes rows to an uncompressed Feather (Arrow IPC) file in batches, so large tables
+    are never materialized at once. Uncompressed files can be memory-mapped on read.
+    """
+
+    def __init__(self, name, batch_rows=WRITE_BATCH_ROWS):
+        self.schema = SCHEMAS[name]
+        self.path = table_path(name)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._pending = []
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temporary file and rename on close so readers never see a partial table
+        self._tmp_path = self.path + '.tmp'
+        self._writer = pa.ipc.new_file(self._tmp_path, self.schema)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_rows:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_batch(_coerce(self._pending, self.schema))
+            self.rows_written += len(self._pending)
+            self._pending = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._writer.close()
+            os.remove(self._tmp_path)
+
+
+def write_table(df, name, export_json=EXPORT_JSON):
+    """Writes a DataFrame as a typed Feather table, plus a JSON export if enabled."""
+    with TableWriter(name) as writer:
+        writer.write_rows(df.to_dict(orient='records'))
+    if export_json:
+        df.to_json(json_path(name), orient='records', force_ascii=False)
+    return table_path(name)
+
+
+def _read_json_fallback(name, columns):
+    with open(json_path(name), 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    if name == PROSPECTS_AGGREGATED:
+        records = list(flatten_aggregated(records))
+    df = pd.DataFrame(records) if records else pd.DataFrame(columns=SCHEMAS[name].names)
+    return df[columns] if columns else df
+
+
+def source_path(name):
+    """
+    The file read_table() reads for a table: the Feather file, or the legacy JSON file
+    if only that one exists. Fingerprint this path, not table_path(), to identify the data.
+
+    Raises:
+        FileNotFoundError: If neither the Feather nor the JSON file exists.
+    """
+    path = table_path(name)
+    if os.path.exists(path):
+        return path
+    if os.path.exists(json_path(name)):
+        return json_path(name)
+    raise FileNotFoundError(f"No processed data found for '{name}' (looked for {path} and {json_path(name)}).")
+
+
+def read_table(name, columns=None, path=None):
+    """
+    Loads a processed table, reading only the requested columns. Feather files are
+    memory-mapped; if only the legacy JSON file exists it is parsed instead. Pass the
+    path returned by source_path() to read exactly the file that was fingerprinted.
+
+    Raises:
+        FileNotFoundError: If neither the Feather nor the JSON file exists.
+    """
+    path = path or source_path(name)
+    if path.endswith('.json'):
+        return _read_json_fallback(name, columns)
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
@@ -0,0 +1,194 @@
+import os
+import sys
+import random
+import argparse
+from datetime import date, timedelta
+
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.json_stream import write_json_object
+from src.ml.feature_extractor import SKILL_KEYWORDS, LANGUAGE_LEVELS
+
+# --- Configuration ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+DEFAULT_VACANCIES = 2000
+DEFAULT_APPLICANTS = 20000
+DEFAULT_SEED = 42
+MAX_PROSPECTS_PER_VACANCY = 12
+VACANCY_ID_START = 1000
+APPLICANT_ID_START = 100000
+
+# --- Vocabulary ---
+LEVEL_WORDS = {
+    'junior': ['Júnior', 'Jr'],
+    'pleno': ['Pleno', 'Pl'],
+    'senior': ['Sênior', 'Sr', 'Especialista'],
+    'leadership': ['Gerente', 'Coordenador', 'Tech Lead'],
+}
+ROLES = ['Analista', 'Desenvolvedor', 'Consultor', 'Engenheiro de Dados', 'Analista de Testes', 'Arquiteto de Soluções', 'Administrador de Banco de Dados']
+CLIENTS = ['Morris, Moran and Dodson', 'Gonzalez and Sons', 'Barnes-Woods', 'Nelson-Page', 'Chang Ltd', 'Rivera Group', 'Santos Tecnologia', 'Lima Consultoria']
+CONTRACT_TYPES = ['CLT Full', 'PJ/Autônomo', 'Cooperado', 'Hunting', 'CLT Cotas']
+CITIES = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Curitiba', 'Porto Alegre', 'Recife', 'Barueri']
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael']
+LAST_NAMES = ['Silva', 'Souza', 'Oliveira', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Nascimento', 'Carvalho', 'Gomes', 'Ribeiro', 'Martins']
+RECRUITERS = ['Ana Lívia Moreira', 'Juliana Cassiano', 'Stella Vieira', 'Laura Pacheco', 'Caroline Machado']
+ACTIVITIES = [
+    'Desenvolver e manter sistemas', 'Participar das cerimônias ágeis do time', 'Apoiar a sustentação de aplicações em produção',
+    'Levantar requisitos junto às áreas de negócio', 'Elaborar documentação técnica', 'Automatizar testes e rotinas de deploy',
+    'Modelar e otimizar consultas em bancos de dados', 'Conduzir integrações entre sistemas legados e novos serviços',
+]
+CV_FILLER = [
+    'Experiência em projetos de transformação digital para grandes clientes.', 'Atuação em equipes multidisciplinares com metodologias ágeis.',
+    'Responsável pela análise de requisitos, desenvolvimento e testes.', 'Vivência em ambientes de alta disponibilidade e sustentação.',
+    'Formação em Sistemas de Informação.', 'Certificações na área de tecnologia.', 'Perfil analítico, proativo e colaborativo.',
+]
+# (status, weight); hiring odds are raised for candidates whose profile fits the vacancy
+PROSPECT_STATUSES = [
+    ('Prospect', 30), ('Encaminhado ao Requisitante', 20), ('Não Aprovado pelo Cliente', 15), ('Não Aprovado pelo RH', 10),
+    ('Desistiu', 6), ('Inscrito', 6), ('Em avaliação pelo RH', 5), ('Entrevista Técnica', 4), ('Contratado como Hunting', 2),
+]
+HIRED_STATUS = 'Contratado pela Decision'
+ENGLISH_LEVELS = ['Nenhum', 'Básico', 'Intermediário', 'Avançado', 'Fluente']
+
+
+def _entity_rng(seed, kind, entity_id):
+    """Each entity has its own seeded stream, so it can be regenerated without storing it."""
+    return random.Random(f"{seed}:{kind}:{entity_id}")
+
+
+def _profile(rng):
+    """Latent skills and level that both the text and the hiring outcome are drawn from (always drawn first)."""
+    return {
+        "skills": rng.sample(SKILL_KEYWORDS, rng.randint(0, 7)),
+        "level": rng.choices(list(LEVEL_WORDS) + [None], weights=[25, 30, 25, 10, 10])[0],
+        "english": rng.choice(ENGLISH_LEVELS),
+    }
+
+
+def _skill_text(skills):
+    # Skills as people write them ('Python', 'SQL', 'Power BI'), which the extractor lowercases
+    return ', '.join(skill.upper() if len(skill) <= 3 else skill.title() for skill in skills)
+
+
+def _date(rng, start=date(2019, 1, 1), days=1800):
+    return (start + timedelta(days=rng.randrange(days))).strftime('%d-%m-%Y')
+
+
+def generate_vacancy(seed, vaga_id):
+    rng = _entity_rng(seed, 'vacancy', vaga_id)
+    profile = _profile(rng)
+    role = rng.choice(ROLES)
+    level_word = rng.choice(LEVEL_WORDS[profile["level"]]) if profile["level"] else ''
+    title = f"{role} {level_word} {profile['skills'][0].title() if profile['skills'] else ''}".split()
+    activities = '. '.join(rng.sample(ACTIVITIES, rng.randint(2, 4)))
+    requirements = f"Conhecimentos em {_skill_text(profile['skills'])}." if profile['skills'] else 'Boa comunicação e trabalho em equipe.'
+    if profile["english"] not in ('Nenhum', 'Básico'):
+        requirements += f" English: {rng.choice(LANGUAGE_LEVELS['english'][4:])}."
+    record = {
+        "informacoes_basicas": {
+            "data_requicisao": _date(rng),
+            "titulo_vaga": ' '.join(title),
+            "vaga_sap": rng.choice(["Sim", "Não"]),
+            "cliente": rng.choice(CLIENTS),
+            "tipo_contratacao": rng.choice(CONTRACT_TYPES),
+            "analista_responsavel": rng.choice(RECRUITERS),
+        },
+        "perfil_vaga": {
+            "cidade": rng.choice(CITIES),
+            "nivel profissional": level_word or 'Analista',
+            "nivel_ingles": profile["english"],
+            "principais_atividades": activities,
+            "competencia_tecnicas_e_comportamentais": requirements,
+        },
+        "beneficios": {"valor_venda": f"{rng.randint(80, 250)},00 - hora"},
+    }
+    return record, profile
+
+
+def generate_applicant(seed, codigo):
+    rng = _entity_rng(seed, 'applicant', codigo)
+    profile = _profile(rng)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    level_word = rng.choice(LEVEL_WORDS[profile["level"]]) if profile["level"] else ''
+    lines = [f"{rng.choice(ROLES)} {level_word}".strip()]
+    lines += rng.sample(CV_FILLER, rng.randint(2, 5))
+    if profile["skills"]:
+        lines.append(f"Principais tecnologias: {_skill_text(profile['skills'])}.")
+    if profile["english"] != 'Nenhum':
+        lines.append(f"Inglês {profile['english'].lower()}.")
+    record = {
+        "infos_basicas": {"codigo_profissional": codigo, "nome": name, "email": f"{name.split()[0].lower()}.{codigo}@example.com", "local": rng.choice(CITIES)},
+        "informacoes_profissionais": {"titulo_profissional": lines[0], "nivel_profissional": level_word, "conhecimentos_tecnicos": _skill_text(profile["skills"])},
+        "formacao_e_idiomas": {"nivel_ingles": profile["english"], "nivel_academico": rng.choice(["Ensino Superior Completo", "Pós Graduação Completo", "Ensino Superior Incompleto"])},
+        "cv_pt": '\n'.join(lines),
+    }
+    return record, profile
+
+
+def _hiring_odds(applicant, vacancy):
+    overlap = len(set(applicant["skills"]) & set(vacancy["skills"])) / max(1, len(vacancy["skills"]))
+    level_bonus = 0.1 if applicant["level"] and applicant["level"] == vacancy["level"] else 0.0
+    return 0.03 + 0.25 * overlap + level_bonus
+
+
+def generate_dataset(output_dir=DEFAULT_OUTPUT_DIR, n_vacancies=DEFAULT_VACANCIES, n_applicants=DEFAULT_APPLICANTS, seed=DEFAULT_SEED):
+    """
+    Writes vagas.json, applicants.json and prospects.json with the raw files' structure.
+
+    Records are generated and written one at a time, so memory stays flat at any scale.
+    Every entity is drawn from its own seeded stream, so the latent profile behind a
+    prospect's hiring outcome (skill and level fit) is regenerated instead of stored.
+    The same seed always produces the same files.
+
+    Returns:
+        dict: Counts of vacancies, applicants and prospect entries written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    vacancy_ids = [str(VACANCY_ID_START + i) for i in range(n_vacancies)]
+    write_json_object(os.path.join(output_dir, 'vagas.json'), ((vaga_id, generate_vacancy(seed, vaga_id)[0]) for vaga_id in vacancy_ids))
+    write_json_object(os.path.join(output_dir, 'applicants.json'),
+                      ((str(codigo), generate_applicant(seed, str(codigo))[0]) for codigo in range(APPLICANT_ID_START, APPLICANT_ID_START + n_applicants)))
+
+    rng = _entity_rng(seed, 'prospects', 'all')
+    prospect_count = 0
+
+    def prospects():
+        nonlocal prospect_count
+        for vaga_id in vacancy_ids:
+            vacancy_profile = _profile(_entity_rng(seed, 'vacancy', vaga_id))
+            entries = []
+            for index in rng.sample(range(n_applicants), min(n_applicants, rng.randint(0, MAX_PROSPECTS_PER_VACANCY))):
+                codigo = str(APPLICANT_ID_START + index)
+                if rng.random() < _hiring_odds(_profile(_entity_rng(seed, 'applicant', codigo)), vacancy_profile):
+                    status = HIRED_STATUS
+                else:
+                    status = rng.choices([s for s, _ in PROSPECT_STATUSES], weights=[w for _, w in PROSPECT_STATUSES])[0]
+                applied = _date(rng)
+                entries.append({
+                    "nome": f"Candidato {codigo}",
+                    "codigo": codigo,
+                    "situacao_candidado": status,
+                    "data_candidatura": applied,
+                    "ultima_atualizacao": applied,
+                    "comentario": "",
+                    "recrutador": rng.choice(RECRUITERS),
+                })
+            prospect_count += len(entries)
+            yield vaga_id, {"titulo": f"Vaga {vaga_id}", "modalidade": "", "prospects": entries}
+
+    write_json_object(os.path.join(output_dir, 'prospects.json'), prospects())
+    return {"vacancies": n_vacancies, "applicants": n_applicants, "prospects": prospect_count}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic raw data (vagas, applicants, prospects).")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--vacancies', type=int, default=DEFAULT_VACANCIES)
+    parser.add_argument('--applicants', type=int, default=DEFAULT_APPLICANTS)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+    print("--- Generating Synthetic Raw Data ---")
+    counts = generate_dataset(args.output_dir, args.vacancies, args.applicants, args.seed)
+    print(f"-> Wrote {counts['vacancies']} vacancies, {counts['applicants']} applicants and {counts['prospects']} prospect entries to: {args.output_dir}")
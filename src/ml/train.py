@@ -1,26 +1,67 @@
+import argparse
 import json
 import os
+import sys
+import time
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+from sklearn.metrics import classification_report
 import joblib
 from datetime import datetime
 
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.processed_store import read_table, table_path, source_path, TRAINING_DATASET
+from src.ml.feature_matrix import FEATURE_COLUMNS
+from src.ml.forest_engine import export_forest
+from src.ml.model_search import run_search, build_estimator, SEARCH_SPACE, SEARCH_WORKERS, DEFAULT_FOLDS, DEFAULT_METRIC
+from src.ml.model_metadata import file_fingerprint, split_indices, evaluation_metrics, write_model_metadata, TARGET_NAMES
+
 # --- Configuration ---
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
-DATASET_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'training_dataset.json')
-MODEL_DIR = os.path.join(BASE_DIR, 'models')
-
-def run_training_pipeline():
+DATASET_PATH = table_path(TRAINING_DATASET)
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, 'models'))
+# Stages reported to the progress callback, in order
+TRAINING_STAGES = ["loading", "splitting", "training", "evaluating", "saving"]
+
+def _report(progress, stage, marks):
+    # marks collects (stage, start time) so the result can report how long each stage took
+    marks.append((stage, time.perf_counter()))
+    if progress is not None:
+        progress(stage, TRAINING_STAGES.index(stage) / len(TRAINING_STAGES))
+
+def run_training_pipeline(progress=None, estimator=None):
     """
     Loads the training data, trains a classifier, evaluates it, and saves the versioned model.
+
+    Args:
+        progress (callable, optional): Called as progress(stage, fraction) when each of
+            TRAINING_STAGES starts (used by the API's background training jobs).
+        estimator (optional): Unfitted classifier to train instead of the default
+            RandomForestClassifier (used by --search --save-best).
+
+    Returns:
+        dict: The new model file, its test-set metrics and the seconds spent in each
+            stage, or None if training was aborted.
     """
     print("--- Starting Model Training & Evaluation Pipeline ---")
+    marks = []
+
+    # --- 1. Define Features and Target ---
+    features = FEATURE_COLUMNS
+    target = 'hired'
 
-    # --- 1. Load Dataset ---
+    # --- 2. Load Dataset ---
+    _report(progress, "loading", marks)
     try:
-        df = pd.read_json(DATASET_PATH)
+        # The file actually read (Feather, or the JSON export when only that exists), fingerprinted
+        # first so the sidecar never claims a newer dataset than the one trained on
+        dataset_path = source_path(TRAINING_DATASET)
+        dataset_hash = file_fingerprint(dataset_path)
+        # Memory-mapped read of just the model columns
+        df = read_table(TRAINING_DATASET, columns=features + [target], path=dataset_path)
         print(f"-> Successfully loaded training dataset with {len(df)} records.")
     except FileNotFoundError:
         print(f"Error: The file {DATASET_PATH} was not found.")
@@ -34,15 +75,6 @@ def run_training_pipeline():
         print("The training dataset is empty. Aborting training.")
         return
 
-    # --- 2. Define Features and Target ---
-    features = [
-        'skill_match_score',
-        'level_match_score',
-        'applicant_skills_count',
-        'vacancy_skills_count'
-    ]
-    target = 'hired'
-
     X = df[features]
     y = df[target]
 
@@ -51,46 +83,121 @@ def run_training_pipeline():
 
     # --- 3. Split Data into Training and Testing Sets ---
     # Using stratify=y helps ensure the test set has a similar proportion of hired/not hired as the training set
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    _report(progress, "splitting", marks)
+    # The split comes from model_metadata so /evaluate can reproduce it; the test rows are saved in the sidecar
+    train_indices, test_indices = split_indices(y)
+    X_train, X_test = X.iloc[train_indices], X.iloc[test_indices]
+    y_train, y_test = y.iloc[train_indices], y.iloc[test_indices]
     print(f"-> Data split into training ({len(X_train)} records) and testing ({len(X_test)} records) sets.")
 
     # --- 4. Train the Model ---
-    print("\n-> Training the RandomForestClassifier model...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
+    _report(progress, "training", marks)
+    model = estimator if estimator is not None else RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
+    print(f"\n-> Training the {type(model).__name__} model...")
     model.fit(X_train, y_train)
     print("-> Model training complete.")
 
     # --- 5. Make Predictions and Evaluate ---
+    _report(progress, "evaluating", marks)
     print("\n--- Model Performance Evaluation ---")
     predictions = model.predict(X_test)
 
-    accuracy = accuracy_score(y_test, predictions)
-    print(f"Model Accuracy: {accuracy:.2%}\n")
+    metrics = evaluation_metrics(y_test, predictions)
+    print(f"Model Accuracy: {metrics['accuracy']:.2%}\n")
 
     print("Confusion Matrix:")
-    print(confusion_matrix(y_test, predictions))
+    print(np.array(metrics['confusion_matrix']))
     print("(Rows: Actual Class, Columns: Predicted Class)\n")
     
     print("Classification Report:")
     # Added zero_division=0 to handle cases where a class has no predictions in the test set
-    report = classification_report(y_test, predictions, target_names=['Not Hired', 'Hired'], zero_division=0)
+    report = classification_report(y_test, predictions, target_names=TARGET_NAMES, zero_division=0)
     print(report)
     print("------------------------------------")
 
 
     # --- 6. Save the Trained and Versioned Model ---
+    _report(progress, "saving", marks)
     os.makedirs(MODEL_DIR, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     model_filename = f"recruitment_model_{timestamp}.joblib"
     model_output_path = os.path.join(MODEL_DIR, model_filename)
     
-    joblib.dump(model, model_output_path)
-    print(f"\n-> Trained model successfully saved to: {model_output_path}")
+    # Every file is written under a temporary name and renamed into place, the .joblib last:
+    # the API only lists .joblib files, so a job cancelled mid-save never leaves a partial model
+    tmp_model_path = model_output_path + '.tmp'
+    joblib.dump(model, tmp_model_path)
+    # Flat tree tables for the API's NumPy inference engine
+    if isinstance(model, RandomForestClassifier):
+        compiled_path = export_forest(model, model_output_path)
+        print(f"\n-> Compiled forest saved to: {compiled_path}")
+    metadata = write_model_metadata(model_output_path, dataset_path, dataset_hash, features, test_indices, metrics,
+                                    model_sha256=file_fingerprint(tmp_model_path))
+    print(f"-> Model metadata saved next to it (model sha256 {metadata['model_sha256'][:12]}, dataset sha256 {dataset_hash[:12]}).")
+    os.replace(tmp_model_path, model_output_path)
+    print(f"-> Trained model successfully saved to: {model_output_path}")
 
     print("\n--- Model Training Pipeline Finished Successfully! ---")
+    ends = [started for _, started in marks[1:]] + [time.perf_counter()]
+    return {
+        "new_model_file": model_filename,
+        "train_records": len(X_train),
+        "test_records": len(X_test),
+        **metrics,
+        "stage_seconds": {stage: round(end - started, 6) for (stage, started), end in zip(marks, ends)},
+    }
+
+
+def run_model_search(families=None, folds=DEFAULT_FOLDS, workers=SEARCH_WORKERS, max_candidates=None, metric=DEFAULT_METRIC, save_best=False):
+    """
+    Cross-validated search across model families and hyperparameters (see
+    model_search.SEARCH_SPACE). Prints a leaderboard with accuracy, latency and size,
+    saves it to models/search_leaderboard_<timestamp>.json and, with save_best, trains
+    and saves the top candidate like a regular training run.
+    """
+    print("--- Starting Model Search ---")
+    features = FEATURE_COLUMNS
+    target = 'hired'
+    try:
+        df = read_table(TRAINING_DATASET, columns=features + [target])
+    except FileNotFoundError:
+        print(f"Error: The file {DATASET_PATH} was not found.")
+        print("Please run 'create_training_data.py' first.")
+        return
+    if df.empty:
+        print("The training dataset is empty. Aborting search.")
+        return
+
+    leaderboard, _ = run_search(df[features], df[target], families=families, folds=folds, workers=workers, max_candidates=max_candidates, metric=metric)
+    columns = ["rank", "candidate", f"cv_{metric}", f"cv_{metric}_std", f"holdout_{metric}", "holdout_f1", "latency_ms", "model_kb", "params"]
+    with pd.option_context('display.max_colwidth', 80, 'display.width', 200):
+        print("\n--- Leaderboard ---")
+        print(leaderboard[columns].to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    leaderboard_path = os.path.join(MODEL_DIR, f"search_leaderboard_{timestamp}.json")
+    leaderboard.to_json(leaderboard_path, orient='records', indent=2)
+    print(f"\n-> Leaderboard saved to: {leaderboard_path}")
+
+    if save_best:
+        best = leaderboard.iloc[0]
+        print(f"\n-> Training the best candidate ({best['candidate']}) on the standard split...")
+        return run_training_pipeline(estimator=build_estimator(best['family'], best['params']))
+    return leaderboard
 
 
 if __name__ == "__main__":
-    run_training_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the recruitment model, or search across model families.")
+    parser.add_argument('--search', action='store_true', help="Run the cross-validated model search instead of a single training run.")
+    parser.add_argument('--families', help=f"Comma-separated subset of: {', '.join(SEARCH_SPACE)}.")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--workers', type=int, default=SEARCH_WORKERS, help="Parallel fits (-1 = all cores).")
+    parser.add_argument('--max-candidates', type=int, help="Evaluate a seeded random subset of the grid.")
+    parser.add_argument('--metric', default=DEFAULT_METRIC, choices=['roc_auc', 'average_precision', 'f1', 'balanced_accuracy', 'accuracy'])
+    parser.add_argument('--save-best', action='store_true', help="Train and save the top candidate after the search.")
+    args = parser.parse_args()
+    if args.search:
+        run_model_search(args.families.split(',') if args.families else None, args.folds, args.workers, args.max_candidates, args.metric, args.save_best)
+    else:
+        run_training_pipeline()
\ No newline at end of file
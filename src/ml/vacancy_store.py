@@ -0,0 +1,181 @@
+import os
+import sys
+import sqlite3
+import threading
+
+# Make the project importable when run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ml.json_stream import iter_json_object
+
+# --- Configuration ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+VAGAS_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'vagas.json')
+VACANCY_DETAILS_PATH = os.path.join(os.getenv("PROCESSED_DATA_DIR", os.path.join(BASE_DIR, 'data', 'processed')), 'vacancy_details.sqlite')
+INSERT_BATCH_ROWS = 5000
+MISSING_VALUE = "N/A"
+
+# Display field -> (section, key) in the raw vagas.json record
+DETAIL_FIELDS = {
+    "title": ("informacoes_basicas", "titulo_vaga"),
+    "client": ("informacoes_basicas", "cliente"),
+    "contract_type": ("informacoes_basicas", "tipo_contratacao"),
+    "main_activities": ("perfil_vaga", "principais_atividades"),
+}
+
+
+def project_vacancy(raw_vaga):
+    """The display fields of one raw vacancy; None where the raw record has no value."""
+    return {name: raw_vaga.get(section, {}).get(key) for name, (section, key) in DETAIL_FIELDS.items()}
+
+
+def missing_details():
+    return {name: MISSING_VALUE for name in DETAIL_FIELDS}
+
+
+def build_vacancy_store(vagas_path=VAGAS_PATH, output_path=VACANCY_DETAILS_PATH):
+    """
+    Projects the display fields of every vacancy into a SQLite table keyed by vaga_id,
+    streaming the raw file. The table is written to a temporary file and renamed, so a
+    running API never sees a half-built store.
+
+    Returns:
+        int: The number of vacancies written.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Per process: API workers may build the same store at the same time
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        count = _write_store(tmp_path, vagas_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        # Gone after a successful rename; left over when the build raised
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def _write_store(path, vagas_path):
+    columns = list(DETAIL_FIELDS)
+    insert = f"INSERT OR REPLACE INTO vacancies (vaga_id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})"
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(f"CREATE TABLE vacancies (vaga_id TEXT PRIMARY KEY, {', '.join(f'{c} TEXT' for c in columns)}) WITHOUT ROWID")
+        count, batch = 0, []
+        for vaga_id, raw_vaga in iter_json_object(vagas_path):
+            details = project_vacancy(raw_vaga)
+            batch.append((vaga_id, *(details[c] for c in columns)))
+            if len(batch) >= INSERT_BATCH_ROWS:
+                connection.executemany(insert, batch)
+                count += len(batch)
+                batch = []
+        connection.executemany(insert, batch)
+        count += len(batch)
+        connection.commit()
+    finally:
+        connection.close()
+    return count
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+class VacancyDetailsStore:
+    """
+    Read-only lookup of vacancy display fields, opened lazily on the first request.
+
+    Only the requested ids are read, so memory use does not depend on the size of the
+    catalog. Lookups never build the store: build_if_stale() does, and the API calls it
+    once at startup. The connection is reopened whenever the store file is replaced (new
+    inode or mtime), so an offline rebuild is picked up without a restart. Unknown ids
+    yield 'N/A' fields; so does every id while the store does not exist.
+    """
+
+    def __init__(self, path=VACANCY_DETAILS_PATH, vagas_path=VAGAS_PATH, mmap_bytes=0):
+        self.path = path
+        self.vagas_path = vagas_path
+        self.mmap_bytes = mmap_bytes  # With mmap_bytes > 0, pages are read through a shared mapping instead of a per-connection cache
+        self._connection = None
+        self._signature = None
+        self._failed_build = None
+        self._missing_reported = False
+        self._lock = threading.Lock()
+
+    def build_if_stale(self):
+        """
+        Builds the store from vagas_path if it is missing or older than it.
+
+        A failed build is remembered and not retried until vagas_path changes.
+
+        Returns:
+            bool: Whether the store exists afterwards.
+        """
+        store, vagas = _stat(self.path), _stat(self.vagas_path)
+        if vagas is None or (store is not None and store.st_mtime_ns >= vagas.st_mtime_ns):
+            return store is not None
+        source = (vagas.st_ino, vagas.st_mtime_ns, vagas.st_size)
+        if source == self._failed_build:
+            return store is not None
+        try:
+            written = build_vacancy_store(self.vagas_path, self.path)
+            print(f"Vacancy details store built from {self.vagas_path} ({written} vacancies).")
+            self._failed_build = None
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Vacancy details store could not be built from {self.vagas_path}: {type(e).__name__}: {e}")
+            self._failed_build = source
+            return store is not None
+
+    def _db(self):
+        store = _stat(self.path)
+        if store is None:
+            if not self._missing_reported:
+                print(f"Vacancy details store not found at {self.path}. Details will be '{MISSING_VALUE}' until it is built.")
+                self._missing_reported = True
+            self._close()
+            return None
+        signature = (store.st_ino, store.st_mtime_ns, store.st_size)
+        if self._connection is None or signature != self._signature:
+            self._close()
+            self._connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            if self.mmap_bytes:
+                self._connection.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._signature = signature
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get_many(self, vaga_ids):
+        """Returns {vaga_id: details} for the given ids, with one query."""
+        vaga_ids = list(dict.fromkeys(vaga_ids))
+        found = {}
+        with self._lock:
+            db = self._db()
+            if db is not None and vaga_ids:
+                columns = list(DETAIL_FIELDS)
+                query = f"SELECT vaga_id, {', '.join(columns)} FROM vacancies WHERE vaga_id IN ({', '.join('?' * len(vaga_ids))})"
+                for row in db.execute(query, vaga_ids):
+                    found[row[0]] = {name: (MISSING_VALUE if value is None else value) for name, value in zip(columns, row[1:])}
+        return {vaga_id: found.get(vaga_id) or missing_details() for vaga_id in vaga_ids}
+
+    def get(self, vaga_id):
+        return self.get_many([vaga_id])[vaga_id]
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+if __name__ == "__main__":
+    print("--- Building Vacancy Details Store ---")
+    written = build_vacancy_store()
+    print(f"-> Saved display fields of {written} vacancies to: {VACANCY_DETAILS_PATH}")
@@ -0,0 +1,349 @@
+# tests/benchmark_pipeline.py
+"""
+End-to-end benchmark of the ML pipeline and the prediction API on synthetic data.
+
+The project's src/ and backend/ are copied to a scratch workspace, synthetic raw data is
+generated there and every stage runs in its own Python process, so each one gets a clean
+peak-memory reading (ru_maxrss) and nothing touches the real data/ or models/ folders.
+Results are written as JSON; --compare flags stages that got slower or heavier than a
+previous run.
+
+Usage:
+    python tests/benchmark_pipeline.py --applicants 100000 --vacancies 5000
+    python tests/benchmark_pipeline.py --compare logs/benchmarks/benchmark_<ts>.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import socket
+import platform
+import subprocess
+import tempfile
+import urllib.request
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+# --- Configuration ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(BASE_DIR, 'logs', 'benchmarks')
+COPIED_DIRS = ['src', 'backend']
+STAGES = ['generate', 'aggregation', 'enhancement', 'vacancy_store', 'dataset_creation', 'training', 'predict', 'serving_memory']
+DEFAULT_SINGLE_REQUESTS = 50
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_WORKERS = 4
+WORKER_STARTUP_TIMEOUT = 600
+DEFAULT_TOLERANCE = 0.2
+# Measurements checked by --compare (lower is better)
+COMPARED_SUFFIXES = ('seconds', '_ms', '_mb')
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # Largest of this process and its finished children (the enhancement worker pool)
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def sample_payloads(wanted):
+    """The first `wanted` synthetic applicants as /predict request bodies."""
+    from src.ml.json_stream import iter_json_object
+    applicants = {}
+    for codigo, record in iter_json_object(os.path.join('data', 'raw', 'applicants.json')):
+        applicants[codigo] = {"cv_pt": record["cv_pt"], "codigo_profissional": codigo}
+        if len(applicants) >= wanted:
+            break
+    return list(applicants.values())
+
+
+def worker_memory_mb(master_pid):
+    """
+    RSS, PSS and USS (private pages only) of each worker process of a uvicorn master,
+    from /proc/<pid>/smaps_rollup. Shared pages count fully in every worker's RSS, are
+    split between the workers in PSS and are left out of USS.
+    """
+    workers = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+            if parent != master_pid:
+                continue
+            with open(f'/proc/{name}/cmdline', 'rb') as f:
+                if b'spawn_main' not in f.read():  # Skips multiprocessing's resource tracker
+                    continue
+            fields = {}
+            with open(f'/proc/{name}/smaps_rollup', 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        fields[key] = int(value.split()[0])
+        except (FileNotFoundError, ProcessLookupError):
+            continue  # Exited meanwhile
+        workers.append({"rss_mb": fields['Rss'] / 1024, "pss_mb": fields['Pss'] / 1024,
+                        "uss_mb": (fields['Private_Clean'] + fields['Private_Dirty']) / 1024})
+    return workers
+
+
+# --- Stages (run inside the workspace, one process each) ---
+def stage_generate(config):
+    from src.ml.synthetic_data import generate_dataset
+    return generate_dataset(n_vacancies=config['vacancies'], n_applicants=config['applicants'], seed=config['seed'])
+
+
+def stage_aggregation(config):
+    from src.ml import build_dataset
+    build_dataset.SAMPLE_SEED = config['seed']
+    build_dataset.run_aggregation()
+
+
+def stage_enhancement(config):
+    from src.ml.enhance_features import run_enhancement
+    run_enhancement()
+
+
+def stage_vacancy_store(config):
+    from src.ml.vacancy_store import build_vacancy_store
+    build_vacancy_store()
+
+
+def stage_dataset_creation(config):
+    from src.ml.create_training_data import run_dataset_creation
+    run_dataset_creation()
+
+
+def stage_training(config):
+    from src.ml.train import run_training_pipeline
+    result = run_training_pipeline()
+    if result is None:
+        raise RuntimeError("Training produced no model.")
+    return {"train_records": result["train_records"], "accuracy": result["accuracy"]}
+
+
+def stage_predict(config):
+    """Startup (importing the app loads the catalog), then single and batch predictions."""
+    from fastapi.testclient import TestClient
+
+    started = time.perf_counter()
+    from backend.main import app
+    startup_seconds = time.perf_counter() - started
+
+    payloads = sample_payloads(max(config['single_requests'], config['batch_size']))
+
+    with TestClient(app) as client:
+        # The first request loads the model; it is reported separately from the steady state
+        started = time.perf_counter()
+        client.post("/predict/latest", json=payloads[0]).raise_for_status()
+        first_request_ms = (time.perf_counter() - started) * 1000
+
+        timings = []
+        for i in range(config['single_requests']):
+            started = time.perf_counter()
+            client.post("/predict/latest", json=payloads[i % len(payloads)]).raise_for_status()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        batch = {p["codigo_profissional"]: p for p in payloads[:config['batch_size']]}
+        started = time.perf_counter()
+        client.post("/predict/batch", json=batch).raise_for_status()
+        batch_seconds = time.perf_counter() - started
+
+    return {
+        "startup_seconds": round(startup_seconds, 4),
+        "first_request_ms": round(first_request_ms, 2),
+        "single_p50_ms": round(percentile(timings, 50), 2),
+        "single_p95_ms": round(percentile(timings, 95), 2),
+        "single_mean_ms": round(sum(timings) / len(timings), 2),
+        "batch_applicants": len(batch),
+        "batch_seconds": round(batch_seconds, 4),
+    }
+
+
+def stage_serving_memory(config):
+    """
+    Per-worker memory of the API served by `workers` uvicorn workers, first with every
+    worker loading its own state, then with SHARED_STATE=1. Each worker loads the
+    latest model at startup (MODEL_WARMUP) and the requests exercise the scoring path.
+    """
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        return {"skipped": "per-worker memory is read from /proc (Linux only)"}
+    payloads = sample_payloads(config['single_requests'])
+    results = {"workers": config['workers']}
+    for mode, shared in (('private', '0'), ('shared', '1')):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        env = dict(os.environ, SHARED_STATE=shared, SHARED_STATE_DIR=os.path.join('data', 'serving'), MODEL_WARMUP='1', PREDICTION_CACHE_ENTRIES='0')
+        log_path = os.path.join('logs', f'uvicorn_{mode}.log')
+        os.makedirs('logs', exist_ok=True)
+        started = time.perf_counter()
+        with open(log_path, 'w') as log:
+            server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'backend.main:app', '--port', str(port), '--workers', str(config['workers'])],
+                                      env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            # Every worker logs this line once its startup hooks ran
+            while True:
+                with open(log_path, 'r') as f:
+                    ready = f.read().count("Application startup complete")
+                if ready >= config['workers']:
+                    break
+                if server.poll() is not None or time.perf_counter() - started > WORKER_STARTUP_TIMEOUT:
+                    with open(log_path, 'r') as f:
+                        raise RuntimeError(f"uvicorn ({mode}) did not start:\n{f.read()[-4000:]}")
+                time.sleep(0.2)
+            results[f"{mode}_startup_seconds"] = round(time.perf_counter() - started, 4)
+
+            for payload in payloads:
+                request = urllib.request.Request(f"http://127.0.0.1:{port}/predict/latest", data=json.dumps(payload).encode('utf-8'),
+                                                 headers={"Content-Type": "application/json"})
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+            workers = worker_memory_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        for measure in ("rss_mb", "pss_mb", "uss_mb"):
+            results[f"{mode}_worker_{measure}"] = round(sum(worker[measure] for worker in workers) / len(workers), 1)
+    return results
+
+
+def run_stage(name, config):
+    """Runs one stage in this process and prints its measurements as the last output line."""
+    started = time.perf_counter()
+    details = globals()[f'stage_{name}'](config) or {}
+    seconds = time.perf_counter() - started
+    print(json.dumps({"seconds": round(seconds, 4), "peak_rss_mb": peak_rss_mb(), **details}))
+
+
+# --- Driver ---
+def prepare_workspace(workspace):
+    for name in COPIED_DIRS:
+        shutil.copytree(os.path.join(BASE_DIR, name), os.path.join(workspace, name), ignore=shutil.ignore_patterns('__pycache__'))
+    for folder in [('data', 'raw'), ('data', 'processed'), ('models',)]:
+        os.makedirs(os.path.join(workspace, *folder), exist_ok=True)
+
+
+def launch_stage(name, workspace, config):
+    env = dict(os.environ, PYTHONPATH=workspace, PREDICTION_LOG_DIR=os.path.join(workspace, 'logs', 'predictions'))
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-stage', name, '--config', json.dumps(config)],
+        cwd=workspace, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Stage '{name}' failed:\n{completed.stdout[-2000:]}\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(config, stages=STAGES, keep_workspace=False):
+    workspace = tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    results = {}
+    try:
+        prepare_workspace(workspace)
+        for name in stages:
+            print(f"-> Running stage '{name}'...")
+            results[name] = launch_stage(name, workspace, config)
+            peak = results[name]['peak_rss_mb']
+            print(f"   {results[name]['seconds']:.2f}s, peak RSS {peak if peak is not None else 'n/a'} MB")
+    finally:
+        if keep_workspace:
+            print(f"-> Workspace kept at: {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+    return {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "stages": results,
+    }
+
+
+def compare_runs(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Prints per-stage deltas against a baseline run.
+
+    Returns:
+        list: (stage, measurement, baseline, current) for every value more than
+            `tolerance` (relative) above the baseline.
+    """
+    if baseline.get("config") != current.get("config"):
+        print("Warning: the runs used different configurations; deltas may not be meaningful.")
+    regressions = []
+    for stage, measurements in current["stages"].items():
+        previous = baseline.get("stages", {}).get(stage, {})
+        for key, value in measurements.items():
+            old = previous.get(key)
+            if not key.endswith(COMPARED_SUFFIXES) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            change = (value - old) / old
+            flag = ''
+            if change > tolerance:
+                regressions.append((stage, key, old, value))
+                flag = '  <-- regression'
+            print(f"{stage:>16} {key:<18} {old:>12.3f} -> {value:>12.3f} ({change:+.1%}){flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and the prediction API on synthetic data.")
+    parser.add_argument('--vacancies', type=int, default=2000)
+    parser.add_argument('--applicants', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--single-requests', type=int, default=DEFAULT_SINGLE_REQUESTS)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="uvicorn workers in the serving_memory stage.")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="Stages to run (later stages need the earlier ones).")
+    parser.add_argument('--output', help="Results file (default: logs/benchmarks/benchmark_<timestamp>.json).")
+    parser.add_argument('--compare', metavar='BASELINE', help="Previous results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Relative slowdown allowed by --compare.")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch workspace.")
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, json.loads(args.config))
+        sys.exit(0)
+
+    config = {"vacancies": args.vacancies, "applicants": args.applicants, "seed": args.seed,
+              "single_requests": args.single_requests, "batch_size": args.batch_size, "workers": args.workers}
+    print("--- Pipeline Benchmark ---")
+    report = run_benchmark(config, args.stages, keep_workspace=args.keep)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"-> Results saved to: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_runs(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"-> {len(regressions)} measurement(s) regressed by more than {args.tolerance:.0%}.")
+            sys.exit(1)
+        print("-> No regressions.")
@@ -0,0 +1,637 @@
+# tests/test_backend.py
+
+import sys
+import os
+import time
+import glob
+import gzip
+import json
+import tempfile
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+
+# Add the project's root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.model_registry import ModelRegistry, ModelNotFoundError
+from backend.prediction_log import PredictionLogSink, PREDICTION_LOG_SCHEMA
+from backend.training_jobs import TrainingJobManager, JobNotFoundError
+from backend.metrics import LatencyMetrics, SERVER_TIMING_HEADER
+from backend.vacancy_catalog import VacancyCatalog, VacancyNotFoundError
+from backend.prediction_cache import PredictionCache, prediction_key
+from backend.drift_monitor import DriftMonitor
+from backend.dataset_browser import DatasetBrowser, CursorError, StaleCursorError
+from backend import shared_state
+from src.ml.feature_matrix import FeatureMatrix, score_applicant, select_rows
+from src.ml import processed_store
+
+
+def check(condition, description):
+    if condition:
+        print(f"  [PASS] {description}")
+    else:
+        print(f"  [FAIL] {description}")
+    return condition
+
+
+def test_model_registry():
+    print("\n[TESTING] ModelRegistry...")
+    passed = True
+    load_calls = []
+
+    def counting_loader(path):
+        load_calls.append(path)
+        return joblib.load(path)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        registry = ModelRegistry(model_dir, max_loaded=2, loader=counting_loader)
+        try:
+            registry.get("latest")
+            passed &= check(False, "Missing 'latest' raises ModelNotFoundError")
+        except ModelNotFoundError:
+            passed &= check(True, "Missing 'latest' raises ModelNotFoundError")
+
+        joblib.dump({"version": 1}, os.path.join(model_dir, "model_a.joblib"))
+        time.sleep(0.01)
+        joblib.dump({"version": 2}, os.path.join(model_dir, "model_b.joblib"))
+        registry.refresh(force=True)
+
+        entry, model = registry.get("latest")
+        passed &= check(entry.filename == "model_b.joblib", "'latest' resolves to the newest file")
+        registry.get("model_b.joblib")
+        passed &= check(len(load_calls) == 1, "Second access is served from memory")
+        memo = registry.attached(entry, model, "memo", lambda m: {"derived_from": m["version"]})
+        passed &= check(registry.attached(entry, model, "memo", dict) is memo, "Attached objects are reused for the same model version")
+
+        joblib.dump({"version": 3}, os.path.join(model_dir, "model_b.joblib"))
+        entry, model = registry.get("model_b.joblib")
+        passed &= check(model == {"version": 3} and len(load_calls) == 2, "In-place rewrite triggers a reload")
+        memo = registry.attached(entry, model, "memo", lambda m: {"derived_from": m["version"]})
+        passed &= check(memo == {"derived_from": 3}, "A rewritten model gets fresh attached objects")
+
+        registry.get("model_a.joblib")
+        joblib.dump({"version": 4}, os.path.join(model_dir, "model_c.joblib"))
+        registry.refresh(force=True)
+        registry.get("model_c.joblib")
+        passed &= check(len(registry._loaded) == 2, "LRU stays within max_loaded")
+        passed &= check(registry.list_models() == ["model_c.joblib", "model_b.joblib", "model_a.joblib"], "list_models is sorted newest name first")
+
+        # A slow load must not hold up requests for other models, and concurrent requests share it
+        release = threading.Event()
+        slow_calls = []
+
+        def slow_loader(path):
+            slow_calls.append(path)
+            if path.endswith("model_a.joblib"):
+                release.wait(10)
+            return joblib.load(path)
+
+        slow_registry = ModelRegistry(model_dir, loader=slow_loader)
+        slow_registry.get("model_b.joblib")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow_registry.get("model_a.joblib")[1])) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        slow_registry.get("model_b.joblib")
+        slow_registry.get("model_c.joblib")
+        passed &= check(time.perf_counter() - started < 1 and not results, "Other models are served while one is loading")
+        release.set()
+        for thread in threads:
+            thread.join()
+        passed &= check(results == [{"version": 1}] * 3 and sum(path.endswith("model_a.joblib") for path in slow_calls) == 1, "Concurrent requests for one model share a single load")
+    assert passed, "ModelRegistry checks failed"
+
+
+def test_prediction_log_sink():
+    print("\n[TESTING] PredictionLogSink...")
+    passed = True
+    scored_df = pd.DataFrame({
+        "vaga_id": ["v1", "v2", "v3"],
+        "skill_match_score": [0.5, 1.0, 0.0],
+        "level_match_score": [1.0, 0.0, 0.5],
+        "applicant_skills_count": [2, 2, 2],
+        "vacancy_skills_count": [4, 0, 3],
+        "match_probability": [0.2, 0.9, 0.4],
+    })
+    with tempfile.TemporaryDirectory() as log_dir:
+        sink = PredictionLogSink(log_dir, sampling="topk", flush_interval=0.05)
+        passed &= check(sink.submit(scored_df, np.array([1, 2]), "model.joblib", "app-1"), "submit() accepts the item")
+        sink.close()
+        rows = []
+        for path in glob.glob(os.path.join(log_dir, "predictions-*.ndjson.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                rows.extend(json.loads(line) for line in f)
+        passed &= check([row["vaga_id"] for row in rows] == ["v2", "v3"], "topk sampling writes only the returned matches, in order")
+        passed &= check(all(list(row) == list(PREDICTION_LOG_SCHEMA) for row in rows), "Rows follow the log schema")
+        passed &= check(sink.stats()["dropped"] == 0, "Nothing dropped below the queue bound")
+
+        # Sinks of different workers never append to the same file, even when they rotate at the same moment
+        sinks = [PredictionLogSink(log_dir, sampling="scored", flush_interval=0.05) for _ in range(2)]
+        paths = [other._target_path() for other in sinks]
+        for other in sinks:
+            other.close()
+        passed &= check(paths[0] != paths[1] and all(path.endswith(f"-{os.getpid()}.ndjson.gz") for path in paths), "Log file names carry the pid and are created exclusively")
+        try:
+            PredictionLogSink(log_dir, sampling="all")
+            rejected = False
+        except ValueError:
+            rejected = True
+        passed &= check(rejected, "The former 'all' mode name is rejected instead of implying the full catalog is logged")
+    assert passed, "PredictionLogSink checks failed"
+
+
+# Job targets must be module-level so the spawned job process can import them
+def slow_training_job(progress, seconds=30):
+    progress("training", 0.5)
+    time.sleep(seconds)
+    return {"new_model_file": "slow.joblib"}
+
+
+def quick_training_job(progress, name="quick.joblib"):
+    progress("training", 0.5)
+    return {"new_model_file": name}
+
+
+def failing_training_job(progress):
+    raise ValueError("no training data")
+
+
+def wait_for_job(manager, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["state"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    return manager.get(job_id)
+
+
+def test_training_jobs():
+    print("\n[TESTING] TrainingJobManager...")
+    passed = True
+    finished = []
+    manager = TrainingJobManager(slow_training_job, max_parallel=1, on_success=finished.append)
+    try:
+        slow, created = manager.submit()
+        again, created_again = manager.submit()
+        passed &= check(created and not created_again and again["job_id"] == slow["job_id"], "Concurrent submits with the same key share one job")
+
+        manager.target = quick_training_job
+        queued, _ = manager.submit(key="other", name="other.joblib")
+        passed &= check(manager.get(queued["job_id"])["state"] == "queued", "A second key waits for the parallel limit")
+
+        job, cancelled = manager.cancel(slow["job_id"])
+        passed &= check(cancelled and job["state"] == "cancelled", "A running job can be cancelled")
+        done = wait_for_job(manager, queued["job_id"])
+        passed &= check(done["state"] == "succeeded" and done["result"] == {"new_model_file": "other.joblib"}, "The queued job runs once a slot frees up")
+        passed &= check(done["progress"] == 1.0 and done["stage"] == "training", "Progress is reported by the job process")
+        passed &= check(finished == [{"new_model_file": "other.joblib"}], "on_success runs for succeeded jobs only")
+        passed &= check(not manager.cancel(slow["job_id"])[1], "Finished jobs cannot be cancelled again")
+
+        manager.target = failing_training_job
+        failed = wait_for_job(manager, manager.submit()[0]["job_id"])
+        passed &= check(failed["state"] == "failed" and "no training data" in failed["error"], "Exceptions in the job mark it as failed")
+        try:
+            manager.get("missing")
+            passed &= check(False, "Unknown job ids raise JobNotFoundError")
+        except JobNotFoundError:
+            passed &= check(True, "Unknown job ids raise JobNotFoundError")
+    finally:
+        manager.shutdown()
+    assert passed, "TrainingJobManager checks failed"
+
+
+def test_shared_training_jobs():
+    print("\n[TESTING] TrainingJobManager with a shared job store...")
+    passed = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Two managers over one file stand in for two API workers
+        state_path = os.path.join(tmp_dir, "training_jobs.sqlite")
+        first = TrainingJobManager(slow_training_job, max_parallel=1, state_path=state_path)
+        second = TrainingJobManager(quick_training_job, max_parallel=1, state_path=state_path)
+        try:
+            job, created = first.submit()
+            again, created_again = second.submit()
+            passed &= check(created and not created_again and again["job_id"] == job["job_id"], "A submit to another worker joins the running job")
+            passed &= check(second.get(job["job_id"])["state"] == "running", "Any worker answers for a job")
+            queued, _ = second.submit(key="other", name="other.joblib")
+            passed &= check(queued["state"] == "queued", "The parallel limit counts the jobs of every worker")
+
+            cancelled, ok = second.cancel(job["job_id"])
+            passed &= check(ok and cancelled["state"] == "cancelled", "Any worker can cancel a job")
+            process = first._processes.get(job["job_id"])
+            if process is not None:
+                process.join(timeout=10)
+            passed &= check(process is None or not process.is_alive(), "The owning worker terminates a job cancelled elsewhere")
+
+            done = wait_for_job(first, queued["job_id"])
+            passed &= check(done["state"] == "succeeded" and done["result"] == {"new_model_file": "other.joblib"}, "The queued job starts once a slot frees up")
+            passed &= check({j["job_id"] for j in first.list_jobs()} == {j["job_id"] for j in second.list_jobs()}, "Every worker lists the same jobs")
+        finally:
+            first.shutdown()
+            second.shutdown()
+    assert passed, "Shared TrainingJobManager checks failed"
+
+
+def test_latency_metrics():
+    print("\n[TESTING] LatencyMetrics...")
+    passed = True
+    metrics = LatencyMetrics(window=100)
+    for i in range(1, 201):
+        metrics.observe("predict_match", "predict_proba", i / 1000)
+    summary = metrics.snapshot()[("predict_match", "predict_proba")]
+    passed &= check(summary["count"] == 200 and abs(summary["sum"] - 20.1) < 1e-9, "Sum and count cover every sample")
+    passed &= check(summary["quantiles"] == {0.5: 0.151, 0.95: 0.196, 0.99: 0.2}, "Quantiles come from the most recent window")
+
+    headers = {}
+    try:
+        with metrics.timer("evaluate_specific_model", headers) as timer:
+            with timer.stage("model_resolve"):
+                pass
+            with timer.stage("evaluation"):
+                raise ValueError("boom")
+    except ValueError:
+        pass
+    stages = [part.split(";")[0] for part in headers.get(SERVER_TIMING_HEADER, "").split(", ")]
+    passed &= check(stages == ["model_resolve", "evaluation", "total"], "A failing request still records its stages and total")
+    text = metrics.render_prometheus()
+    passed &= check("# TYPE api_stage_latency_seconds summary" in text and
+                    'api_stage_latency_seconds{endpoint="predict_match",stage="predict_proba",quantile="0.99"} 0.200000000' in text and
+                    'api_stage_latency_seconds_count{endpoint="evaluate_specific_model",stage="total"} 1' in text,
+                    "Prometheus text exposes quantiles, sum and count per stage")
+    assert passed, "LatencyMetrics checks failed"
+
+
+def test_vacancy_catalog():
+    print("\n[TESTING] VacancyCatalog...")
+    passed = True
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "vacancies_enhanced.json")
+        journal = os.path.join(data_dir, "vacancy_updates.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"v1": {"technical_skills": ["python"], "experience_level": "senior"}, "v2": {"technical_skills": [], "experience_level": "junior"}}, f)
+        catalog = VacancyCatalog(path, journal, poll_seconds=0)
+        first = catalog.load()
+        passed &= check(first.matrix.ids == ["v1", "v2"], "load() builds the catalog from the enhanced file")
+
+        second, created = catalog.upsert("v3", {"technical_skills": ["sql"], "experience_level": "pleno"}, {"title": "Dev SQL"})
+        catalog.remove("v1")
+        passed &= check(created and catalog.current.matrix.ids == ["v2", "v3"] and catalog.current.details == {"v3": {"title": "Dev SQL"}},
+                        "upsert() and remove() publish new versions")
+        passed &= check(first.matrix.ids == ["v1", "v2"] and second.matrix.ids == ["v1", "v2", "v3"], "Earlier versions are left intact for in-flight requests")
+        try:
+            catalog.remove("missing")
+            passed &= check(False, "Removing an unknown vacancy raises VacancyNotFoundError")
+        except VacancyNotFoundError:
+            passed &= check(True, "Removing an unknown vacancy raises VacancyNotFoundError")
+
+        passed &= check(not catalog.reload_if_changed(), "An unchanged file is not reloaded")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"v1": {"technical_skills": ["java"], "experience_level": "senior"}, "v4": {"technical_skills": ["aws"], "experience_level": "pleno"}, "extra": {}}, f)
+        passed &= check(catalog.reload_if_changed() and catalog.current.matrix.ids == ["v4", "extra", "v3"],
+                        "A rewritten file is reloaded with the journaled changes replayed on top")
+        restarted = VacancyCatalog(path, journal, poll_seconds=0)
+        passed &= check(restarted.load().features == catalog.current.features, "The journal survives a restart")
+        passed &= check(restarted.current.fingerprint == catalog.current.fingerprint and first.fingerprint != second.fingerprint,
+                        "Catalog fingerprints follow the content, not the process")
+
+        # A base vacancy removed and upserted again: the live update and a rebuild from the overlay agree on the row order
+        catalog.remove("v4")
+        catalog.upsert("v5", {"technical_skills": ["go"], "experience_level": "pleno"}, {"title": "Dev Go"})
+        catalog.upsert("v4", {"technical_skills": ["aws", "gcp"], "experience_level": "senior"}, {"title": "Cloud"})
+        rebuilt = FeatureMatrix(dict(catalog.current.features.items()), vocabulary=catalog.vocabulary)
+        restarted = VacancyCatalog(path, journal, poll_seconds=0)
+        passed &= check(catalog.current.matrix.ids == rebuilt.ids == restarted.load().matrix.ids == ["extra", "v3", "v5", "v4"],
+                        "A removed and re-upserted vacancy gets the same row in every process")
+    assert passed, "VacancyCatalog checks failed"
+
+
+def test_prediction_cache():
+    print("\n[TESTING] PredictionCache...")
+    passed = True
+    key = prediction_key("Analista  python\n sql", "model-hash", "model.joblib", "catalog-1", "extractor-1", top_k=5, exhaustive=False)
+    passed &= check(key == prediction_key(" Analista python sql ", "model-hash", "model.joblib", "catalog-1", "extractor-1", top_k=5, exhaustive=False),
+                    "Whitespace-only CV differences share a key")
+    passed &= check(len({key, prediction_key("Analista python sql", "other-hash", "model.joblib", "catalog-1", "extractor-1", top_k=5, exhaustive=False),
+                         prediction_key("Analista python sql", "model-hash", "model.joblib", "catalog-1", "extractor-1", top_k=3, exhaustive=False)}) == 3,
+                    "Model version and request parameters are part of the key")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        db_path = os.path.join(cache_dir, "predictions.sqlite")
+        cache = PredictionCache(max_entries=2, ttl_seconds=60, db_path=db_path)
+        passed &= check(cache.get(key, "catalog-1") is None, "A new key is a miss")
+        cache.put(key, "catalog-1", {"top_matches": [1]})
+        cache.put("b", "catalog-1", {"top_matches": [2]})
+        cache.put("c", "catalog-1", {"top_matches": [3]})
+        stats = cache.stats()
+        passed &= check(stats["memory_entries"] == 2 and stats["memory_evictions"] == 1, "The memory tier is bounded (LRU)")
+        passed &= check(cache.get(key, "catalog-1") == {"top_matches": [1]} and cache.stats()["disk_hits"] == 1, "Evicted entries are still served from disk")
+        other_worker = PredictionCache(db_path=db_path)
+        passed &= check(other_worker.get("b", "catalog-1") == {"top_matches": [2]}, "The disk tier is shared between processes")
+        passed &= check(cache.get("c", "catalog-2") is None and cache.stats()["disk_entries"] == 0, "A catalog change invalidates older entries")
+
+        expiring = PredictionCache(ttl_seconds=0.05)
+        expiring.put(key, "catalog-1", {})
+        time.sleep(0.1)
+        passed &= check(expiring.get(key, "catalog-1") is None and expiring.stats()["expirations"] == 1, "Entries expire after the TTL")
+        passed &= check(cache.stats()["hit_rate"] == 1 / 3, "The hit rate is hits over lookups")
+    assert passed, "PredictionCache checks failed"
+
+
+def test_dataset_browser():
+    print("\n[TESTING] DatasetBrowser...")
+    passed = True
+    training_df = pd.DataFrame({
+        "vaga_id": [str(i % 7) for i in range(50)],
+        "applicant_id": [str(i) for i in range(50)],
+        "skill_match_score": [round((i * 37 % 50) / 50, 2) for i in range(50)],
+        "level_match_score": [0.5] * 50,
+        "applicant_level": ["pleno"] * 50,
+        "vacancy_level": ["senior"] * 50,
+        "applicant_skills_count": [3] * 50,
+        "vacancy_skills_count": [4] * 50,
+        "hired": [int(i % 3 == 0) for i in range(50)],
+    })
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_dir = processed_store.PROCESSED_DIR
+        processed_store.PROCESSED_DIR = tmp_dir
+        try:
+            processed_store.write_table(training_df, processed_store.TRAINING_DATASET, export_json=False)
+            browser = DatasetBrowser(processed_store.TRAINING_DATASET)
+            query = {"equals": {"hired": 0}, "ranges": {"skill_match_score": (0.2, None)}, "sort_by": "skill_match_score", "descending": True, "limit": 7}
+            rows, cursor = [], None
+            while True:
+                page = browser.query(columns=["applicant_id", "skill_match_score"], cursor=cursor, **query)
+                rows += page["rows"]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            expected = training_df[(training_df.hired == 0) & (training_df.skill_match_score >= 0.2)].sort_values("skill_match_score", ascending=False, kind="stable")
+            passed &= check([row["applicant_id"] for row in rows] == expected.applicant_id.tolist() and page["total_rows"] == len(expected),
+                            "Pages cover the filtered, sorted rows exactly once")
+            passed &= check(set(rows[0]) == {"applicant_id", "skill_match_score"}, "Only the requested columns are returned")
+
+            first = browser.query(limit=10)
+            try:
+                browser.query(limit=10, cursor=first["next_cursor"], equals={"vaga_id": "1"})
+                passed &= check(False, "A cursor is rejected for a different filter")
+            except CursorError:
+                passed &= check(True, "A cursor is rejected for a different filter")
+            processed_store.write_table(training_df.head(20), processed_store.TRAINING_DATASET, export_json=False)
+            try:
+                browser.query(limit=10, cursor=first["next_cursor"])
+                passed &= check(False, "Cursors expire when the dataset is rewritten")
+            except StaleCursorError:
+                passed &= check(browser.query()["total_rows"] == 20, "Cursors expire when the dataset is rewritten")
+        finally:
+            processed_store.PROCESSED_DIR = original_dir
+    assert passed, "DatasetBrowser checks failed"
+
+
+def test_drift_monitor():
+    print("\n[TESTING] DriftMonitor...")
+    passed = True
+    scored_df = pd.DataFrame({
+        "vaga_id": ["v1", "v2", "v3", "v4"],
+        "skill_match_score": [0.25, 1.0, 0.0, 0.5],
+        "level_match_score": [1.0, 0.0, 0.5, 0.75],
+        "applicant_skills_count": [2, 2, 2, 2],
+        "vacancy_skills_count": [4, 0, 3, 1],
+        "match_probability": [0.2, 0.9, 0.4, 0.6],
+    })
+    with tempfile.TemporaryDirectory() as log_dir:
+        state_path = os.path.join(log_dir, "drift_state.json")
+        sink = PredictionLogSink(log_dir, sampling="scored", flush_interval=0.05)
+        for _ in range(3):
+            sink.submit(scored_df, np.array([1]), "model.joblib")
+        sink.close()
+        monitor = DriftMonitor(log_dir, state_path)
+        monitor.set_reference("ref", {feature: scored_df[feature] for feature in ("skill_match_score", "level_match_score", "match_probability")})
+        passed &= check(monitor.refresh() == 12, "refresh() reads every logged row")
+        overall = monitor.summary()["overall"]["features"]
+        passed &= check(abs(overall["match_probability"]["mean"] - 0.525) < 1e-9, "Means are exact")
+        passed &= check(overall["skill_match_score"]["psi"] == 0.0 and overall["skill_match_score"]["ks"] == 0.0, "Identical distributions have PSI and KS 0")
+
+        # A member still being written is left for the next refresh
+        log_path = glob.glob(os.path.join(log_dir, "predictions-*.ndjson.gz"))[0]
+        row = {"timestamp": "2024-01-01T00:00:00+00:00", "skill_match_score": 1.0, "level_match_score": 1.0, "match_probability": 1.0}
+        member = gzip.compress((json.dumps(row) + "\n").encode("utf-8"))
+        with open(log_path, "ab") as f:
+            f.write(member[:-4])
+        passed &= check(monitor.refresh() == 0, "A partial gzip member is not consumed")
+        with open(log_path, "ab") as f:
+            f.write(member[-4:])
+        passed &= check(monitor.refresh() == 1 and len(monitor.summary()["windows"]) == 2, "It is read once complete, in its own time window")
+        passed &= check(monitor.summary(windows=1)["overall"]["features"]["skill_match_score"]["count"] == 12, "'overall' can be limited to the latest windows")
+
+        resumed = DriftMonitor(log_dir, state_path)
+        passed &= check(resumed.refresh() == 0 and resumed.summary()["rows_ingested"] == 13, "A restart resumes from the checkpoint")
+
+        # A second worker refreshes in the background but leaves the checkpoint to the first one
+        with open(log_path, "ab") as f:
+            f.write(member)
+        refreshed = threading.Event()
+        other = DriftMonitor(log_dir, state_path, refresh_seconds=0.05)
+        other.start_refreshing(refreshed.set)
+        refreshed.wait(10)
+        other.stop_refreshing()
+        with open(state_path, "r", encoding="utf-8") as f:
+            checkpointed = json.load(f)["rows_ingested"]
+        passed &= check(other.summary()["rows_ingested"] == 14 and checkpointed == 13, "Background refresh reads new rows; only the lock holder writes the checkpoint")
+        monitor.refresh()
+        with open(state_path, "r", encoding="utf-8") as f:
+            passed &= check(json.load(f)["rows_ingested"] == 14, "The lock holder keeps checkpointing")
+    assert passed, "DriftMonitor checks failed"
+
+
+def test_shared_state():
+    print("\n[TESTING] shared_state snapshots...")
+    passed = True
+    vacancies = {f"v{i}": {"technical_skills": ["python", "sql", "aws"][:i % 4], "experience_level": ["junior", "senior"][i % 2]} for i in range(30)}
+    applicant = {"technical_skills": ["python", "aws"], "experience_level": "senior"}
+    with tempfile.TemporaryDirectory() as data_dir:
+        root = os.path.join(data_dir, "serving")
+        path = os.path.join(data_dir, "vacancies_enhanced.json")
+        journal = os.path.join(data_dir, "vacancy_updates.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(vacancies, f)
+
+        snapshot = shared_state.attach(path, root)
+        in_memory = FeatureMatrix(vacancies)
+        rows = select_rows(snapshot.matrix, applicant, 5)
+        passed &= check(isinstance(snapshot.matrix.levels, np.memmap) and not snapshot.matrix.skills.indices.flags.owndata,
+                        "Attached arrays are memory-mapped, not copied")
+        passed &= check(list(rows) == list(select_rows(in_memory, applicant, 5)) and
+                        all(np.array_equal(a, b) for a, b in zip(score_applicant(snapshot.matrix, applicant, rows).values(), score_applicant(in_memory, applicant, rows).values())),
+                        "Scores over the snapshot equal the in-memory matrix")
+        passed &= check(dict(snapshot.features) == vacancies and "missing" not in snapshot.features, "Features are read back by id")
+        passed &= check(shared_state.attach(path, root).directory == snapshot.directory and len(os.listdir(root)) == 2,
+                        "An unchanged file reuses its snapshot")
+
+        private = VacancyCatalog(path, journal, poll_seconds=0)
+        shared = VacancyCatalog(path, journal, poll_seconds=0, shared_root=root)
+        private.load()
+        shared.load()
+        private.upsert("v1", {"technical_skills": ["rust"], "experience_level": "pleno"}, {"title": "Dev Rust"})
+        private.upsert("new", {"technical_skills": ["python"], "experience_level": "senior"}, {"title": "Dev Python"})
+        private.remove("v2")
+        passed &= check(shared.reload_if_changed() and shared.current.fingerprint == private.current.fingerprint,
+                        "Changes made by another worker are picked up from the journal")
+        passed &= check(shared.current.matrix.ids == private.current.matrix.ids and dict(shared.current.features) == dict(private.current.features),
+                        "A shared catalog replays the journal over the snapshot like a private one")
+        shared.remove("new")
+        passed &= check(private.reload_if_changed() and "new" not in private.current.features and not shared.reload_if_changed(),
+                        "A worker's own changes do not make it reload")
+    assert passed, "shared_state checks failed"
+
+
+def _endpoint_data(data_dir, processed_dir):
+    """Writes a small catalog, applicant pool, raw vacancies and training table (into PROCESSED_DIR) for the API."""
+    os.makedirs(processed_dir)
+    skills = ["python", "sql", "aws", "java", "docker"]
+    levels = ["junior", "pleno", "senior"]
+    vacancies = {f"v{i}": {"technical_skills": skills[i % 5:i % 5 + 2], "experience_level": levels[i % 3]} for i in range(20)}
+    applicants = {f"a{i}": {"technical_skills": skills[i % 4:i % 4 + 3], "experience_level": levels[i % 3]} for i in range(30)}
+    vagas = {vaga_id: {"informacoes_basicas": {"titulo_vaga": f"Vaga {vaga_id}", "cliente": "ACME"}} for vaga_id in vacancies}
+    for name, content in (("vacancies_enhanced.json", vacancies), ("applicants_enhanced.json", applicants)):
+        with open(os.path.join(processed_dir, name), "w", encoding="utf-8") as f:
+            json.dump(content, f)
+    vagas_path = os.path.join(data_dir, "vagas.json")
+    with open(vagas_path, "w", encoding="utf-8") as f:
+        json.dump(vagas, f)
+
+    rng = np.random.default_rng(2)
+    skill = rng.random(200)
+    training_df = pd.DataFrame({
+        "vaga_id": [f"v{i % 20}" for i in range(200)], "applicant_id": [f"a{i % 30}" for i in range(200)],
+        "skill_match_score": skill, "level_match_score": rng.choice([0.0, 0.5, 1.0], 200), "applicant_level": "senior", "vacancy_level": "senior",
+        "applicant_skills_count": rng.integers(0, 5, 200), "vacancy_skills_count": rng.integers(1, 5, 200),
+        "hired": (skill + 0.3 * rng.random(200) > 0.9).astype(int),
+    })
+    processed_store.write_table(training_df, processed_store.TRAINING_DATASET, export_json=False)
+    return vagas_path
+
+
+def test_api_endpoints():
+    print("\n[TESTING] API endpoints...")
+    passed = True
+    from fastapi.testclient import TestClient
+    from src.ml.vacancy_store import VacancyDetailsStore
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        processed_dir = os.path.join(data_dir, "processed")
+        # Read by backend.main at import and inherited by the spawned training job
+        environment = {
+            "MODEL_DIR": os.path.join(data_dir, "models"), "PROCESSED_DATA_DIR": processed_dir,
+            "PREDICTION_LOG_DIR": os.path.join(data_dir, "logs", "predictions"), "DRIFT_STATE_PATH": os.path.join(data_dir, "logs", "drift_state.json"),
+            "DRIFT_REFRESH_SECONDS": "0", "CATALOG_POLL_SECONDS": "0", "SHARED_STATE": "0",
+            "TRAINING_JOBS_PATH": "", "PREDICTION_CACHE_PATH": "", "PREDICTION_CACHE_ENTRIES": "100", "FEATURE_CACHE": "0",
+        }
+        original_environment = {name: os.environ.get(name) for name in environment}
+        original_dir = processed_store.PROCESSED_DIR
+        os.environ.update(environment)
+        processed_store.PROCESSED_DIR = processed_dir
+        try:
+            vagas_path = _endpoint_data(data_dir, processed_dir)
+            from backend import main as api
+            api.VACANCY_DETAILS = VacancyDetailsStore(os.path.join(processed_dir, "vacancy_details.sqlite"), vagas_path=vagas_path)
+            cv = {"cv_pt": "Desenvolvedor Python, SQL e AWS, sênior", "codigo_profissional": "p1"}
+            # Every vacancy is returned, so the checks below see additions and removals
+            whole_catalog = {"top_k": 50, "exhaustive": True}
+            with TestClient(api.app) as client:
+                passed &= check(client.post("/predict/latest", json=cv).status_code == 500, "/predict without a trained model is a server error")
+
+                # --- Training jobs ---
+                response = client.post("/train")
+                job_id = response.json().get("job_id")
+                passed &= check(response.status_code == 202 and bool(job_id), "POST /train returns 202 with a job id")
+                deadline, job = time.monotonic() + 120, {}
+                while time.monotonic() < deadline:
+                    job = client.get(f"/jobs/{job_id}").json()
+                    if job.get("state") in ("succeeded", "failed", "cancelled"):
+                        break
+                    time.sleep(0.2)
+                passed &= check(job.get("state") == "succeeded" and os.path.exists(os.path.join(environment["MODEL_DIR"], job["result"]["new_model_file"])),
+                                f"Polling /jobs/{{id}} reaches 'succeeded' and the model lands in MODEL_DIR (state {job.get('state')}, error {job.get('error')})")
+                jobs = client.get("/jobs")
+                passed &= check(jobs.status_code == 200 and [listed["job_id"] for listed in jobs.json()["jobs"]] == [job_id], "GET /jobs lists the job")
+                passed &= check(client.get("/jobs/missing").status_code == 404 and client.post("/jobs/missing/cancel").status_code == 404,
+                                "Unknown job ids are 404")
+                passed &= check(client.post(f"/jobs/{job_id}/cancel").status_code == 409, "A finished job cannot be cancelled")
+
+                # --- Prediction cache and catalog changes ---
+                first, second = client.post("/predict/latest", json=cv, params=whole_catalog), client.post("/predict/latest", json=cv, params=whole_catalog)
+                passed &= check(first.status_code == 200 and first.headers.get("X-Prediction-Cache") == "miss" and second.headers.get("X-Prediction-Cache") == "hit",
+                                "A repeated /predict is served from the cache")
+                passed &= check(len(first.json()["top_matches"]) == 20 and first.json()["top_matches"][0]["vaga_details"]["client"] == "ACME", "Matches carry the details from the store built at startup")
+                passed &= check(client.post("/predict/missing.joblib", json=cv).status_code == 404, "An unknown model is 404")
+
+                vacancy = {"informacoes_basicas": {"titulo_vaga": "Dev Python AWS sênior"}, "perfil_vaga": {"principais_atividades": "Python, SQL e AWS"}}
+                created, replaced = client.put("/vacancies/new", json=vacancy), client.put("/vacancies/new", json=vacancy)
+                passed &= check(created.status_code == 201 and replaced.status_code == 200, "PUT /vacancies creates (201), then replaces (200)")
+                passed &= check(client.put("/vacancies/empty", json={}).status_code == 422, "A vacancy without text is rejected")
+                after_upsert = client.post("/predict/latest", json=cv, params=whole_catalog)
+                passed &= check(after_upsert.headers.get("X-Prediction-Cache") == "miss" and "new" in [match["vaga_id"] for match in after_upsert.json()["top_matches"]],
+                                "An upsert invalidates cached predictions and the new vacancy is scored")
+                passed &= check(client.delete("/vacancies/new").status_code == 200 and client.delete("/vacancies/new").status_code == 404,
+                                "DELETE /vacancies closes a vacancy once, then 404")
+                after_delete = client.post("/predict/latest", json=cv, params=whole_catalog)
+                passed &= check(after_delete.headers.get("X-Prediction-Cache") == "miss" and "new" not in [match["vaga_id"] for match in after_delete.json()["top_matches"]],
+                                "A deletion invalidates cached predictions and the vacancy is no longer returned")
+
+                # --- Reverse matching ---
+                page = client.get("/vacancies/v1/top-applicants", params={"top_k": 3})
+                passed &= check(page.status_code == 200 and len(page.json()["top_applicants"]) == 3 and page.json()["next_offset"] == 3,
+                                "top-applicants returns a page of ranked applicants")
+                passed &= check(client.get("/vacancies/new/top-applicants").status_code == 404, "top-applicants of a closed vacancy is 404")
+                passed &= check(client.get("/vacancies/v1/top-applicants", params={"model_filename": "missing.joblib"}).status_code == 404,
+                                "top-applicants with an unknown model is 404")
+
+                # --- Batch prediction ---
+                batch = {f"b{i}": {"cv_pt": text} for i, text in enumerate(["Python sênior", "Java e Docker pleno", "SQL júnior"])}
+                response = client.post("/predict/batch", json=batch, params={"top_k": 2})
+                passed &= check(response.status_code == 200 and response.json()["applicants_scored"] == 3 and
+                                all(len(result["top_matches"]) == 2 for result in response.json()["results"]),
+                                "/predict/batch scores every applicant")
+                passed &= check(client.post("/predict/batch", json=batch, params={"model_filename": "missing.joblib"}).status_code == 404,
+                                "/predict/batch with an unknown model is 404")
+
+                # --- Drift ---
+                api.PREDICTION_LOG.close()
+                drift = client.get("/monitoring/drift")
+                passed &= check(drift.status_code == 200 and drift.json()["rows_ingested"] > 0 and drift.json()["reference"] is not None,
+                                "/monitoring/drift reads the logged predictions against the training reference")
+        finally:
+            processed_store.PROCESSED_DIR = original_dir
+            for name, value in original_environment.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    assert passed, "API endpoint checks failed"
+
+
+def run_backend_tests():
+    """Executes the backend component tests and prints the results."""
+    print("--- Running Backend Component Tests ---")
+    all_passed = True
+    for test in [test_model_registry, test_prediction_log_sink, test_training_jobs, test_shared_training_jobs, test_latency_metrics, test_vacancy_catalog, test_prediction_cache, test_dataset_browser, test_drift_monitor, test_shared_state, test_api_endpoints]:
+        try:
+            test()
+        except AssertionError:
+            all_passed = False
+
+    print("\n--- Backend Component Tests Complete ---")
+    if all_passed:
+        print("Result: All tests passed successfully!")
+    else:
+        print("Result: Some tests failed.")
+    return all_passed
+
+
+if __name__ == "__main__":
+    run_backend_tests()
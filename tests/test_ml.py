@@ -2,17 +2,104 @@
 
 import sys
 import os
+import json
+import filecmp
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import joblib
+import numpy as np
+import pandas as pd
 
 # Add the project's root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.ml.create_training_data import calculate_skill_match, calculate_level_match
+from src.ml.json_stream import iter_json_object, write_json_array
+from src.ml import processed_store
+from src.ml.enhance_features import enhance_entities, applicant_text, shard_path
+from src.ml import feature_extractor
+from src.ml.feature_extractor import extract_features
+from src.ml.feature_cache import FeatureCache
+from src.ml.keyword_matcher import KeywordMatcher
+from src.ml import gemini_client
+from src.ml.gemini_client import GeminiClient, RateLimiter, DOCUMENT_PATTERN
+from src.ml import vacancy_store
+from src.ml.vacancy_store import build_vacancy_store, VacancyDetailsStore
+from src.ml.model_metadata import ModelEvaluator, split_indices, evaluation_metrics, write_model_metadata, file_fingerprint
+from src.ml.model_search import run_search
+from src.ml.forest_engine import CompiledForest, export_forest, load_for_inference
+from src.ml.synthetic_data import generate_dataset
+from src.ml.feature_matrix import FEATURE_COLUMNS, FeatureMatrix, ProbabilityTable, score_applicant, score_vacancy, select_rows, top_k_indices
 
-def run_ml_tests():
-    """Executes a series of tests on the ML helper functions and prints the results."""
-    print("--- Running ML Pipeline Tests ---")
-    
-    # Test Suite for calculate_skill_match
+
+def check(condition, description):
+    if condition:
+        print(f"  [PASS] {description}")
+    else:
+        print(f"  [FAIL] {description}")
+    return condition
+
+
+# Shared inputs of the scoring, retrieval and catalog update tests
+VACANCIES = {
+    "v1": {"technical_skills": ["python", "sql"], "experience_level": "senior"},
+    "v2": {"technical_skills": [], "experience_level": "pleno"},
+    "v3": {"technical_skills": ["java", "java", "aws"], "experience_level": "not specified"},
+    "v4": {"technical_skills": ["sap"], "experience_level": "leadership"},
+}
+APPLICANTS = [
+    {"technical_skills": ["python", "aws", "docker"], "experience_level": "pleno"},
+    {"technical_skills": [], "experience_level": "leadership"},
+    {"technical_skills": ["java"], "experience_level": "junior"},
+]
+
+
+def forest_training_data(seed=0):
+    """Small tabular dataset with integer-like and continuous columns, for the forest and search tests."""
+    rng = np.random.default_rng(seed)
+    features = pd.DataFrame({"x1": rng.integers(0, 10, 500) / 10, "x2": rng.integers(0, 5, 500), "x3": rng.random(500)})
+    labels = (features["x1"] + rng.random(500) > 0.9).astype(int)
+    return features, labels
+
+
+def start_stub_gemini():
+    """
+    Local HTTP server imitating the Gemini generateContent endpoint: it answers every
+    document of the prompt with keyword features, rejects the first request with a 429
+    and returns malformed output for documents containing 'BROKEN'.
+    """
+    requests_seen = []
+    matcher = KeywordMatcher(['python', 'java'], {}, [('senior', ['senior'])])
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = body["contents"][0]["parts"][0]["text"]
+            documents = DOCUMENT_PATTERN.findall(prompt)
+            requests_seen.append(len(documents))
+            if len(requests_seen) == 1:
+                self.send_response(429)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+            output = {doc_id: ({"technical_skills": "not a list"} if 'BROKEN' in text else matcher.extract(text)) for doc_id, text in documents}
+            response = json.dumps({"candidates": [{"content": {"parts": [{"text": json.dumps(output)}]}}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+
+
+def test_skill_match():
     print("\n[TESTING] calculate_skill_match function...")
     test_cases_skill = [
         (calculate_skill_match(['python', 'sql'], ['python', 'sql']), 1.0, "Perfect match"),
@@ -21,16 +108,13 @@ def run_ml_tests():
         (calculate_skill_match([], ['python', 'sql']), 0.0, "No applicant skills"),
         (calculate_skill_match(['python', 'sql'], []), 1.0, "No vacancy skills (should pass)"),
     ]
-    
-    all_passed = True
+    passed = True
     for result, expected, description in test_cases_skill:
-        if abs(result - expected) < 1e-9:
-            print(f"  [PASS] {description}")
-        else:
-            print(f"  [FAIL] {description}: Expected {expected}, Got {result}")
-            all_passed = False
+        passed &= check(abs(result - expected) < 1e-9, f"{description} (expected {expected}, got {result})")
+    assert passed, "calculate_skill_match checks failed"
 
-    # Test Suite for calculate_level_match
+
+def test_level_match():
     print("\n[TESTING] calculate_level_match function...")
     test_cases_level = [
         (calculate_level_match('senior', 'senior'), 1.0, "Exact match"),
@@ -39,19 +123,436 @@ def run_ml_tests():
         (calculate_level_match('junior', 'senior'), 0.0, "Too underqualified"),
         (calculate_level_match('not specified', 'senior'), 0.0, "Not specified"),
     ]
-
+    passed = True
     for result, expected, description in test_cases_level:
-        if result == expected:
-            print(f"  [PASS] {description}")
-        else:
-            print(f"  [FAIL] {description}: Expected {expected}, Got {result}")
+        passed &= check(result == expected, f"{description} (expected {expected}, got {result})")
+    assert passed, "calculate_level_match checks failed"
+
+
+def test_vectorized_scoring():
+    print("\n[TESTING] score_applicant matches the scalar feature functions...")
+    matrix = FeatureMatrix(VACANCIES)
+    mismatches = []
+    for applicant in APPLICANTS:
+        columns = score_applicant(matrix, applicant)
+        for row, vacancy in enumerate(VACANCIES.values()):
+            if columns['skill_match_score'][row] != calculate_skill_match(applicant["technical_skills"], vacancy["technical_skills"]) \
+                    or columns['level_match_score'][row] != calculate_level_match(applicant["experience_level"], vacancy["experience_level"]) \
+                    or columns['vacancy_skills_count'][row] != len(vacancy["technical_skills"]):
+                mismatches.append(("forward", applicant, vacancy))
+    applicant_matrix = FeatureMatrix(dict(enumerate(APPLICANTS)), vocabulary=matrix.vocabulary)
+    for vacancy in VACANCIES.values():
+        columns = score_vacancy(applicant_matrix, vacancy)
+        for row, applicant in enumerate(APPLICANTS):
+            if columns['skill_match_score'][row] != calculate_skill_match(applicant["technical_skills"], vacancy["technical_skills"]) \
+                    or columns['level_match_score'][row] != calculate_level_match(applicant["experience_level"], vacancy["experience_level"]):
+                mismatches.append(("reverse", applicant, vacancy))
+    passed = check(not mismatches, f"Vectorized features checked against scalar functions (mismatches: {mismatches})")
+    assert passed, "Vectorized scoring checks failed"
+
+
+def test_retrieval():
+    print("\n[TESTING] top_k_indices and select_rows...")
+    matrix = FeatureMatrix(VACANCIES)
+    test_cases_top_k = [
+        (list(top_k_indices([0.1, 0.9, 0.5, 0.9], 2)), [1, 3], "Ties broken by position"),
+        (list(top_k_indices([0.3, 0.2], 5)), [0, 1], "k larger than the input"),
+        (list(select_rows(matrix, {"technical_skills": ["sap"], "experience_level": "pleno"}, 1)), [0, 1, 2, 3], "Pruned rows keep group representatives"),
+        (list(select_rows(matrix, {"technical_skills": [], "experience_level": "pleno"}, 1, exhaustive=True)), [0, 1, 2, 3], "Exhaustive scores the full catalog"),
+    ]
+    passed = True
+    for result, expected, description in test_cases_top_k:
+        passed &= check(result == expected, f"{description} (expected {expected}, got {result})")
+    assert passed, "Retrieval checks failed"
+
+
+def test_feature_matrix_updates():
+    print("\n[TESTING] FeatureMatrix.updated...")
+    passed = True
+    matrix = FeatureMatrix(VACANCIES)
+    upserts = {"v2": {"technical_skills": ["rust"], "experience_level": "senior"}, "v5": {"technical_skills": ["python"], "experience_level": "junior"}}
+    updated = matrix.updated(upserts, removals=["v1"])
+    expected_entities = {key: value for key, value in VACANCIES.items() if key != "v1"}
+    expected_entities.update(upserts)
+    rebuilt = FeatureMatrix(expected_entities, vocabulary=matrix.vocabulary)
+    query = {"technical_skills": ["python", "rust"], "experience_level": "senior"}
+    passed &= check(updated.ids == rebuilt.ids == ["v2", "v3", "v4", "v5"] and (updated.skills != rebuilt.skills).nnz == 0 and
+                    all((score_applicant(updated, query)[column] == score_applicant(rebuilt, query)[column]).all() for column in FEATURE_COLUMNS) and
+                    list(select_rows(updated, query, 1)) == list(select_rows(rebuilt, query, 1)) and len(matrix) == 4,
+                    "Upserts and removals match a rebuild and leave the original untouched")
+
+    replacement = {"v1": {"technical_skills": ["go"], "experience_level": "pleno"}}
+    moved = matrix.updated(replacement, removals=["v1"])
+    passed &= check(moved.ids == ["v2", "v3", "v4", "v1"] and (moved.skills[3] != FeatureMatrix(replacement, vocabulary=matrix.vocabulary).skills).nnz == 0,
+                    f"An id both removed and upserted moves to the end (laid out as {moved.ids})")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrix.save(tmp_dir)
+        loaded = FeatureMatrix.load(tmp_dir)
+        reloaded_update = loaded.updated(upserts, removals=["v1"])
+        passed &= check(loaded.ids == matrix.ids and isinstance(loaded.levels, np.memmap) and
+                        all((score_applicant(loaded, query)[column] == score_applicant(matrix, query)[column]).all() for column in FEATURE_COLUMNS) and
+                        list(select_rows(loaded, query, 1)) == list(select_rows(matrix, query, 1)) and reloaded_update.ids == updated.ids,
+                        "save()/load() round-trips the matrix as memory-mapped arrays")
+        del loaded, reloaded_update
+    assert passed, "FeatureMatrix.updated checks failed"
+
+
+def test_json_stream():
+    print("\n[TESTING] iter_json_object and write_json_array...")
+    passed = True
+    raw = {"10976": {"prospects": [{"codigo": "41496", "nome": "Sr. Thales \"Freitas\" {x}"}]}, "n": -0.5, "ç": [1, None, True]}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = os.path.join(tmp_dir, "raw.json")
+        with open(raw_path, 'w', encoding='utf-8') as f:
+            json.dump(raw, f, indent=4, ensure_ascii=False)
+        parsed = [dict(iter_json_object(raw_path, chunk_size=size)) for size in (1, 5, 4096)]
+        passed &= check(all(result == raw for result in parsed), "Incremental parse matches json.load for every chunk size")
+
+        out_path = os.path.join(tmp_dir, "out.json")
+        items = [{"vaga_id": "1", "details": {"a": "ã"}}, {"vaga_id": "2", "details": {}}]
+        write_json_array(out_path, iter(items))
+        with open(out_path, 'r', encoding='utf-8') as f:
+            passed &= check(f.read() == json.dumps(items, indent=4, ensure_ascii=False), "Streamed array is byte-identical to json.dump")
+    assert passed, "JSON streaming checks failed"
+
+
+def test_processed_store():
+    print("\n[TESTING] processed_store round trip...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_dir = processed_store.PROCESSED_DIR
+        processed_store.PROCESSED_DIR = tmp_dir
+        try:
+            training_df = pd.DataFrame([
+                {"vaga_id": "1", "applicant_id": "10", "skill_match_score": 0.5, "level_match_score": 1.0, "applicant_level": "senior",
+                 "vacancy_level": "senior", "applicant_skills_count": 2, "vacancy_skills_count": 4, "hired": 1},
+            ])
+            processed_store.write_table(training_df, processed_store.TRAINING_DATASET, export_json=True)
+            projected = processed_store.read_table(processed_store.TRAINING_DATASET, columns=['skill_match_score', 'hired'])
+            os.remove(processed_store.table_path(processed_store.TRAINING_DATASET))
+            from_json = processed_store.read_table(processed_store.TRAINING_DATASET, columns=['skill_match_score', 'hired'])
+        finally:
+            processed_store.PROCESSED_DIR = original_dir
+    passed = check(list(projected.columns) == ['skill_match_score', 'hired'] and projected.values.tolist() == from_json.values.tolist() == [[0.5, 1]],
+                   "Column-projected Feather read matches the JSON export")
+    assert passed, "processed_store checks failed"
+
+
+def test_training_from_json_table():
+    print("\n[TESTING] training and evaluation with only the JSON training table...")
+    passed = True
+    from src.ml import train
+    rng = np.random.default_rng(1)
+    skill = rng.random(300)
+    training_df = pd.DataFrame({
+        "vaga_id": [str(i % 30) for i in range(300)], "applicant_id": [str(i) for i in range(300)],
+        "skill_match_score": skill, "level_match_score": rng.choice([0.0, 0.5, 1.0], 300), "applicant_level": "senior", "vacancy_level": "senior",
+        "applicant_skills_count": rng.integers(0, 10, 300), "vacancy_skills_count": rng.integers(1, 10, 300),
+        "hired": (skill + 0.3 * rng.random(300) > 0.9).astype(int),
+    })
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_dir, original_model_dir = processed_store.PROCESSED_DIR, train.MODEL_DIR
+        processed_store.PROCESSED_DIR, train.MODEL_DIR = tmp_dir, os.path.join(tmp_dir, "models")
+        try:
+            processed_store.write_table(training_df, processed_store.TRAINING_DATASET, export_json=True)
+            os.remove(processed_store.table_path(processed_store.TRAINING_DATASET))
+            json_path = processed_store.source_path(processed_store.TRAINING_DATASET)
+            passed &= check(json_path == processed_store.json_path(processed_store.TRAINING_DATASET), "source_path() falls back to the JSON export")
+
+            result = train.run_training_pipeline()
+            passed &= check(result is not None, "Training runs when only the JSON table exists")
+            if result is not None:
+                model_path = os.path.join(train.MODEL_DIR, result["new_model_file"])
+                evaluator = ModelEvaluator(lambda: processed_store.source_path(processed_store.TRAINING_DATASET),
+                                           lambda path: processed_store.read_table(processed_store.TRAINING_DATASET, path=path), FEATURE_COLUMNS)
+                metrics, source = evaluator.evaluate(model_path, file_fingerprint(model_path), lambda: joblib.load(model_path))
+                passed &= check(source == "metadata" and metrics["accuracy"] == result["accuracy"],
+                                f"Evaluation fingerprints the JSON table and matches the training metrics (source '{source}')")
+        finally:
+            processed_store.PROCESSED_DIR, train.MODEL_DIR = original_dir, original_model_dir
+    assert passed, "JSON training table checks failed"
+
+
+def test_enhance_entities():
+    print("\n[TESTING] enhance_entities...")
+    applicants = {str(i): {"cv_pt": cv} for i, cv in enumerate(["Python SQL senior", "Java jr", "", "gerente SAP", "AWS pleno"])}
+    expected = {applicant_id: extract_features(applicant["cv_pt"], "applicant") for applicant_id, applicant in applicants.items()}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = os.path.join(tmp_dir, "applicants.json")
+        output_path = os.path.join(tmp_dir, "applicants_enhanced.json")
+        shards_dir = os.path.join(tmp_dir, "shards")
+        with open(raw_path, 'w', encoding='utf-8') as f:
+            json.dump(applicants, f)
+        enhance_entities("applicant", raw_path, output_path, applicant_text, shards_dir, shard_size=2, workers=1)
+        os.remove(shard_path(shards_dir, 1))
+        stats = enhance_entities("applicant", raw_path, output_path, applicant_text, shards_dir, shard_size=2, workers=1)
+        with open(output_path, 'r', encoding='utf-8') as f:
+            merged = json.load(f)
+    passed = check(stats["shards"] == 3 and stats["shards_reused"] == 2 and stats["enhanced"] == 2 and merged == expected and list(merged) == list(applicants),
+                   f"Re-run only redoes the missing shard and the merge matches extract_features ({stats})")
+    assert passed, "enhance_entities checks failed"
+
+
+def test_keyword_matcher():
+    print("\n[TESTING] KeywordMatcher...")
+    passed = True
+    matcher = KeywordMatcher(['java', 'sql', '.net', 'c#'], {'english': ['fluent', 'fluente']}, [('senior', ['sr']), ('pleno', ['pl'])])
+    matcher_cases = [
+        ("JavaScript dev, /usr/bin", {"technical_skills": [], "languages": {}, "experience_level": "not specified"}),
+        ("Sr. Java, PL/SQL, ASP.NET e C#", {"technical_skills": ['.net', 'c#', 'java', 'sql'], "languages": {}, "experience_level": "senior"}),
+        ("englishman; English: fluente", {"technical_skills": [], "languages": {"English": "fluente"}, "experience_level": "not specified"}),
+    ]
+    for text, expected in matcher_cases:
+        result = matcher.extract(text)
+        passed &= check(result == expected, f"'{text}' -> {result}")
+    batch = matcher.extract_batch(["Sr. Java", "Sr. Java", ""])
+    batch[0]["technical_skills"].append("python")
+    passed &= check(batch[1] == matcher.extract("Sr. Java") and batch[2]["experience_level"] == "not specified",
+                    "extract_batch matches extract and returns independent results")
+    assert passed, "KeywordMatcher checks failed"
+
+
+def test_feature_cache():
+    print("\n[TESTING] FeatureCache...")
+    passed = True
+    calls = []
+
+    def counting_extractor(text, entity_type):
+        calls.append(text)
+        return {"technical_skills": ["python"], "languages": {}, "experience_level": "senior"}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "features.sqlite")
+        cache = FeatureCache(db_path, "v1", max_memory_entries=1)
+        cache.get_or_compute("Python  senior", "applicant", counting_extractor)
+        cache.get_or_compute(" Python senior\n", "applicant", counting_extractor)
+        cache.get_or_compute("Python senior", "vaga", counting_extractor)
+        restarted = FeatureCache(db_path, "v1")
+        restarted.get_or_compute("Python senior", "applicant", counting_extractor)
+        stats = cache.stats()
+        passed &= check(len(calls) == 2 and stats["memory_hits"] == 1 and stats["memory_evictions"] == 1 and restarted.stats()["disk_hits"] == 1,
+                        f"Repeated texts are served from memory, then from disk after a restart ({len(calls)} extractions, {stats})")
+        passed &= check(calls == ["Python senior", "Python senior"], "Extraction runs on the normalized text the entry is keyed on")
+        bumped = FeatureCache(db_path, "v2")
+        passed &= check(bumped.get("Python senior", "applicant") is None and bumped.stats()["disk_entries"] == 2,
+                        "A new extractor version misses old entries without deleting them on open")
+        passed &= check(bumped.prune_versions() == 2 and bumped.stats()["disk_entries"] == 0,
+                        "prune_versions removes the rows of other versions")
+
+    original_mode = feature_extractor.FEATURE_CACHE_MODE
+    feature_extractor.FEATURE_CACHE_MODE = "0"
+    try:
+        spaced = "Power\n   BI  sênior"
+        uncached = [extract_features(spaced, "applicant"), *feature_extractor.extract_features_batch([spaced], "applicant")]
+    finally:
+        feature_extractor.FEATURE_CACHE_MODE = original_mode
+    normalized = extract_features("Power BI sênior", "applicant")
+    passed &= check(all(features == normalized for features in uncached) and "power bi" in normalized["technical_skills"],
+                    "With the cache off, extraction still runs on the normalized text")
+    assert passed, "FeatureCache checks failed"
+
+
+def test_gemini_client():
+    print("\n[TESTING] GeminiClient against a local stub server...")
+    passed = True
+    server, base_url, requests_seen = start_stub_gemini()
+    original_delay = gemini_client.RETRY_BASE_DELAY
+    gemini_client.RETRY_BASE_DELAY = 0.01
+    try:
+        client = GeminiClient("test-key", base_url=base_url, docs_per_request=2, max_concurrency=2, rate_limiter=RateLimiter(6000, 10 ** 7))
+        texts = ["Senior Python", "java", "", "BROKEN python", "python java"]
+        results = client.extract_many_sync(texts, "applicant")
+        stats = client.stats()
+    finally:
+        gemini_client.RETRY_BASE_DELAY = original_delay
+        server.shutdown()
+    passed &= check([result.ok for result in results] == [True, True, True, False, True] and
+                    results[0].features == {"technical_skills": ["python"], "languages": {}, "experience_level": "senior"},
+                    "Per-document results, with the malformed document failing alone")
+    passed &= check(requests_seen == [2, 2, 2] and stats["requests"] == 3 and stats["retries"] == 1 and stats["failures"] == {"invalid_document": 1},
+                    f"Documents are packed per request, the 429 is retried and the failure is recorded ({requests_seen}, {stats})")
+    now = [0.0]
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000, clock=lambda: now[0])
+    passed &= check(limiter._take(10) == 0 and limiter._take(10) == 60.0, "RateLimiter makes the second request wait for the per-minute budget")
+    assert passed, "GeminiClient checks failed"
+
+
+def test_vacancy_details_store():
+    print("\n[TESTING] vacancy details store...")
+    passed = True
+    vagas = {
+        "1": {"informacoes_basicas": {"titulo_vaga": "Dev Python", "cliente": "ACME", "tipo_contratacao": "CLT"}, "perfil_vaga": {"principais_atividades": "Desenvolver"}},
+        "2": {"informacoes_basicas": {"titulo_vaga": ""}},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vagas_path = os.path.join(tmp_dir, "vagas.json")
+        store_path = os.path.join(tmp_dir, "vacancy_details.sqlite")
+        with open(vagas_path, 'w', encoding='utf-8') as f:
+            json.dump(vagas, f)
+        written = build_vacancy_store(vagas_path, store_path)
+        store = VacancyDetailsStore(store_path)
+        details = store.get_many(["1", "2", "unknown"])
+        store.close()
+        expected = {
+            "1": {"title": "Dev Python", "client": "ACME", "contract_type": "CLT", "main_activities": "Desenvolver"},
+            "2": {"title": "", "client": "N/A", "contract_type": "N/A", "main_activities": "N/A"},
+            "unknown": {"title": "N/A", "client": "N/A", "contract_type": "N/A", "main_activities": "N/A"},
+        }
+        passed &= check(written == 2 and details == expected, "Lookups return the projected fields, with 'N/A' for missing values and ids")
+
+        lazy_path = os.path.join(tmp_dir, "lazy.sqlite")
+        lazy = VacancyDetailsStore(lazy_path, vagas_path=vagas_path)
+        unbuilt = lazy.get("1")["title"]
+        passed &= check(unbuilt == "N/A" and not os.path.exists(lazy_path), "Lookups never build a missing store")
+        built = lazy.build_if_stale()
+        first = lazy.get("1")["title"]
+        vagas["1"]["informacoes_basicas"]["titulo_vaga"] = "Dev Python Sênior"
+        with open(vagas_path, 'w', encoding='utf-8') as f:
+            json.dump(vagas, f)
+        os.utime(vagas_path, ns=(os.stat(lazy_path).st_mtime_ns + 10**9,) * 2)
+        stale = lazy.get("1")["title"]
+        lazy.build_if_stale()
+        second = lazy.get("1")["title"]
+        lazy.close()
+        passed &= check(built and first == "Dev Python" and stale == "Dev Python" and second == "Dev Python Sênior",
+                        "build_if_stale builds a missing or outdated store and lookups reopen the new file")
+
+        broken_path = os.path.join(tmp_dir, "broken.json")
+        with open(broken_path, 'w', encoding='utf-8') as f:
+            f.write('{"1": {"informacoes_basicas": ')
+        broken_store = os.path.join(tmp_dir, "broken.sqlite")
+        broken = VacancyDetailsStore(broken_store, vagas_path=broken_path)
+        attempts = []
+        original_build = vacancy_store.build_vacancy_store
+        vacancy_store.build_vacancy_store = lambda *args: attempts.append(args) or original_build(*args)
+        try:
+            results = [broken.build_if_stale(), broken.build_if_stale()]
+        finally:
+            vacancy_store.build_vacancy_store = original_build
+        leftovers = [name for name in os.listdir(tmp_dir) if name.endswith(".tmp")]
+        passed &= check(results == [False, False] and len(attempts) == 1 and not leftovers,
+                        "A failed build is not retried and leaves no temporary file")
+    assert passed, "Vacancy details store checks failed"
+
+
+def test_model_evaluation_cache():
+    print("\n[TESTING] model metadata and evaluation cache...")
+    passed = True
+    from sklearn.tree import DecisionTreeClassifier
+    rng = np.random.default_rng(0)
+    dataset = pd.DataFrame({"x1": rng.random(200), "x2": rng.random(200)})
+    dataset["hired"] = (dataset["x1"] + 0.3 * rng.random(200) > 0.8).astype(int)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, "dataset.csv")
+        model_path = os.path.join(tmp_dir, "model.joblib")
+        dataset.to_csv(dataset_path, index=False)
+        train_indices, test_indices = split_indices(dataset["hired"])
+        model = DecisionTreeClassifier(max_depth=2, random_state=0).fit(dataset.iloc[train_indices][["x1", "x2"]], dataset["hired"].iloc[train_indices])
+        # Saved like train.py does: the sidecar is written while the model is still under its temporary name
+        joblib.dump(model, model_path + ".tmp")
+        test = dataset.iloc[test_indices]
+        metrics = evaluation_metrics(test["hired"], model.predict(test[["x1", "x2"]]))
+        write_model_metadata(model_path, dataset_path, file_fingerprint(dataset_path), ["x1", "x2"], test_indices, metrics,
+                             model_sha256=file_fingerprint(model_path + ".tmp"))
+        os.replace(model_path + ".tmp", model_path)
+
+        loads = []
+        evaluator = ModelEvaluator(dataset_path, lambda path: loads.append(1) or pd.read_csv(path), ["x1", "x2"])
+        load_model = lambda: joblib.load(model_path)
+        model_hash = file_fingerprint(model_path)
+        sources = [evaluator.evaluate(model_path, model_hash, load_model)[1] for _ in range(2)]
+        passed &= check(sources == ["metadata", "cache"] and not loads,
+                        f"The sidecar answers for an unchanged dataset, then the in-memory cache (sources {sources}, dataset loads {len(loads)})")
+
+        dataset.iloc[:150].to_csv(dataset_path, index=False)
+        recomputed, source = evaluator.evaluate(model_path, model_hash, load_model)
+        evaluator.evaluate(model_path, "another-model", load_model)
+        test = dataset.iloc[:150].iloc[split_indices(dataset["hired"].iloc[:150])[1]]
+        passed &= check(source == "computed" and recomputed == evaluation_metrics(test["hired"], model.predict(test[["x1", "x2"]])) and len(loads) == 1,
+                        f"A changed dataset is re-evaluated, reusing one memoized test split (source '{source}', dataset loads {len(loads)})")
+    assert passed, "Model evaluation checks failed"
+
+
+def test_compiled_forest():
+    print("\n[TESTING] compiled forest...")
+    passed = True
+    from sklearn.ensemble import RandomForestClassifier
+    features, labels = forest_training_data()
+    forest = RandomForestClassifier(n_estimators=15, random_state=0, class_weight='balanced').fit(features, labels)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "model.joblib")
+        joblib.dump(forest, model_path)
+        export_forest(forest, model_path)
+        compiled = load_for_inference(model_path)
+        mapped = load_for_inference(model_path, mmap=True)
+        passed &= check(isinstance(mapped.value, np.memmap) and isinstance(mapped._children, np.memmap) and
+                        np.array_equal(mapped.predict_proba(features), forest.predict_proba(features)),
+                        "load(mmap=True) maps the tables from the file and gives the same probabilities")
+        del mapped
+    queries = pd.concat([features, features.iloc[:50]], ignore_index=True)
+    table = ProbabilityTable(forest)
+    first = table.predict(queries)
+    second = table.predict(queries.iloc[::-1].reset_index(drop=True))
+    stats = table.stats()
+    passed &= check(np.array_equal(first, forest.predict_proba(queries)[:, 1]) and np.array_equal(second, first[::-1]) and
+                    stats["misses"] == len(queries.drop_duplicates()) and stats["hits"] == stats["misses"],
+                    f"ProbabilityTable matches predict_proba and only computes unseen feature tuples ({stats})")
+    passed &= check(isinstance(compiled, CompiledForest) and np.array_equal(compiled.predict_proba(queries), forest.predict_proba(queries)),
+                    "The compiled forest reproduces sklearn's probabilities exactly")
+    passed &= check(np.array_equal(compiled.predict_proba(queries[["x3", "x1", "x2"]]), forest.predict_proba(queries)) and
+                    np.array_equal(compiled.predict(queries), forest.predict(queries)),
+                    "Columns are matched by name and predict() agrees")
+    assert passed, "Compiled forest checks failed"
+
+
+def test_model_search():
+    print("\n[TESTING] model search leaderboard...")
+    features, labels = forest_training_data()
+    leaderboard, search_models = run_search(features, labels, families=["logistic_regression", "random_forest"], folds=2, workers=2, max_candidates=3)
+    passed = check(len(leaderboard) == 3 and list(leaderboard["rank"]) == [1, 2, 3] and leaderboard["cv_roc_auc"].is_monotonic_decreasing and
+                   set(leaderboard["candidate"]) == set(search_models) and (leaderboard[["latency_ms", "model_kb"]] > 0).all().all(),
+                   "Candidates are ranked by CV score with latency and size reported")
+    assert passed, f"Model search checks failed:\n{leaderboard}"
+
+
+def test_synthetic_data():
+    print("\n[TESTING] synthetic data generator...")
+    passed = True
+    with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+        counts = generate_dataset(first_dir, n_vacancies=20, n_applicants=100, seed=7)
+        generate_dataset(second_dir, n_vacancies=20, n_applicants=100, seed=7)
+        generated = {}
+        for name in ('vagas.json', 'applicants.json', 'prospects.json'):
+            with open(os.path.join(first_dir, name), 'r', encoding='utf-8') as f:
+                generated[name] = json.load(f)
+        prospect_codes = {p['codigo'] for vaga in generated['prospects.json'].values() for p in vaga['prospects']}
+        passed &= check(len(generated['vagas.json']) == 20 and len(generated['applicants.json']) == 100 and
+                        prospect_codes <= set(generated['applicants.json']) and
+                        counts['prospects'] == sum(len(v['prospects']) for v in generated['prospects.json'].values()),
+                        "Files parse and every prospect references a generated applicant")
+        passed &= check(all(filecmp.cmp(os.path.join(first_dir, name), os.path.join(second_dir, name), shallow=False) for name in generated),
+                        "The same seed produces identical files")
+    assert passed, "Synthetic data checks failed"
+
+
+def run_ml_tests():
+    """Executes a series of tests on the ML helper functions and prints the results."""
+    print("--- Running ML Pipeline Tests ---")
+    all_passed = True
+    for test in [test_skill_match, test_level_match, test_vectorized_scoring, test_retrieval, test_feature_matrix_updates, test_json_stream,
+                 test_processed_store, test_training_from_json_table, test_enhance_entities, test_keyword_matcher, test_feature_cache, test_gemini_client,
+                 test_vacancy_details_store, test_model_evaluation_cache, test_compiled_forest, test_model_search, test_synthetic_data]:
+        try:
+            test()
+        except AssertionError:
             all_passed = False
-            
+
     print("\n--- ML Pipeline Tests Complete ---")
     if all_passed:
         print("Result: All tests passed successfully!")
     else:
         print("Result: Some tests failed.")
+    return all_passed
 
 if __name__ == "__main__":
-    run_ml_tests()
\ No newline at end of file
+    run_ml_tests()